@@ -5,9 +5,13 @@ path_to_venv_python3 = '/set/path/to/installed/plaso/venv/python3'
 path_to_plaso_scripts = '/set/path/to/plaso/scripts/folder'
 
 # Specify path to a minimal RDSv3 (downloaded from: https://www.nist.gov/itl/ssd/software-quality-group/national-software-reference-library-nsrl/nsrl-download/current-rds)
-# current implementation: this db has to have a table "FILE" with a column "sha1"
+# current implementation: this db has to have a table "FILE" with a column "sha1" (or "sha256"/"md5", see hash_algorithms)
 path_to_nsrl = None
 # path_to_nsrl = '/set/path/to/nsrl/db'
+# Sorted digest index of the NSRL database (the strongest of hash_algorithms the database has), built once with
+# 'python mdp.py --build-nsrl-index' (used instead of per-file database lookups if it exists and is newer than the NSRL
+# database)
+path_to_nsrl_index = 'cache/nsrl_sha1.idx'
 
 # Preprocessing
 
@@ -19,6 +23,60 @@ populate_file_signatures = False
 populate_file_hashes_and_signatures = False
 # Specify maximum size of files where sha1 should be computed during pre-processing
 max_file_size_for_sha1_calculation = 1000 # 1 KB
+# Digests computed for each file (in one read pass), any of 'md5', 'sha1', 'sha256'
+# (the NSRL lookup uses the strongest digest that is computed and also a column of the NSRL FILE table)
+hash_algorithms = ['sha1']
+# Number of threads reading files for signatures and hashes (each with its own handles on the disk image)
+hashing_threads = 4
+# Size of the reads when hashing files
+hashing_buffer_size_kb = 1024
 
 # Set True if db should be used to store file lists (with sha1 and signatures) and load file info from file list if available
-use_db_for_file_lists = False
\ No newline at end of file
+use_db_for_file_lists = False
+
+# Result cache
+
+# Set True if plugin results should be cached across runs (keyed by disk image fingerprint, plugin name and version)
+# -> disk images where all enabled plugins have cached results are not opened again
+use_result_cache = False
+result_cache_path = 'cache/result_cache.db'
+# Maximum size of the result cache, least recently used results are removed when exceeded
+result_cache_max_size_mb = 256
+
+# Scheduling
+
+# Historical plugin processing times (used to process the largest disk images first when running with --jobs)
+plugin_timings_path = 'cache/plugin_timings.json'
+# Disk images found in the data folders (reused while a data folder is unchanged)
+image_discovery_cache_path = 'cache/image_discovery.json'
+
+# Disk image reads
+
+# Size of the LRU cache of decompressed EWF chunks per disk image (TSK reads small pieces of the same chunk repeatedly)
+ewf_read_cache_size_mb = 64
+# Number of threads decompressing EWF chunks ahead of sequential reads (e.g. hashing), 0: no read-ahead
+ewf_read_ahead_threads = 0
+# Size of the read cache for raw images, 0: raw images are memory mapped instead (recommended for local storage)
+raw_read_cache_size_mb = 0
+# Number of processes listing the files of disk images with several partitions in parallel (one partition per process),
+# 1: partitions are listed one after another
+file_enumeration_processes = 1
+
+# File list snapshots
+
+# Set True if the file list of a disk image should be saved after walking its file systems and be loaded by later runs
+# instead of walking them again (keyed by the disk image fingerprint, run with --rebuild-index to walk them again)
+use_file_list_snapshots = False
+# Folder for the snapshots, None: stored in the case folder (next to the data folder)
+file_list_snapshot_folder = 'cache/file_lists'
+
+# Plugin isolation
+
+# Names of plugins to run in a separate child process (e.g. plugins that may hang or use a lot of memory on corrupted
+# evidence). A plugin exceeding the limits below is killed and recorded as a failure, processing continues.
+isolated_plugins = []
+# Wall-clock timeout and resident memory limit (Linux only) for isolated plugins, 0: no limit
+plugin_timeout_seconds = 3600
+plugin_memory_limit_mb = 8192
+# Number of disk images a worker process (--jobs) processes before it is replaced, 0: never (requires Python 3.11)
+max_disk_images_per_worker = 10
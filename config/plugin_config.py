@@ -33,4 +33,9 @@ enabled_plugins = [
     # External
     # # "external_program_demo",
     # "plaso"
-]
\ No newline at end of file
+]
+
+# Folders containing additional plugin modules (one plugin class per .py file, enabled by the module name, e.g.
+# "my_plugin" for my_plugin.py). Plugins of installed packages can also be registered via the "mdp.plugins" entry
+# point group (see plugin_registry.py).
+plugin_directories = []
@@ -1,13 +1,18 @@
 import os
 from marple.disk_access_raw import RawDiskAccessor
 from marple.disk_access_ewf import EwfDiskAccessor
+from marple.read_cache import DEFAULT_CACHE_SIZE
 
 class DiskAccessorError(Exception):
     pass
 
-def get_disk_accessor(path_to_disk_image):
+def get_disk_accessor(path_to_disk_image, ewf_read_cache_size=DEFAULT_CACHE_SIZE, raw_read_cache_size=0,
+                      ewf_read_ahead_threads=0, enumeration_processes=1):
     '''Abstracts away the type of disk image and returns correct subclass of GenericDiskAccesosr
-    (EwfDiskAccessor, or RawDiskAccessor'''
+    (EwfDiskAccessor, or RawDiskAccessor
+    read cache sizes in bytes (0: no read cache, raw images are then memory mapped),
+    ewf_read_ahead_threads: threads decompressing EWF chunks ahead of sequential reads (0: no read-ahead),
+    enumeration_processes: child processes listing the files of several partitions in parallel (1: no child processes)'''
     if type(path_to_disk_image) is not str:
         raise TypeError("path_to_disk_image should be a string, not {}".format(type(path_to_disk_image)))
     if not os.path.exists(path_to_disk_image):
@@ -19,13 +24,14 @@ def get_disk_accessor(path_to_disk_image):
 
     if sector[0:3] == b'EVF':  # is ewf file
         try:
-            disk_accessor = EwfDiskAccessor(path_to_disk_image)
+            disk_accessor = EwfDiskAccessor(path_to_disk_image, ewf_read_cache_size, ewf_read_ahead_threads,
+                                            enumeration_processes)
         except DiskAccessorError:
             print('Error opening EWF disk image')
             quit()
     else:  # assume raw disk
         try:
-            disk_accessor = RawDiskAccessor(path_to_disk_image)
+            disk_accessor = RawDiskAccessor(path_to_disk_image, raw_read_cache_size, enumeration_processes)
         except DiskAccessorError:
             print('Error opening raw image, or unsupprted image type')
             quit()
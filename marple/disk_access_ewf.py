@@ -5,13 +5,16 @@ import pyewf
 
 
 from marple.file_object import FileItem
+from marple.file_table import FileTable, FileTableView
 from marple.disk_access_raw import DiskAccessorError
 from marple.disk_access_generic import GenericDiskAccessor
-from marple.partition_object import PartitionItem
+from marple.read_ahead import ReadAhead
+from marple.read_cache import ChunkReadCache, DEFAULT_CACHE_SIZE
 
 class EwfDiskAccessor(GenericDiskAccessor):
 
-    def __init__(self, path_to_disk_image):
+    def __init__(self, path_to_disk_image, read_cache_size=DEFAULT_CACHE_SIZE, read_ahead_threads=0,
+                 enumeration_processes=1):
         if type(path_to_disk_image) is not str:
             raise TypeError("path_to_disk_image should be a string, not {}".format(type(path_to_disk_image)))
         if not os.path.exists(path_to_disk_image):
@@ -22,17 +25,17 @@ class EwfDiskAccessor(GenericDiskAccessor):
         if sector[0:3] != b'EVF':
             raise DiskAccessorError('Not an EWF disk image')
         f.close()
+        super().__init__(enumeration_processes)
         self.path_to_image = path_to_disk_image
         self.list_of_files = None
         self.list_of_folders = None
         self.list_of_dir_inodes = None
+        self.read_cache_size = read_cache_size  # bytes, 0: no read cache
+        self.read_ahead_threads = read_ahead_threads  # 0: no read-ahead (requires the read cache)
 
-        # open all the file parts once
-        image_paths = self.get_all_parts_of_potentially_split_ewf()
+        # all the file parts, opened once with the image handle
+        self.image_paths = self.get_all_parts_of_potentially_split_ewf()
         self.file_object_paths = []
-        for each in image_paths:
-            file_object = open(each, "rb")
-            self.file_object_paths.append(file_object)
 
 
     @property
@@ -45,55 +48,12 @@ class EwfDiskAccessor(GenericDiskAccessor):
     @property
     def files(self):
         if self.list_of_files is None:
-            self.list_of_files = []
+            self.list_of_files = FileTable()
             self.get_list_of_files(self.list_of_files)
-            return self.list_of_files
-        else:
-            # if already generated, just return the current list
-            return self.list_of_files
-
-    @property
-    def partitions(self):
-        '''returns list of partition objects'''
-        res = self._get_partitions()
-        parts = []
-        for each_partition in res:
-            if each_partition.flags == pytsk3.TSK_VS_PART_FLAG_ALLOC:
-                a = PartitionItem(each_partition.start,
-                                                   each_partition.start + each_partition.len -1,
-                                                   each_partition.desc.decode())
-                a.files = [x for x in self.files if x.partition_sector == each_partition.start]
-                parts.append(a)
-        return parts
-
-
-    """Return a list of file objects"""
-    def get_list_of_files(self, list_of_files):
-        self.list_of_dir_inodes = []
-        self.list_of_folders = []
-        self.list_of_files = list_of_files
-
-        # is it a full disk or a volume?
-        fs_handle = self._try_getting_file_system_handle(offset=0)
-
-        if fs_handle:  # we just have a file system at this point, no partitions
-            logging.info("File system found in root of image")
-            self._get_list_of_files_from_volume(fs_handle)
-            # adds image path to all files
-            for each in list_of_files:
-                each.path_to_disk_image = self.path_to_image
-                #each.fs_handle = fs_handle[each.partition_sector]
-
-        else:
-            logging.info("No file system found in root of image")
-            self._get_list_of_files_from_all_partitions()  # TODO may need to pass sector size here for 4k sectors
-
-        # adds image path to all files
-        for each in list_of_files:
-            each.path_to_disk_image = self.path_to_image
-
-
-        return self.list_of_files
+        # if already generated, just return the current list (read-only, only the accessor changes the file table)
+        if isinstance(self.list_of_files, FileTable):
+            return FileTableView(self.list_of_files)
+        return tuple(self.list_of_files)
 
 
     def get_all_parts_of_potentially_split_ewf(self):
@@ -101,84 +61,70 @@ class EwfDiskAccessor(GenericDiskAccessor):
 
 
 
-    def get_disk_image_sector(self, sector_number, sector_size=512):
+    """Open a new image handle for the disk image (on all segment files)"""
+    def _open_image_handle(self):
+        self.file_object_paths = [open(each, "rb") for each in self.image_paths]
         ewf_handle = pyewf.handle()
         ewf_handle.open_file_objects(self.file_object_paths)
-        img = ewf_Img_Info(ewf_handle)
-        data = img.read(512*sector_number, sector_size)
-        img.close()
-        ewf_handle.close()
-        return data
-
-    def get_partition_sector(self, partiton_sector_offset, sector_number, sector_size=512):
+        read_ahead = None
+        if self.read_cache_size and self.read_ahead_threads:
+            read_ahead = ReadAhead(self._open_reader, workers=self.read_ahead_threads)
+        return ewf_Img_Info(ewf_handle, self.read_cache_size, read_ahead)
+
+    """Open an additional, independent reader on all segment files (for reading ahead in another thread)"""
+    def _open_reader(self):
+        file_objects = [open(each, "rb") for each in self.image_paths]
         ewf_handle = pyewf.handle()
-        ewf_handle.open_file_objects(self.file_object_paths)
-        img = ewf_Img_Info(ewf_handle)
-        data = img.read(sector_size*partiton_sector_offset + sector_size*sector_number, sector_size)
-        img.close()
-        ewf_handle.close()
-        return data
+        ewf_handle.open_file_objects(file_objects)
 
+        def close_reader():
+            ewf_handle.close()
+            for each in file_objects:
+                each.close()
 
-    def get_partition_block(self, partiton_sector_offset, block_number, block_size, sector_size=512):
-        logging.warning('Block size on FAT =sector size due to pytsk')
-        ewf_handle = pyewf.handle()
-        ewf_handle.open_file_objects(self.file_object_paths)
-        img = ewf_Img_Info(ewf_handle)
-        data = img.read(sector_size * partiton_sector_offset + block_size * block_number, block_size)
-        img.close()
-        ewf_handle.close()
-        return data
+        return (lambda offset, size: ewf_handle.read_buffer_at_offset(size, offset)), close_reader
 
+    def __getstate__(self):
+        state = super().__getstate__()
+        state['file_object_paths'] = []
+        return state
 
-
-    """Return list of partitions in disk image"""
-    def _get_partitions(self):
-        ewf_handle = pyewf.handle()
-        ewf_handle.open_file_objects(self.file_object_paths)
-        img = ewf_Img_Info(ewf_handle)
-        partition_table = pytsk3.Volume_Info(img)
-        img.close()
-        ewf_handle.close()
-        return partition_table
-
-
-    """Attempt to get a file system handle at specified offset"""
-    def _try_getting_file_system_handle(self, offset):
-        ewf_handle = pyewf.handle()
-        ewf_handle.open_file_objects(self.file_object_paths)
-        img = ewf_Img_Info(ewf_handle)
-
-        try:
-            # get a handle to the file system
-            return pytsk3.FS_Info(img, offset=offset)
-        except OSError:
-            return None
-
-
-    def __del__(self):
+    def close(self):
+        super().close()
         for each in self.file_object_paths:
             each.close()
+        self.file_object_paths = []
 
-    def get_media_size(self):
-        ewf_handle = pyewf.handle()
-        ewf_handle.open_file_objects(self.file_object_paths)
-        img = ewf_Img_Info(ewf_handle)
-        disk_size_bytes = img.get_size()
-        return disk_size_bytes
+    def __del__(self):
+        if hasattr(self, 'file_object_paths'):
+            self.close()
 
 class ewf_Img_Info(pytsk3.Img_Info):
-    def __init__(self, ewf_handle):
+    def __init__(self, ewf_handle, read_cache_size=0, read_ahead=None):
         self._ewf_handle = ewf_handle
+        # decompressed chunks are cached (TSK reads small pieces of the same chunk again and again),
+        # for sequential reads the following chunks are optionally decompressed ahead in parallel
+        self.read_cache = None
+        self._read_ahead = read_ahead
+        if read_cache_size:
+            self.read_cache = ChunkReadCache(self._read_from_handle, ewf_handle.get_media_size(),
+                                             cache_size=read_cache_size, read_ahead=read_ahead)
         super(ewf_Img_Info, self).__init__(
             url="", type=pytsk3.TSK_IMG_TYPE_EXTERNAL)
 
     def close(self):
+        if self._read_ahead is not None:
+            self._read_ahead.close()
         self._ewf_handle.close()
 
+    def _read_from_handle(self, offset, size):
+        # no seek, i.e. no shared file position between threads reading from the same handle
+        return self._ewf_handle.read_buffer_at_offset(size, offset)
+
     def read(self, offset, size):
-        self._ewf_handle.seek(offset)
-        return self._ewf_handle.read(size)
+        if self.read_cache is not None:
+            return self.read_cache.read(offset, size)
+        return self._read_from_handle(offset, size)
 
     def get_size(self):
         return self._ewf_handle.get_media_size()
\ No newline at end of file
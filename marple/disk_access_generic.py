@@ -1,107 +1,251 @@
 import logging
+import multiprocessing
 import os
 import math
+import threading
+from concurrent.futures import ProcessPoolExecutor
 import pytsk3
 from marple.file_object import FileItem
+from marple.file_table import FileTable
+from marple.partition_object import PartitionItem
+
+# leading bytes of resident file data (e.g. small NTFS files stored in their MFT record) kept while listing files
+RESIDENT_DATA_SIZE = 16
+
 class DiskAccessorError(Exception):
     pass
 
 class GenericDiskAccessor(object):
 
-    """Generate list of files on partition starting at supplied dir"""
-    def _populate_file_list(self, starting_dir_object, parent_path, partition_sector):
+    def __init__(self, enumeration_processes=1):
+        # long-lived handles, opened on first use and reused by all accessor methods (see close())
+        self._image_handle = None
+        self._volume_info = None
+        self._fs_handles = {}  # offset -> pytsk3.FS_Info (None if there is no supported file system)
+        self._handle_lock = threading.Lock()  # plugins of a disk image might run in parallel threads
+        self.enumeration_processes = enumeration_processes  # >1: partitions are listed in parallel child processes
+        self._partition_items = None  # PartitionItems of the allocated partitions, built once (see partitions)
+        # True: the location of each file's first data block (or its resident data) is recorded while listing files,
+        # so that signatures can be read in physical order (see mdp_lib/file_hashing.py)
+        self.collect_data_locations = False
+
+    def __getstate__(self):
+        # handles can't be pickled, a copy of the accessor (e.g. in a child process) opens its own handles
+        state = self.__dict__.copy()
+        state['_image_handle'] = None
+        state['_volume_info'] = None
+        state['_fs_handles'] = {}
+        state['list_of_files'] = None
+        state['_partition_items'] = None
+        del state['_handle_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._handle_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    """Release all handles (they are reopened if the accessor is used again)"""
+    def close(self):
+        with self._handle_lock:
+            self._fs_handles = {}
+            self._volume_info = None
+            if self._image_handle is not None:
+                read_cache = getattr(self._image_handle, 'read_cache', None)
+                if read_cache is not None:
+                    logging.info('Read cache of {}: {}'.format(self.path_to_image, read_cache.stats))
+                self._image_handle.close()
+                self._image_handle = None
+
+    """Return hit/miss counters of the image handle's read cache (None if no read cache is used)"""
+    @property
+    def read_cache_stats(self):
+        read_cache = getattr(self._image_handle, 'read_cache', None)
+        return read_cache.stats if read_cache is not None else None
+
+    """NEEDS IMPLEMENTING IN SUBCLASS: return a new pytsk3.Img_Info for the disk image"""
+    def _open_image_handle(self):
+        raise NotImplementedError('Needs implementing in subclass')
+
+    """Return the accessor's image handle (pytsk3.Img_Info), opened once"""
+    @property
+    def image_handle(self):
+        with self._handle_lock:
+            if self._image_handle is None:
+                self._image_handle = self._open_image_handle()
+            return self._image_handle
+
+    """Yield the files of a partition starting at supplied dir (iterative depth-first walk in directory order)"""
+    def _walk_directory(self, starting_dir_object, parent_path, partition_sector):
         if starting_dir_object is None:
             return
 
-        logging.info('Folder is {}'.format(parent_path))
+        self.list_of_dir_inodes.add(starting_dir_object.info.addr)
+        logging.debug('Folder is %s', parent_path)
 
-        self.list_of_dir_inodes.append(starting_dir_object.info.addr)
+        # stack of (directory entry iterator, directory path), i.e. no recursion limit on deep trees
+        stack = [(iter(starting_dir_object), parent_path)]
+        while stack:
+            directory_iterator, directory_path = stack[-1]
+            each_file = next(directory_iterator, None)
+            if each_file is None:
+                stack.pop()
+                continue
 
-        # logging.debug('Processing {}'.format(starting_dir_object.info.names.name))
-        for each_file in starting_dir_object:
             filename_decoded = each_file.info.name.name.decode('UTF-8', 'replace')
-            full_path = os.path.join(parent_path, filename_decoded)
-            if each_file.info.meta is None:
-                logging.debug("{} has no metadata".format(full_path))
+            full_path = os.path.join(directory_path, filename_decoded)
+            meta = each_file.info.meta
+            if meta is None:
+                logging.debug("%s has no metadata", full_path)
                 continue
 
-            # print(each_file.info.name.name, each_file.info.meta.type, each_file.info.meta.flags, each_file.info.meta.mode)
-            # added this in trying to identify volume label entry on fat root entry
-
-            if each_file.info.meta.type == pytsk3.TSK_FS_META_TYPE_REG:
+            if meta.type == pytsk3.TSK_FS_META_TYPE_REG:
                 # is a file
                 a_file = FileItem(full_path,
-                                  each_file.info.meta.addr,
-                                  each_file.info.meta.size,
+                                  meta.addr,
+                                  meta.size,
                                   partition_sector)
-                a_file.timestamps['cr_time'] = each_file.info.meta.crtime
-                a_file.timestamps['m_time'] = each_file.info.meta.mtime
-                a_file.timestamps['a_time'] = each_file.info.meta.atime
-                a_file.status = each_file.info.meta.type
-                a_file.flags = each_file.info.meta.flags
-                self.list_of_files.append(a_file)
-
-                #logging.debug('Added {}'.format(full_path))
-
-
-            elif each_file.info.meta.type == pytsk3.TSK_FS_META_TYPE_DIR:
+                a_file.timestamps['cr_time'] = meta.crtime
+                a_file.timestamps['m_time'] = meta.mtime
+                a_file.timestamps['a_time'] = meta.atime
+                a_file.status = meta.type
+                a_file.flags = meta.flags
+                a_file.path_to_disk_image = self.path_to_image
+                a_file.accessor = self
+                if self.collect_data_locations:
+                    a_file.data_offset, a_file.resident_data = self._get_data_location(each_file, meta.size,
+                                                                                       partition_sector)
+                yield a_file
+
+            elif meta.type == pytsk3.TSK_FS_META_TYPE_DIR:
                 # is a directory
-                # logging.debug(each_file.info.name.name)
-                if each_file.info.name.name == b'.' or each_file.info.name.name == b'..':
+                name = each_file.info.name.name
+                if name == b'.' or name == b'..':
                     pass
-                elif each_file.info.name.name == b'$OrphanFiles':
-                    logging.debug("skipped $OrphanFiles for now".format())
-                else: # is proper dir
-                    if each_file.info.meta.addr not in self.list_of_dir_inodes:
-                        try:
-                            # has not been processed yet (needed to stop infinite recursion)
-                            self._populate_file_list(each_file.as_directory(), full_path, partition_sector)
-                        except OSError as e:
-                            logging.error("A major error occurred reading {} ({})".format(full_path, e))
-                    else:
-                        logging.debug("skipped {} as in list of dir inodes".format(each_file.info.meta.addr))
-
-            elif each_file.info.meta.type == pytsk3.TSK_FS_META_TYPE_LNK:
+                elif name == b'$OrphanFiles':
+                    logging.debug("skipped $OrphanFiles for now")
+                elif meta.addr not in self.list_of_dir_inodes:  # is proper dir
+                    # has not been processed yet (needed to stop infinite loops)
+                    try:
+                        sub_directory_object = each_file.as_directory()
+                    except OSError as e:
+                        logging.error("A major error occurred reading {} ({})".format(full_path, e))
+                        continue
+                    self.list_of_dir_inodes.add(sub_directory_object.info.addr)
+                    logging.debug('Folder is %s', full_path)
+                    stack.append((self._iter_directory_entries(sub_directory_object, full_path), full_path))
+                else:
+                    logging.debug("skipped %s as in list of dir inodes", meta.addr)
+
+            elif meta.type == pytsk3.TSK_FS_META_TYPE_LNK:
                 # deliberately ignoring symbolic links
                 pass
             else:
-                logging.debug('Unsupported file type: {} {} '.format(each_file.info.name.name,
-                                                                          each_file.info.meta.type))
-
+                logging.debug('Unsupported file type: %s %s', each_file.info.name.name, meta.type)
+
+    """Return (image offset of the file's first data block, None) or (None, leading bytes of its resident data),
+    (None, None) if the data can't be read directly from the image (e.g. compressed, encrypted or sparse)"""
+    def _get_data_location(self, file_object, file_size, partition_sector, sector_size=512):
+        if file_size == 0:
+            return None, None
+        data_attribute_types = (int(pytsk3.TSK_FS_ATTR_TYPE_DEFAULT), int(pytsk3.TSK_FS_ATTR_TYPE_NTFS_DATA))
+        unreadable_run_flags = int(pytsk3.TSK_FS_ATTR_RUN_FLAG_SPARSE) | int(pytsk3.TSK_FS_ATTR_RUN_FLAG_FILLER)
+        try:
+            for each_attribute in file_object:
+                attribute_info = each_attribute.info
+                if int(attribute_info.type) not in data_attribute_types or attribute_info.name:
+                    continue  # e.g. NTFS alternate data streams
+                attribute_flags = int(attribute_info.flags)
+                if attribute_flags & (int(pytsk3.TSK_FS_ATTR_COMP) | int(pytsk3.TSK_FS_ATTR_ENC)):
+                    return None, None
+                if attribute_flags & int(pytsk3.TSK_FS_ATTR_RES):
+                    # resident data is part of the file's metadata record, which is already loaded
+                    return None, file_object.read_random(0, min(file_size, RESIDENT_DATA_SIZE))
+                for each_run in each_attribute:
+                    if each_run.offset != 0 or int(each_run.flags) & unreadable_run_flags:
+                        return None, None
+                    block_size = self.get_file_system_handle(partition_sector, sector_size).info.block_size
+                    return sector_size * partition_sector + each_run.addr * block_size, None
+                return None, None
+        except OSError as e:
+            logging.debug('Data location of inode %s not found (%s)', file_object.info.meta.addr, e)
+        return None, None
+
+    """Iterate over the entries of a directory, stopping at read errors (as the directory walk did before)"""
+    @staticmethod
+    def _iter_directory_entries(directory_object, directory_path):
+        try:
+            for each_entry in directory_object:
+                yield each_entry
+        except OSError as e:
+            logging.error("A major error occurred reading {} ({})".format(directory_path, e))
+
+    """Yield the files of all partitions (or of the file system if the image is a volume only)"""
+    def iter_files(self):
+        self.list_of_dir_inodes = set()
+
+        # is it a full disk or a volume?
+        fs_handle = self._try_getting_file_system_handle(offset=0)
+        if fs_handle:  # we just have a file system at this point, no partitions
+            logging.info("File system found in root of image")
+            yield from self._iter_files_from_volume(fs_handle)
+        else:
+            logging.info("No file system found in root of image")
+            yield from self._iter_files_from_all_partitions()  # TODO may need to pass sector size here for 4k sectors
 
+    """Return a list of file objects (a FileTable or a list of FileItems, depending on what is passed in)"""
+    def get_list_of_files(self, list_of_files):
+        self.list_of_folders = []
+        self.list_of_files = list_of_files
+        list_of_files.extend(self.iter_files())
+        return self.list_of_files
 
-    """NEEDS IMPLEMENTING IN SUBCLASS"""
+    """Return list of partitions in disk image"""
     def _get_partitions(self):
-        raise NotImplementedError('Needs implementing in subclass')
+        image_handle = self.image_handle
+        with self._handle_lock:
+            if self._volume_info is None:
+                self._volume_info = pytsk3.Volume_Info(image_handle)
+            return self._volume_info
 
-    """NEEDS IMPLEMENTING IN SUBCLASS"""
+    """Attempt to get a file system handle at specified offset"""
     def _try_getting_file_system_handle(self, offset):
-        raise NotImplementedError('Needs implementing in subclass')
-
-    """Populate list of files for a disk image of a volume only"""
-    def _get_list_of_files_from_volume(self, fs_handle):
-        self.list_of_dir_inodes = []
+        image_handle = self.image_handle
+        with self._handle_lock:
+            if offset not in self._fs_handles:
+                try:
+                    # get a handle to the file system
+                    self._fs_handles[offset] = pytsk3.FS_Info(image_handle, offset=offset)
+                except OSError:
+                    self._fs_handles[offset] = None
+            return self._fs_handles[offset]
+
+    """Yield the files of a disk image of a volume only"""
+    def _iter_files_from_volume(self, fs_handle):
+        self.list_of_dir_inodes = set()
         root_directory_object = fs_handle.open_dir('/', 0)
-        self._populate_file_list(root_directory_object, 'P_0/', 0)
+        yield from self._walk_directory(root_directory_object, 'P_0/', 0)
         logging.info('File list populated')
 
-    """Populate list of files for a disk image with partitions"""
-    def _get_list_of_files_from_all_partitions(self, sector_size=512):
+    """Yield the files of a disk image with partitions (in partition order)"""
+    def _iter_files_from_all_partitions(self, sector_size=512):
         partitions = self._get_partitions()
         logging.info("Detected some partitions")
 
+        partition_starts = []
         for i, each_partition in enumerate(partitions):
             logging.info('processing partition: {}'.format(i))
             if each_partition.flags == pytsk3.TSK_VS_PART_FLAG_UNALLOC:
                 logging.info("--- needs scanning (photorec/foremost)")
             elif each_partition.flags == pytsk3.TSK_VS_PART_FLAG_ALLOC:
                 logging.info("--- needs processing (fls)")
-                fs_handle = self._try_getting_file_system_handle(offset=sector_size * each_partition.start)
-                if fs_handle is not None:
-                    root_directory_object = fs_handle.open_dir('/', 0)
-                    self._populate_file_list(root_directory_object, 'P_{}/'.format(each_partition.start),
-                                         each_partition.start)
-                    logging.info('File list populated for'.format(each_partition.start))
+                if self._try_getting_file_system_handle(offset=sector_size * each_partition.start) is not None:
+                    partition_starts.append(each_partition.start)
                 else:
                     print('TSK unsupported fs found at {}'.format(each_partition.start))
             elif each_partition.flags == pytsk3.TSK_VS_PART_FLAG_META:
@@ -110,6 +254,88 @@ class GenericDiskAccessor(object):
             else:
                 logging.warning('Partition type not identified {}'.format(each_partition.flags))
 
+        if self.enumeration_processes > 1 and len(partition_starts) > 1:
+            yield from self._iter_files_from_partitions_in_parallel(partition_starts, sector_size)
+        else:
+            for each_partition_start in partition_starts:
+                yield from self._iter_files_from_partition(each_partition_start, sector_size)
+
+    """Yield the files of the partition starting at partition_start"""
+    def _iter_files_from_partition(self, partition_start, sector_size=512):
+        self.list_of_dir_inodes = set()  # inode numbers are only unique within a file system
+        fs_handle = self._try_getting_file_system_handle(offset=sector_size * partition_start)
+        root_directory_object = fs_handle.open_dir('/', 0)
+        yield from self._walk_directory(root_directory_object, 'P_{}/'.format(partition_start), partition_start)
+        logging.info('File list populated for {}'.format(partition_start))
+
+    """Yield the files of several partitions, each listed by a child process with its own image handle"""
+    def _iter_files_from_partitions_in_parallel(self, partition_starts, sector_size=512):
+        logging.info('Listing files of {} partitions in {} processes'.format(
+            len(partition_starts), min(self.enumeration_processes, len(partition_starts))))
+        with ProcessPoolExecutor(max_workers=min(self.enumeration_processes, len(partition_starts)),
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = [executor.submit(_list_files_of_partition, self, each_partition_start, sector_size)
+                       for each_partition_start in partition_starts]
+            # results are merged in partition order, i.e. the file list is the same as when listed serially
+            for each_partition_start, each_future in zip(partition_starts, futures):
+                try:
+                    file_rows = each_future.result()
+                except Exception as e:
+                    # e.g. child process died, list the partition in this process instead
+                    logging.warning('Listing partition {} in a child process failed ({}), listing it directly'.format(
+                        each_partition_start, e))
+                    yield from self._iter_files_from_partition(each_partition_start, sector_size)
+                    continue
+                for each_row in file_rows:
+                    yield self._file_item_from_row(each_row, each_partition_start)
+
+    """Return a compact row (tuple of plain values) of a file, e.g. to transfer it between processes"""
+    @staticmethod
+    def _file_item_to_row(file_item):
+        return (file_item.full_path, file_item.inode, file_item.file_size,
+                file_item.timestamps['cr_time'], file_item.timestamps['m_time'], file_item.timestamps['a_time'],
+                int(file_item.status), int(file_item.flags), file_item.data_offset, file_item.resident_data)
+
+    """Return the file item of a row created by _file_item_to_row()"""
+    def _file_item_from_row(self, row, partition_sector):
+        full_path, inode, file_size, cr_time, m_time, a_time, status, flags, data_offset, resident_data = row
+        a_file = FileItem(full_path, inode, file_size, partition_sector)
+        a_file.timestamps['cr_time'] = cr_time
+        a_file.timestamps['m_time'] = m_time
+        a_file.timestamps['a_time'] = a_time
+        a_file.status = status
+        a_file.flags = flags
+        a_file.data_offset = data_offset
+        a_file.resident_data = resident_data
+        a_file.path_to_disk_image = self.path_to_image
+        a_file.accessor = self
+        return a_file
+
+    @property
+    def partitions(self):
+        '''returns list of partition objects (built once, their files are views of the accessor's file list)'''
+        if self._partition_items is None:
+            parts = []
+            for each_partition in self._get_partitions():
+                if each_partition.flags == pytsk3.TSK_VS_PART_FLAG_ALLOC:
+                    a = PartitionItem(each_partition.start,
+                                      each_partition.start + each_partition.len - 1,
+                                      each_partition.desc.decode())
+                    a.files = self.get_files_of_partition(each_partition.start)
+                    parts.append(a)
+            self._partition_items = parts
+        return self._partition_items
+
+    """Return the files of the partition starting at partition_sector (read-only view if the file list is a FileTable)"""
+    def get_files_of_partition(self, partition_sector):
+        files = self.files  # lists the files if not done yet
+        if isinstance(self.list_of_files, FileTable):
+            return self.list_of_files.files_of_partition(partition_sector)
+        return tuple(x for x in files if x.partition_sector == partition_sector)
+
+    """Return the (cached) file system handle of the partition starting at partition_sector"""
+    def get_file_system_handle(self, partition_sector, sector_size=512):
+        return self._try_getting_file_system_handle(offset=sector_size * partition_sector)
 
     """Return a dictionary of file system handles"""
     def get_file_system_handles(self):
@@ -126,9 +352,28 @@ class GenericDiskAccessor(object):
                     handles[each_partition.start] = fs_handle
         return handles
 
-    """NEEDS IMPLEMENTING IN SUBCLASS"""
     def get_media_size(self):
-        raise NotImplementedError('Needs implementing in subclass')
+        return self.image_handle.get_size()
+
+    """Return media size and partition table (start, length and flags of each partition, none for a single file system)
+    of the disk image, e.g. to check that a saved file list belongs to it"""
+    def get_disk_layout(self):
+        try:
+            partitions = [[int(each_partition.start), int(each_partition.len), int(each_partition.flags)]
+                          for each_partition in self._get_partitions()]
+        except OSError:
+            partitions = []
+        return {'media_size': self.get_media_size(), 'partitions': partitions}
+
+    def get_disk_image_sector(self, sector_number, sector_size=512):
+        return self.image_handle.read(512 * sector_number, sector_size)
+
+    def get_partition_sector(self, partiton_sector_offset, sector_number, sector_size=512):
+        return self.image_handle.read(sector_size * partiton_sector_offset + sector_size * sector_number, sector_size)
+
+    def get_partition_block(self, partiton_sector_offset, block_number, block_size, sector_size=512):
+        logging.warning('Block size on FAT = sector size due to pytsk')
+        return self.image_handle.read(sector_size * partiton_sector_offset + block_size * block_number, block_size)
 
     def get_block_size_of_volume_tsk(self, partition_start_sector, sector_size=512):
         fs_handle = self._try_getting_file_system_handle(offset=partition_start_sector*sector_size)
@@ -211,4 +456,11 @@ class GenericDiskAccessor(object):
         return info['reserved_sectors'] + (info['copies_of_fat'] * info['sectors_per_fat'])
 
     def get_cluster_no_from_sector(self, partition_start_sector, sector_size=512):
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+
+def _list_files_of_partition(disk_accessor, partition_start, sector_size=512):
+    """runs in a child process: lists the files of a partition on a copy of the accessor (own image handle)"""
+    with disk_accessor:
+        return [disk_accessor._file_item_to_row(each_file)
+                for each_file in disk_accessor._iter_files_from_partition(partition_start, sector_size)]
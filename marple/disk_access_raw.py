@@ -1,3 +1,4 @@
+import mmap
 import os
 import logging
 
@@ -5,14 +6,15 @@ import pytsk3
 import pyewf
 
 from marple.disk_access_generic import GenericDiskAccessor
-from marple import partition_object
+from marple.file_table import FileTable, FileTableView
+from marple.read_cache import ChunkReadCache
 
 class DiskAccessorError(Exception):
     pass
 
 class RawDiskAccessor(GenericDiskAccessor):
 
-    def __init__(self, path_to_image):
+    def __init__(self, path_to_image, read_cache_size=0, enumeration_processes=1):
         if type(path_to_image) is not str:
             raise TypeError("path_to_image should be a string, not {}".format(type(path_to_image)))
         if not os.path.exists(path_to_image):
@@ -26,106 +28,80 @@ class RawDiskAccessor(GenericDiskAccessor):
                 print(sector)
                 raise DiskAccessorError('Not a disk or partition - no 55 AA found at offset 500')
 
+            super().__init__(enumeration_processes)
             self.path_to_image = path_to_image
             self.list_of_files = None
             self.list_of_folders = None
             self.list_of_dir_inodes = None
+            self.read_cache_size = read_cache_size  # bytes, 0: memory mapped instead of a read cache
         except PermissionError:
             raise PermissionError("needs root permissions to access attached media")
 
     @property
     def files(self):
         if self.list_of_files is None:
-            self.list_of_files = []
+            self.list_of_files = FileTable()
             self.get_list_of_files(self.list_of_files)
-            return self.list_of_files
-        else:
-            # if already generated, just return the current list
-            return self.list_of_files
-
-
-    @property
-    def partitions(self):
-        '''returns list of partition objects'''
-        res = self._get_partitions()
-        parts = []
-        for each_partition in res:
-            if each_partition.flags == pytsk3.TSK_VS_PART_FLAG_ALLOC:
-                a = partition_object.PartitionItem(each_partition.start,
-                                                   each_partition.start + each_partition.len -1,
-                                                   each_partition.desc.decode())
-                a.files = [x for x in self.files if x.partition_sector == each_partition.start]
-                parts.append(a)
-        return parts
-
-    """Return a list of file objects"""
-    def get_list_of_files(self, list_of_files):
-        self.list_of_dir_inodes = []
-        self.list_of_folders = []
-        self.list_of_files = list_of_files
-
-        # is it a full disk or a volume?
-        fs_handle = self._try_getting_file_system_handle(offset=0)
-
-        if fs_handle:   # we just have a file system at this point, no partitions
+        # if already generated, just return the current list (read-only, only the accessor changes the file table)
+        if isinstance(self.list_of_files, FileTable):
+            return FileTableView(self.list_of_files)
+        return tuple(self.list_of_files)
 
-            self._get_list_of_files_from_volume(fs_handle)
 
-        else:
-            self._get_list_of_files_from_all_partitions()
-
-        # adds image path to all files
-        for each in list_of_files:
-            each.path_to_disk_image = self.path_to_image
-
-        return self.list_of_files
+    """Open a new image handle for the disk image (memory mapped if possible, unless a read cache is used)"""
+    def _open_image_handle(self):
+        if self.read_cache_size:
+            return file_Img_Info(self.path_to_image, self.read_cache_size)
+        try:
+            return mmap_Img_Info(self.path_to_image)
+        except (OSError, ValueError) as e:
+            # e.g. attached media (block devices can't be mapped by size)
+            logging.info('Memory mapping {} failed ({}), reading via TSK'.format(self.path_to_image, e))
+            return pytsk3.Img_Info(self.path_to_image)
 
 
-    def get_disk_image_sector(self, sector_number, sector_size=512):
-        f = open(self.path_to_image, 'rb')
-        f.seek(512*sector_number)
-        data = f.read(sector_size)
-        f.close()
-        return data
+class mmap_Img_Info(pytsk3.Img_Info):
+    """Raw disk image backed by a read-only memory mapping: reads are served from the page cache without seek/read
+    system calls and the mapping can be shared by several threads"""
+    def __init__(self, path_to_image):
+        self._file = open(path_to_image, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            self._file.close()
+            raise
+        super(mmap_Img_Info, self).__init__(
+            url="", type=pytsk3.TSK_IMG_TYPE_EXTERNAL)
 
+    def close(self):
+        self._mmap.close()
+        self._file.close()
 
-    def get_partition_sector(self, partiton_sector_offset, sector_number, sector_size=512):
-        f = open(self.path_to_image, 'rb')
-        f.seek(sector_size * partiton_sector_offset + sector_size * sector_number)
-        data = f.read(sector_size)
-        f.close()
-        return data
+    def read(self, offset, size):
+        return self._mmap[offset:offset + size]
 
-    def get_partition_block(self, partiton_sector_offset, block_number, block_size, sector_size=512):
-        logging.warning('Block size on FAT = sector size due to pytsk')
+    def get_size(self):
+        return len(self._mmap)
 
-        # if fs = FAT do something differnt.
-        # Find
 
+class file_Img_Info(pytsk3.Img_Info):
+    """Raw disk image read with positional reads (no shared file position between threads) through a chunk-aligned
+    read cache, e.g. for attached media or network storage where memory mapping is not possible or not desired"""
+    def __init__(self, path_to_image, read_cache_size):
+        self._fd = os.open(path_to_image, os.O_RDONLY)
+        self._size = os.lseek(self._fd, 0, os.SEEK_END)  # also works for block devices
+        self.read_cache = ChunkReadCache(self._read_from_file, self._size, cache_size=read_cache_size)
+        super(file_Img_Info, self).__init__(
+            url="", type=pytsk3.TSK_IMG_TYPE_EXTERNAL)
 
+    def close(self):
+        os.close(self._fd)
 
-        f = open(self.path_to_image, 'rb')
-        f.seek(sector_size * partiton_sector_offset + block_size * block_number)
-        data = f.read(block_size)
-        f.close()
-        return data
+    def _read_from_file(self, offset, size):
+        return os.pread(self._fd, size, offset)
 
-    """Return list of partitions in disk image"""
-    def _get_partitions(self):
-        img = pytsk3.Img_Info(self.path_to_image)
-        partition_table = pytsk3.Volume_Info(img)
-        return partition_table
+    def read(self, offset, size):
+        return self.read_cache.read(offset, size)
 
-    """Attempt to get a file system handle at specified offset"""
-    def _try_getting_file_system_handle(self, offset):
-        img = pytsk3.Img_Info(self.path_to_image)
-        try:
-            # get a handle to the file system
-            return pytsk3.FS_Info(img, offset=offset)
-        except OSError:
-            return None
-
-    def get_media_size(self):
-        img = pytsk3.Img_Info(self.path_to_image)
-        disk_size_bytes = img.get_size()
-        return disk_size_bytes
\ No newline at end of file
+    def get_size(self):
+        return self._size
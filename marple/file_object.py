@@ -1,6 +1,9 @@
 import time
 import hashlib
 
+# digests that can be computed for files (hashlib names, stored as hex digest in the FileItem field of the same name)
+SUPPORTED_HASH_ALGORITHMS = ('md5', 'sha1', 'sha256')
+
 class FileItem(object):
 
     def __init__(self, full_path, inode, file_size, partition_sector):
@@ -15,11 +18,22 @@ class FileItem(object):
         self.start_block = None
         self.blocks = []
         self.inode = inode
+        self.md5 = None
         self.sha1 = None
+        self.sha256 = None
         self.signature: bytes|None = None
+        self.accessor = None  # disk accessor the file was listed by (its file system handles are used for reads)
+        self.data_offset = None  # image offset of the first data block (if recorded while listing files)
+        self.resident_data = None  # leading bytes of resident data, e.g. of small NTFS files (if recorded)
 
         self.__bytes_read = 0  # keeps track of sequential file reads
 
+    def __getstate__(self):
+        # the accessor's image handles can't be pickled (e.g. for isolated plugins), it has to be set again
+        state = self.__dict__.copy()
+        state['accessor'] = None
+        return state
+
     def __str__(self):
         return "{}, {}".format(self.inode, self.full_path)
 
@@ -39,7 +53,9 @@ class FileItem(object):
         a['inode'] = self.inode
         a['file_size'] = self.file_size
         a['partition_sector'] = self.partition_sector
+        a['md5'] = self.md5
         a['sha1'] = self.sha1
+        a['sha256'] = self.sha256
         #a['signature'] = self.to_hex(self.signature)
         if self.signature is not None:
             a['signature'] = self.signature.hex()
@@ -62,7 +78,6 @@ class FileItem(object):
     def populate_hash_and_signature_field(self, signature_size=8,hash_size_limit=100000000, fs_handle=None):
         self.populate_signature_field(fs_handle=fs_handle)
         if self.file_size <= hash_size_limit:
-            print(f'Hashing file of size {self.file_size} at {time.time()}')
             self.__bytes_read = 0
             sha1 = hashlib.sha1()
 
@@ -72,7 +87,7 @@ class FileItem(object):
             # self.sha1 = sha1.hexdigest()
 
             # chunkwise hashing to not load big files in memory as whole
-            chunk_size = 1024
+            chunk_size = 1024 * 1024
 
             while True:
                 chunk = self.read(chunk_size,fs_handle)
@@ -101,7 +116,9 @@ class FileItem(object):
         if self.file_size == 0:
             return b''
 
-        if fs_handle is None:
+        if fs_handle is None and self.accessor is not None:
+            file_system_handle = self.accessor.get_file_system_handle(self.partition_sector)
+        elif fs_handle is None:
             import marple.disk_access
             # last=thisone
             # thisone= time.time()
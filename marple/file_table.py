@@ -0,0 +1,486 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Sequence
+
+from marple.file_object import FileItem, SUPPORTED_HASH_ALGORITHMS
+
+# snapshots (see FileTable.save_snapshot()) of another format version are not loaded, i.e. the file system is walked again
+SNAPSHOT_FORMAT_VERSION = 3
+SNAPSHOT_MAGIC = b'MDPFILES'
+_SNAPSHOT_HEADER = struct.Struct('<8sII')  # magic, format version, length of the JSON header
+_COLUMNS = ('_directory', '_name', '_inode', '_file_size', '_partition_sector', '_cr_time', '_m_time', '_a_time',
+            '_status', '_flags', '_data_offset')
+# timestamp columns: value of timestamps that are not set (None)
+_NO_TIMESTAMP = -(1 << 63)
+# signatures up to this size are stored in a fixed-width column (FileItem reads 8 bytes by default)
+SIGNATURE_COLUMN_WIDTH = 8
+
+
+class FileTableSnapshotError(ValueError):
+    pass
+
+
+class _FixedWidthColumn(object):
+    """
+    Optional values (bytes) of up to width bytes per file, stored in one bytearray plus one length byte per file
+    (length + 1, 0: not set) instead of one object per file. Allocated for all files once the first value is set.
+    Longer values (rare, e.g. larger signatures) and values that aren't bytes are kept in a dict.
+    """
+
+    def __init__(self, width):
+        self.width = width
+        self._data = bytearray()
+        self._lengths = bytearray()
+        self._overflow = {}  # file index -> value longer than width
+
+    def get(self, index):
+        length = self._lengths[index] if index < len(self._lengths) else 0
+        if not length:
+            return self._overflow.get(index)
+        start = index * self.width
+        return bytes(self._data[start:start + length - 1])
+
+    def set(self, index, value):
+        if index < len(self._lengths):
+            self._lengths[index] = 0
+        self._overflow.pop(index, None)
+        if value is None:
+            return
+        if not isinstance(value, (bytes, bytearray)) or len(value) > self.width:
+            self._overflow[index] = value
+            return
+        if index >= len(self._lengths):
+            no_new_files = index + 1 - len(self._lengths)
+            self._lengths.extend(bytes(no_new_files))
+            self._data.extend(bytes(no_new_files * self.width))
+        start = index * self.width
+        self._data[start:start + len(value)] = value
+        self._lengths[index] = len(value) + 1
+
+
+def _copy_column(column):
+    """returns an array with the values of a (memory mapped) column"""
+    copied_column = array(column.format)
+    copied_column.frombytes(column.cast('B'))
+    return copied_column
+
+
+class FileTable(object):
+    """
+    Columnar, array-backed list of the files of a disk image (replaces a list of FileItem objects).
+
+    Directory prefixes and file names are interned, i.e. each distinct directory path and name is stored once and
+    every file only stores two indexes. Inode, size, partition, timestamps, status and flags are kept in typed arrays,
+    hashes (raw digests) and signature in fixed-width byte columns.
+    Indexing and iteration return FileRow views, which behave like FileItems, so plugins work on either.
+    The index range of each partition's files is recorded while files are added (see files_of_partition()).
+    """
+
+    def __init__(self, path_to_disk_image=None, accessor=None):
+        self.path_to_disk_image = path_to_disk_image
+        self.accessor = accessor  # disk accessor the files were listed by (used for reads)
+
+        self._directories = []  # directory prefix (including the trailing '/') per directory index
+        self._directory_indexes = {}
+        self._names = []
+        self._name_indexes = {}
+
+        self._directory = array('I')
+        self._name = array('I')
+        self._inode = array('Q')
+        self._file_size = array('q')
+        self._partition_sector = array('q')
+        self._cr_time = array('q')
+        self._m_time = array('q')
+        self._a_time = array('q')
+        self._status = array('i')
+        self._flags = array('i')
+        self._data_offset = array('q')  # -1: not recorded
+
+        # raw digests (for each of SUPPORTED_HASH_ALGORITHMS) and leading bytes of the files
+        self._md5 = _FixedWidthColumn(hashlib.new('md5').digest_size)
+        self._sha1 = _FixedWidthColumn(hashlib.new('sha1').digest_size)
+        self._sha256 = _FixedWidthColumn(hashlib.new('sha256').digest_size)
+        self._signature = _FixedWidthColumn(SIGNATURE_COLUMN_WIDTH)
+        self._resident_data = {}  # file index -> leading bytes of resident data
+        self._other = {}  # (file index, attribute) -> value of rarely set attributes (id, meta_path, evidence_name)
+
+        self._partition_ranges = {}  # partition sector -> range of file indexes
+        self._partitions_contiguous = True  # False if files of a partition were not added one after another
+
+        self._snapshot = None  # memory mapped snapshot the columns are read from (see load_snapshot())
+
+    def __getstate__(self):
+        # the accessor's image handles can't be pickled (e.g. for isolated plugins), it has to be set again
+        state = self.__dict__.copy()
+        state['accessor'] = None
+        state['_directory_indexes'] = None
+        state['_name_indexes'] = None
+        if self._snapshot is not None:
+            # copies of the memory mapped columns are pickled, this table keeps reading them from the snapshot
+            for each_column in _COLUMNS:
+                state[each_column] = _copy_column(getattr(self, each_column))
+            state['_snapshot'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._directory_indexes = {each: i for i, each in enumerate(self._directories)}
+        self._name_indexes = {each: i for i, each in enumerate(self._names)}
+
+    def __len__(self):
+        return len(self._inode)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [FileRow(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('file table index out of range')
+        return FileRow(self, index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield FileRow(self, i)
+
+    def copy(self):
+        """returns a list of FileRow views of all files (like list.copy(), the table itself is not copied)"""
+        return list(self)
+
+    @classmethod
+    def from_files(cls, files):
+        """returns the FileTable of files (a FileTable, a view of a whole FileTable or any iterable of FileItems)"""
+        if isinstance(files, FileTable):
+            return files
+        if isinstance(files, FileTableView) and files.covers_table:
+            return files.table
+        table = cls()
+        table.extend(files)
+        return table
+
+    def files_of_partition(self, partition_sector):
+        """returns a read-only view of the files of a partition (a range lookup, unless files were added out of order)"""
+        if self._partitions_contiguous:
+            return FileTableView(self, self._partition_ranges.get(partition_sector, range(0)))
+        return FileTableView(self, [i for i in range(len(self)) if self._partition_sector[i] == partition_sector])
+
+    def _intern(self, value, values, indexes):
+        index = indexes.get(value)
+        if index is None:
+            index = len(values)
+            values.append(value)
+            indexes[value] = index
+        return index
+
+    def append(self, file_item):
+        """adds a FileItem (e.g. as yielded by GenericDiskAccessor.iter_files()) to the table"""
+        self._copy_columns_from_snapshot()
+        if self.path_to_disk_image is None:
+            self.path_to_disk_image = file_item.path_to_disk_image
+        if self.accessor is None:
+            self.accessor = file_item.accessor
+
+        directory, separator, name = file_item.full_path.rpartition('/')
+        self._directory.append(self._intern(directory + separator, self._directories, self._directory_indexes))
+        self._name.append(self._intern(name, self._names, self._name_indexes))
+        self._inode.append(file_item.inode)
+        self._file_size.append(file_item.file_size)
+        self._partition_sector.append(file_item.partition_sector)
+        for each_timestamp in ('cr_time', 'm_time', 'a_time'):
+            timestamp = file_item.timestamps.get(each_timestamp)
+            getattr(self, '_' + each_timestamp).append(timestamp if timestamp is not None else _NO_TIMESTAMP)
+        self._status.append(int(file_item.status) if getattr(file_item, 'status', None) is not None else -1)
+        self._flags.append(int(file_item.flags) if getattr(file_item, 'flags', None) is not None else -1)
+        data_offset = getattr(file_item, 'data_offset', None)
+        self._data_offset.append(data_offset if data_offset is not None else -1)
+
+        index = len(self) - 1
+        partition_range = self._partition_ranges.get(file_item.partition_sector)
+        if partition_range is None:
+            self._partition_ranges[file_item.partition_sector] = range(index, index + 1)
+        elif partition_range.stop == index:
+            self._partition_ranges[file_item.partition_sector] = range(partition_range.start, index + 1)
+        else:
+            self._partitions_contiguous = False
+
+        row = FileRow(self, index)
+        for each_algorithm in SUPPORTED_HASH_ALGORITHMS:
+            digest = getattr(file_item, each_algorithm, None)
+            if digest is not None:
+                setattr(row, each_algorithm, digest)
+        if file_item.signature is not None:
+            row.signature = file_item.signature
+        if getattr(file_item, 'resident_data', None) is not None:
+            self._resident_data[index] = file_item.resident_data
+        for each_attribute in ('id', 'meta_path', 'evidence_name'):
+            if getattr(file_item, each_attribute) is not None:
+                self._other[(index, each_attribute)] = getattr(file_item, each_attribute)
+
+    def extend(self, file_items):
+        for each_file in file_items:
+            self.append(each_file)
+
+    def save_snapshot(self, snapshot_path, key, data_locations=False, layout=None):
+        """
+        Writes the enumerated files (paths, inodes, sizes, partitions, timestamps, status, flags, data locations) to
+        snapshot_path, key identifies the disk image (e.g. its fingerprint). data_locations: whether the data locations
+        were collected while enumerating the files (see GenericDiskAccessor.collect_data_locations). layout: media size
+        and partition table of the disk image (see GenericDiskAccessor.get_disk_layout()), checked by load_snapshot().
+        Hashes, signature and other set attributes are not saved.
+        The file is written under a temporary name and then renamed, i.e. a snapshot is either complete or missing.
+        """
+        self._copy_columns_from_snapshot()
+        sections = [('directories', json.dumps(self._directories).encode('utf-8')),
+                    ('names', json.dumps(self._names).encode('utf-8')),
+                    ('resident_data', json.dumps({index: data.hex()
+                                                  for index, data in self._resident_data.items()}).encode('utf-8'))]
+        sections += [(each_column, getattr(self, each_column).tobytes()) for each_column in _COLUMNS]
+
+        header = {'key': key,
+                  'byteorder': sys.byteorder,
+                  'typecodes': {each: [getattr(self, each).typecode, getattr(self, each).itemsize] for each in _COLUMNS},
+                  'no_files': len(self),
+                  'partition_ranges': [[sector, r.start, r.stop] for sector, r in self._partition_ranges.items()],
+                  'partitions_contiguous': self._partitions_contiguous,
+                  'data_locations': data_locations,
+                  'layout': layout,
+                  'sections': {}}
+        offset = 0
+        for each_name, each_data in sections:
+            header['sections'][each_name] = [offset, len(each_data)]
+            offset += len(each_data) + (-len(each_data) % 8)  # columns are 8 byte aligned
+        header_data = json.dumps(header).encode('utf-8')
+        header_data += b' ' * (-(_SNAPSHOT_HEADER.size + len(header_data)) % 8)
+
+        temporary_path = '{}.{}.tmp'.format(snapshot_path, os.getpid())
+        with open(temporary_path, 'wb') as f:
+            f.write(_SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION, len(header_data)))
+            f.write(header_data)
+            for each_name, each_data in sections:
+                f.write(each_data)
+                f.write(b'\0' * (-len(each_data) % 8))
+        os.replace(temporary_path, snapshot_path)
+
+    @classmethod
+    def load_snapshot(cls, snapshot_path, key, path_to_disk_image=None, accessor=None, data_locations=False,
+                      layout=None):
+        """
+        Returns the FileTable saved in snapshot_path (see save_snapshot()). The numeric columns are read directly from
+        a memory mapping of the snapshot (copied into arrays only if the table is changed or pickled).
+        Raises FileTableSnapshotError if the snapshot is of another format version, platform or key (disk image), of a
+        disk image with another layout (if given), or was saved without data locations although data_locations is True.
+        """
+        with open(snapshot_path, 'rb') as f:
+            snapshot = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if len(snapshot) < _SNAPSHOT_HEADER.size:
+                raise FileTableSnapshotError('Snapshot {} is truncated'.format(snapshot_path))
+            magic, format_version, header_length = _SNAPSHOT_HEADER.unpack_from(snapshot)
+            if magic != SNAPSHOT_MAGIC:
+                raise FileTableSnapshotError('{} is not a file table snapshot'.format(snapshot_path))
+            if format_version != SNAPSHOT_FORMAT_VERSION:
+                raise FileTableSnapshotError('Snapshot {} has format version {} (expected {})'.format(
+                    snapshot_path, format_version, SNAPSHOT_FORMAT_VERSION))
+            header = json.loads(snapshot[_SNAPSHOT_HEADER.size:_SNAPSHOT_HEADER.size + header_length])
+            if header['key'] != key:
+                raise FileTableSnapshotError('Snapshot {} belongs to another disk image'.format(snapshot_path))
+            if data_locations and not header.get('data_locations', False):
+                raise FileTableSnapshotError('Snapshot {} was saved without data locations'.format(snapshot_path))
+            if layout is not None and header.get('layout') != layout:
+                raise FileTableSnapshotError('Snapshot {} belongs to a disk image of another size or partition '
+                                             'layout'.format(snapshot_path))
+
+            table = cls(path_to_disk_image, accessor)
+            if header['byteorder'] != sys.byteorder or \
+                    any([getattr(table, each).typecode, getattr(table, each).itemsize] != header['typecodes'][each]
+                        for each in _COLUMNS):
+                raise FileTableSnapshotError('Snapshot {} was written on another platform'.format(snapshot_path))
+
+            data_start = _SNAPSHOT_HEADER.size + header_length
+            if data_start + max(offset + length for offset, length in header['sections'].values()) > len(snapshot):
+                raise FileTableSnapshotError('Snapshot {} is truncated'.format(snapshot_path))
+        except (KeyError, TypeError, ValueError, struct.error) as e:
+            snapshot.close()
+            if isinstance(e, FileTableSnapshotError):
+                raise
+            raise FileTableSnapshotError('Snapshot {} is corrupted ({})'.format(snapshot_path, e))
+
+        data = memoryview(snapshot)
+        sections = {each_name: data[data_start + offset:data_start + offset + length]
+                    for each_name, (offset, length) in header['sections'].items()}
+        table._directories = json.loads(bytes(sections['directories']))
+        table._names = json.loads(bytes(sections['names']))
+        table._resident_data = {int(index): bytes.fromhex(data)
+                                for index, data in json.loads(bytes(sections['resident_data'])).items()}
+        table._directory_indexes = None  # only needed if files are added, built then
+        table._name_indexes = None
+        for each_column in _COLUMNS:
+            setattr(table, each_column, sections[each_column].cast(getattr(table, each_column).typecode))
+        if any(len(getattr(table, each_column)) != header['no_files'] for each_column in _COLUMNS):
+            raise FileTableSnapshotError('Snapshot {} is corrupted (column lengths differ)'.format(snapshot_path))
+        table._partition_ranges = {sector: range(start, stop) for sector, start, stop in header['partition_ranges']}
+        table._partitions_contiguous = header['partitions_contiguous']
+        table._snapshot = snapshot
+        return table
+
+    def _copy_columns_from_snapshot(self):
+        # memory mapped columns are read-only and can't be pickled
+        if self._snapshot is None:
+            return
+        for each_column in _COLUMNS:
+            setattr(self, each_column, _copy_column(getattr(self, each_column)))
+        self._directory_indexes = {each: i for i, each in enumerate(self._directories)}
+        self._name_indexes = {each: i for i, each in enumerate(self._names)}
+        self._snapshot = None  # closed once the remaining views of it are released
+
+
+class FileTableView(Sequence):
+    """Read-only sequence of FileRow views of (some of) the files of a FileTable, nothing is copied"""
+
+    def __init__(self, table, indexes=None):
+        self.table = table
+        self._indexes = range(len(table)) if indexes is None else indexes  # range, list or array of file indexes
+
+    def __len__(self):
+        return len(self._indexes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return FileTableView(self.table, self._indexes[index])
+        return FileRow(self.table, self._indexes[index])
+
+    def __iter__(self):
+        table = self.table
+        for i in self._indexes:
+            yield FileRow(table, i)
+
+    def __repr__(self):
+        return '<FileTableView of {} files>'.format(len(self))
+
+    @property
+    def covers_table(self):
+        return self._indexes == range(len(self.table))
+
+
+def _column_property(column_name):
+    return property(lambda self: getattr(self._table, column_name)[self._index])
+
+
+def _bytes_property(column_name):
+    def getter(self):
+        return getattr(self._table, column_name).get(self._index)
+
+    def setter(self, value):
+        getattr(self._table, column_name).set(self._index, value)
+    return property(getter, setter)
+
+
+def _digest_property(column_name):
+    # hex digests are stored as raw bytes (a digest that isn't valid hex is kept as is)
+    def getter(self):
+        digest = getattr(self._table, column_name).get(self._index)
+        return digest.hex() if isinstance(digest, bytes) else digest
+
+    def setter(self, value):
+        if value is not None:
+            try:
+                value = bytes.fromhex(value)
+            except ValueError:
+                pass
+        getattr(self._table, column_name).set(self._index, value)
+    return property(getter, setter)
+
+
+def _other_property(attribute):
+    def getter(self):
+        return self._table._other.get((self._index, attribute))
+
+    def setter(self, value):
+        self._table._other[(self._index, attribute)] = value
+    return property(getter, setter)
+
+
+class FileRow(FileItem):
+    """
+    View of a single file in a FileTable, usable wherever a FileItem is expected (the values live in the table).
+    Hashes, signature, id, meta_path and evidence_name can be set, the other attributes are read-only.
+    """
+    _FileItem__bytes_read = 0  # position of sequential reads (set on the row once it is read)
+
+    def __init__(self, table, index):
+        # no FileItem.__init__(), all attributes are read from the table
+        self._table = table
+        self._index = index
+
+    def __reduce__(self):
+        # rows of the same table share the pickled table
+        return FileRow, (self._table, self._index)
+
+    @property
+    def full_path(self):
+        return self._table._directories[self._table._directory[self._index]] + \
+            self._table._names[self._table._name[self._index]]
+
+    inode = _column_property('_inode')
+    file_size = _column_property('_file_size')
+    partition_sector = _column_property('_partition_sector')
+
+    @property
+    def timestamps(self):
+        timestamps = {'cr_time': self._table._cr_time[self._index],
+                      'm_time': self._table._m_time[self._index],
+                      'a_time': self._table._a_time[self._index]}
+        return {key: value if value != _NO_TIMESTAMP else None for key, value in timestamps.items()}
+
+    @property
+    def status(self):
+        status = self._table._status[self._index]
+        return status if status >= 0 else None
+
+    @property
+    def flags(self):
+        flags = self._table._flags[self._index]
+        return flags if flags >= 0 else None
+
+    @property
+    def data_offset(self):
+        data_offset = self._table._data_offset[self._index]
+        return data_offset if data_offset >= 0 else None
+
+    @property
+    def resident_data(self):
+        return self._table._resident_data.get(self._index)
+
+    md5 = _digest_property('_md5')
+    sha1 = _digest_property('_sha1')
+    sha256 = _digest_property('_sha256')
+    signature = _bytes_property('_signature')
+    id = _other_property('id')
+    meta_path = _other_property('meta_path')
+    evidence_name = _other_property('evidence_name')
+
+    @property
+    def path_to_disk_image(self):
+        return self._table.path_to_disk_image
+
+    @property
+    def accessor(self):
+        return self._table.accessor
+
+    @accessor.setter
+    def accessor(self, accessor):
+        self._table.accessor = accessor
+
+    @property
+    def start_block(self):
+        return None
+
+    @property
+    def blocks(self):
+        return []
@@ -0,0 +1,70 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# number of consecutive chunks read before read-ahead starts
+SEQUENTIAL_THRESHOLD = 2
+
+
+class ReadAhead(object):
+    """
+    Reads the chunks following a sequential access pattern in background threads (used by ChunkReadCache).
+
+    Each thread opens its own reader via open_reader() (e.g. its own pyewf handle, as a single handle serializes all
+    reads), so that several EWF chunks are decompressed in parallel. At most depth chunks are read ahead at a time.
+    """
+
+    def __init__(self, open_reader, workers=4, depth=32):
+        self._open_reader = open_reader  # () -> (read function (offset, size) -> bytes, close function)
+        self.depth = depth
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='read_ahead')
+        self._local = threading.local()
+        self._readers = []  # (read function, close function) of all threads
+        self._pending = {}  # chunk index -> future
+        self._lock = threading.Lock()
+        self.hits = 0  # chunks requested while still being read ahead
+
+    def _read(self, offset, size):
+        reader = getattr(self._local, 'reader', None)
+        if reader is None:
+            reader = self._open_reader()
+            self._local.reader = reader
+            with self._lock:
+                self._readers.append(reader)
+        return reader[0](offset, size)
+
+    def _read_chunk(self, chunk_index, offset, size, store_chunk):
+        try:
+            chunk = self._read(offset, size)
+            store_chunk(chunk_index, chunk)
+            return chunk
+        finally:
+            with self._lock:
+                self._pending.pop(chunk_index, None)
+
+    def schedule(self, chunks, store_chunk):
+        """starts reading the given (chunk index, offset, size) in the background (as long as less than depth chunks
+        are pending), store_chunk(chunk index, bytes) is called for each chunk read"""
+        with self._lock:
+            for chunk_index, offset, size in chunks:
+                if len(self._pending) >= self.depth:
+                    break
+                if chunk_index in self._pending:
+                    continue
+                self._pending[chunk_index] = self._executor.submit(self._read_chunk, chunk_index, offset, size,
+                                                                   store_chunk)
+
+    def get_pending(self, chunk_index):
+        """returns the future of a chunk currently read ahead (None if not pending)"""
+        with self._lock:
+            future = self._pending.get(chunk_index)
+            if future is not None:
+                self.hits += 1
+            return future
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        with self._lock:
+            for _, close_reader in self._readers:
+                close_reader()
+            self._readers = []
+            self._pending = {}
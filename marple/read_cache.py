@@ -0,0 +1,116 @@
+import threading
+from collections import OrderedDict
+
+from marple.read_ahead import SEQUENTIAL_THRESHOLD
+
+# EWF images are compressed in chunks of 64 sectors by default
+DEFAULT_CHUNK_SIZE = 32 * 1024
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024
+
+# reads spanning more chunks bypass the cache and read-ahead (e.g. hashing large files would only evict useful chunks,
+# and a single large read is served faster by the read function than chunk by chunk)
+MAX_CACHED_CHUNKS_PER_READ = 8
+
+
+class ChunkReadCache(object):
+    """
+    LRU cache of fixed-size, aligned chunks of a disk image, layered in front of an image read function.
+
+    TSK issues many small reads for metadata (e.g. MFT entries, directory indexes) that fall into the same chunk,
+    for EWF images every such read would decompress the whole chunk again.
+    Thread-safe, hits and misses are counted (see stats).
+    With a ReadAhead, the chunks following sequential reads are read into the cache in the background.
+    """
+
+    def __init__(self, read_function, media_size, chunk_size=DEFAULT_CHUNK_SIZE, cache_size=DEFAULT_CACHE_SIZE,
+                 read_ahead=None):
+        self._read_function = read_function  # (offset, size) -> bytes
+        self._media_size = media_size
+        self.chunk_size = chunk_size
+        self.max_chunks = max(1, cache_size // chunk_size)
+        self._chunks = OrderedDict()  # chunk index -> bytes, least recently used first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.read_ahead = read_ahead
+        self._last_chunk_index = None
+        self._sequential_chunks = 0
+
+    def _get_chunk(self, chunk_index):
+        with self._lock:
+            chunk = self._chunks.get(chunk_index)
+            if chunk is not None:
+                self._chunks.move_to_end(chunk_index)
+                self.hits += 1
+                return chunk
+
+        pending_chunk = self.read_ahead.get_pending(chunk_index) if self.read_ahead is not None else None
+        if pending_chunk is not None:
+            return pending_chunk.result()
+
+        chunk_offset = chunk_index * self.chunk_size
+        chunk = self._read_function(chunk_offset, min(self.chunk_size, self._media_size - chunk_offset))
+        with self._lock:
+            self.misses += 1
+        self._store_chunk(chunk_index, chunk)
+        return chunk
+
+    def _store_chunk(self, chunk_index, chunk):
+        with self._lock:
+            self._chunks[chunk_index] = chunk
+            self._chunks.move_to_end(chunk_index)
+            while len(self._chunks) > self.max_chunks:
+                self._chunks.popitem(last=False)
+
+    def _track_access(self, first_chunk_index, last_chunk_index):
+        """detects sequential reads and schedules reading the following chunks ahead"""
+        with self._lock:
+            if self._last_chunk_index is not None and \
+                    self._last_chunk_index <= first_chunk_index <= self._last_chunk_index + 1:
+                self._sequential_chunks += last_chunk_index - self._last_chunk_index
+            else:
+                self._sequential_chunks = 0
+            self._last_chunk_index = last_chunk_index
+            if self._sequential_chunks < SEQUENTIAL_THRESHOLD:
+                return
+            no_chunks = (self._media_size + self.chunk_size - 1) // self.chunk_size
+            upcoming_chunk_indexes = [each_chunk_index for each_chunk_index in
+                                      range(last_chunk_index + 1,
+                                            min(last_chunk_index + 1 + self.read_ahead.depth, no_chunks))
+                                      if each_chunk_index not in self._chunks]
+        self.read_ahead.schedule([(each_chunk_index, each_chunk_index * self.chunk_size,
+                                   min(self.chunk_size, self._media_size - each_chunk_index * self.chunk_size))
+                                  for each_chunk_index in upcoming_chunk_indexes], self._store_chunk)
+
+    def read(self, offset, size):
+        if size <= 0 or offset >= self._media_size:
+            return b''
+        size = min(size, self._media_size - offset)
+
+        first_chunk_index = offset // self.chunk_size
+        last_chunk_index = (offset + size - 1) // self.chunk_size
+        if last_chunk_index - first_chunk_index + 1 > MAX_CACHED_CHUNKS_PER_READ:
+            return self._read_function(offset, size)
+        if self.read_ahead is not None:
+            self._track_access(first_chunk_index, last_chunk_index)
+
+        start = offset - first_chunk_index * self.chunk_size
+        if first_chunk_index == last_chunk_index:
+            return self._get_chunk(first_chunk_index)[start:start + size]
+        data = b''.join(self._get_chunk(each_chunk_index)
+                        for each_chunk_index in range(first_chunk_index, last_chunk_index + 1))
+        return data[start:start + size]
+
+    def clear(self):
+        with self._lock:
+            self._chunks.clear()
+
+    @property
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'cached_chunks': len(self._chunks),
+                'read_ahead_hits': self.read_ahead.hits if self.read_ahead is not None else None}
@@ -1,31 +1,64 @@
 import argparse
+import json
 import logging
+import multiprocessing
 import os.path
+import sqlite3
 import sys
+import threading
 import time
 import traceback
 import sys
 
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
-import pyewf
-
 try:
-    from config.config import populate_file_signatures, populate_file_hashes_and_signatures
+    import config.config
 except ModuleNotFoundError:
     logging.error("Config file not found. Ensure that /config/.config.py exists (usually you need to copy config_example.py to "
                   "config.py and edit it).")
     sys.exit(-1)
 
+import config.config_example
+
+# options added in later versions are missing in a config.py copied from an older config_example.py, their defaults from
+# config_example.py are used (set before any module imports options from config.config)
+_missing_config_options = [each for each in vars(config.config_example)
+                           if not each.startswith('_') and not hasattr(config.config, each)]
+for each_option in _missing_config_options:
+    setattr(config.config, each_option, getattr(config.config_example, each_option))
+if _missing_config_options and __name__ == '__main__':
+    logging.warning("Options missing in config/config.py, using the defaults of config_example.py (add them to "
+                    "config.py to change them): {}".format(', '.join(_missing_config_options)))
+
+from config.config import populate_file_signatures, populate_file_hashes_and_signatures, use_result_cache, \
+    result_cache_path, result_cache_max_size_mb, plugin_timings_path, isolated_plugins, plugin_timeout_seconds, \
+    plugin_memory_limit_mb, max_disk_images_per_worker, image_discovery_cache_path, path_to_nsrl, \
+    path_to_nsrl_index, use_file_list_snapshots, hash_algorithms
+
 
 import mdp_lib.disk_image_info
 import mdp_lib.mdp_plugin
+from mdp_lib.file_hashing import validate_hash_algorithms
+from mdp_lib.file_visitor import run_file_visitors
+from mdp_lib.image_discovery import ImageDiscovery
+from mdp_lib.image_fingerprint import get_image_fingerprint
+from mdp_lib.image_scheduling import estimate_disk_image_cost, order_longest_first, estimate_makespan, \
+    probe_partitions
+from mdp_lib.nsrl_index import build_nsrl_index, get_nsrl_hash_algorithms, get_lookup_hash_algorithm
+from mdp_lib.plugin_timings import PluginTimings
+from mdp_lib.plugin_isolation import run_plugin_isolated
+from mdp_lib.plugin_scheduler import run_plugins_concurrently
+from mdp_lib.result_cache import ResultCache
 
 
 from config.plugin_config import enabled_plugins
 from plugin_registry import load_enabled_plugins
+from utils.run_manifest import RunManifest
 from utils.write_to_file import generate_result_file_names, write_single_evidence_results_to_json, \
-    write_single_evidence_results_to_tsv, generate_summary_table_dict
+    write_single_evidence_results_to_tsv, generate_summary_table_dict, generate_run_id, generate_manifest_file_name, \
+    generate_plan_file_name
 
 
 def parse_args():
@@ -35,14 +68,50 @@ def parse_args():
     # --output (path for output
 
     parser = argparse.ArgumentParser()
-    parser.add_argument("basepath", type=Path, help="Absolute path to the directory containing all case folders. Each "
+    parser.add_argument("basepath", type=Path, nargs='?', help="Absolute path to the directory containing all case folders. Each "
                                                     "case must have a 'data' subfolder containing the digital "
                                                     "evidence (i.e. the .dd or .E01, .E02, ... files.")
     parser.add_argument("--debug", action="store_true", help="Show full traceback for errors")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of disk images processed in parallel (each in "
+                                                            "its own worker process). Default: 1 (sequential)")
+    parser.add_argument("--plugin-threads", type=int, default=1, help="Number of plugins run concurrently on a "
+                                                                      "single disk image. Default: 1 (sequential)")
+    parser.add_argument("--resume", metavar="RUN_ID", help="Resume an interrupted run (RUN_ID is the timestamp prefix "
+                                                           "of the run's output files, e.g. 2025-01-31_12-00-00). "
+                                                           "Completed work is skipped and missing rows are appended "
+                                                           "to the run's existing JSON/TSV outputs.")
+    parser.add_argument("--plan", action="store_true", help="Only estimate the processing time of each disk image and "
+                                                            "plugin (from media sizes and plugin timings of previous "
+                                                            "runs) without processing the disk images")
+    parser.add_argument("--rebuild-index", action="store_true", help="Walk the file systems of all disk images again "
+                                                                     "and replace their file list snapshots (see "
+                                                                     "use_file_list_snapshots in config.py)")
+    parser.add_argument("--invalidate-cache", metavar="PLUGIN_NAME", nargs='*', help="Remove cached plugin results "
+                                                                                    "(of the given plugins, or all "
+                                                                                    "cached results) and exit")
+    parser.add_argument("--build-nsrl-index", action="store_true", help="Export the digests of the NSRL database "
+                                                                        "(path_to_nsrl in config.py, the strongest of "
+                                                                        "hash_algorithms it has) to a sorted hash "
+                                                                        "index (path_to_nsrl_index) and exit")
     args = parser.parse_args()
+    if args.invalidate_cache is not None or args.build_nsrl_index:
+        return args
+    if args.basepath is None:
+        parser.error("the following arguments are required: basepath")
     if not args.basepath.exists() or not args.basepath.is_dir():
         print("Basepath provided doesn't exist or is not a directory.")
         sys.exit(1)
+    if args.jobs < 1 or args.plugin_threads < 1:
+        print("Number of jobs and plugin threads must be at least 1.")
+        sys.exit(1)
+    try:
+        # checked once here, the hash algorithms are used as column names of the file list databases
+        validate_hash_algorithms(hash_algorithms)
+    except ValueError as e:
+        parser.error(f"hash_algorithms in config.py: {e}")
+    if args.rebuild_index and not use_file_list_snapshots:
+        parser.error("--rebuild-index requires use_file_list_snapshots = True in config.py "
+                     "(without snapshots, the file systems are walked on every run anyway)")
 
     return args
 
@@ -57,55 +126,214 @@ def setup_logging(log_filename):
     )
 
 
-def initialize_disk_image(each_disk_image: dict[str, str], current_error_summary, debug_mode=False):
+def initialize_disk_image(each_disk_image: dict[str, str], current_error_summary, debug_mode=False,
+                          rebuild_index=False):
     each_disk_image_path = each_disk_image['path']
     each_disk_image_target_folder = each_disk_image['target_folder']
     each_disk_image_object = None
+
+    print('=============================================')
+    print('processing {}...'.format(each_disk_image_path))
+    print('=============================================')
+
+    print('Initializing disk image:', each_disk_image_path)
+    print('...', end=' ')
+
     try:
-        ewf_chunks = pyewf.glob(each_disk_image_path)
+        each_disk_image_object = mdp_lib.disk_image_info.TargetDiskImage(each_disk_image_path,
+                                                                          rebuild_file_list=rebuild_index)
+        each_disk_image_object.base_path = each_disk_image_target_folder
+        print('Initialized')
+
+        if populate_file_hashes_and_signatures:
+            print('Computing file hashes and retrieving file signatures ...')
+            each_disk_image_object.populate_file_hashes_and_signatures()
+        elif populate_file_signatures and not populate_file_hashes_and_signatures:
+            print('Retrieving file signatures ...')
+            each_disk_image_object.populate_file_signatures()
+
+        print('File hashes computed: ', populate_file_hashes_and_signatures)
+        print('File signatures retrieved: ', populate_file_signatures)
     except Exception as e:
-        ewf_chunks = None
-        # print("No EWF disk image found at: {}".format(each_disk_image_path))
-
-    if not each_disk_image_path.endswith('.DS_Store'):  # mac os necessity
-        if (
-                not ewf_chunks                              # not an EWF image (i.e. dd or any other file extension)
-                or len(ewf_chunks) == 1                     # single chunk EWF file
-                or each_disk_image_path == ewf_chunks[0]    # first fragment of a multi-chunk EWF file
-        ):
-            print('=============================================')
-            print('processing {}...'.format(each_disk_image_path))
-            print('=============================================')
-
-            print('Initializing disk image:', each_disk_image_path)
-            print('...', end=' ')
+        current_error_summary.append((each_disk_image_path, 'Disk Image Initialization', e))
+        if debug_mode:
+            print(f'Initialization of Disk Image failed: {each_disk_image_path}: {e}')
+            print(f'Full traceback:\n{traceback.format_exc()}')
+        else:
+            tb = traceback.extract_tb(sys.exc_info()[2])[-1]
+            print(f'Initialization of Disk Image failed: {each_disk_image_path}: {e}')
+    return each_disk_image_object
 
-            try:
-                each_disk_image_object = mdp_lib.disk_image_info.TargetDiskImage(each_disk_image_path)
-                each_disk_image_object.base_path = each_disk_image_target_folder
-                print('Initialized')
-
-                if populate_file_hashes_and_signatures:
-                    print('Computing file hashes and retrieving file signatures ...')
-                    each_disk_image_object.populate_file_hashes_and_signatures()
-                elif populate_file_signatures and not populate_file_hashes_and_signatures:
-                    print('Retrieving file signatures ...')
-                    each_disk_image_object.populate_file_signatures()
-
-                print('File hashes computed: ', populate_file_hashes_and_signatures)
-                print('File signatures retrieved: ', populate_file_signatures)
-            except Exception as e:
-                current_error_summary.append((each_disk_image_path, 'Disk Image Initialization', e))
-                if debug_mode:
-                    print(f'Initialization of Disk Image failed: {each_disk_image_path}: {e}')
-                    print(f'Full traceback:\n{traceback.format_exc()}')
-                else:
-                    tb = traceback.extract_tb(sys.exc_info()[2])[-1]
-                    print(f'Initialization of Disk Image failed: {each_disk_image_path}: {e}')
-        # else:
-        #    print('skipping Exx fragment ({}) - handled with E01...'.format(each_disk_image_path))
 
-    return each_disk_image_object
+def process_single_disk_image(each_disk_image: dict[str, str], plugin_classes, debug_mode=False, plugin_threads=1,
+                              completed_results=None, plugin_result_callback=None, rebuild_index=False):
+    """initializes a single disk image and runs all plugins on it,
+    returns the list of MDPResults (None if the disk image was not processed) and the errors that occurred
+
+    completed_results: MDPResults (by plugin name) of plugins that already completed on this disk image,
+                       e.g. in an interrupted run -> these plugins are not run again
+    plugin_result_callback: called with (disk image path, MDPResult) for each newly completed plugin
+    rebuild_index: walk the file systems even if a file list snapshot exists"""
+    completed_results = completed_results if completed_results else {}
+    current_error_summary = []
+    new_results = {}
+
+    plugins_to_run = [each_plugin for each_plugin in plugin_classes if each_plugin.name not in completed_results]
+    if plugins_to_run or not completed_results:
+        each_disk_image_object = initialize_disk_image(each_disk_image, current_error_summary, debug_mode,
+                                                       rebuild_index)
+        if not each_disk_image_object:
+            return None, current_error_summary
+
+        # the disk image's handles are released once all plugins are done
+        with each_disk_image_object:
+            # plugins using the file visitor API are run with a single pass over the file list (unless isolated)
+            visitor_plugins = [each_plugin for each_plugin in plugins_to_run
+                               if each_plugin.file_selectors and each_plugin.name not in isolated_plugins]
+            visited_results = {}
+            if len(visitor_plugins) > 1:
+                print(f'- visiting file list once for {len(visitor_plugins)} plugins')
+                visit_start_time = time.time()
+                visited_results = dict(zip(visitor_plugins,
+                                           run_file_visitors(each_disk_image_object, visitor_plugins)))
+                # time of the shared pass is split between the plugins
+                visit_time = (time.time() - visit_start_time) / len(visitor_plugins)
+                for each_result in visited_results.values():
+                    if not issubclass(type(each_result), Exception):
+                        each_result.processing_time = visit_time
+
+            def run_plugin(plugin):
+                res = process_disk_image(each_disk_image_object, plugin, visited_results.get(plugin))
+                if plugin_result_callback and not issubclass(type(res), Exception):
+                    plugin_result_callback(each_disk_image['path'], res)
+                return res
+
+            if plugin_threads > 1:
+                plugin_results = run_plugins_concurrently(plugins_to_run, run_plugin, plugin_threads)
+            else:
+                plugin_results = [run_plugin(each_plugin) for each_plugin in plugins_to_run]
+        for each_plugin, res in zip(plugins_to_run, plugin_results):
+            if issubclass(type(res), Exception):
+                current_error_summary.append((each_disk_image['path'], each_plugin.name, res))
+            else:
+                new_results[each_plugin.name] = res
+    else:
+        print(f'All plugins already completed for {each_disk_image["path"]}, using previous results.')
+
+    # keep the order of the enabled plugins for the outputs
+    each_disk_image_results = []
+    for each_plugin in plugin_classes:
+        res = completed_results.get(each_plugin.name, new_results.get(each_plugin.name))
+        if res is not None:
+            each_disk_image_results.append(res)
+    return each_disk_image_results, current_error_summary
+
+
+# plugin instances of a worker process (loaded once per worker in __initialize_worker)
+__worker_plugin_classes = []
+# queue of a worker process for (disk image path, MDPResult) of each completed plugin, consumed by the main process
+__worker_result_queue = None
+
+
+def __initialize_worker(enabled_plugin_names, log_filename, result_queue=None):
+    global __worker_plugin_classes, __worker_result_queue
+    setup_logging(log_filename)
+    __worker_plugin_classes = load_enabled_plugins(enabled_plugin_names)
+    __worker_result_queue = result_queue
+
+
+def __send_plugin_result_from_worker(disk_image_path, result):
+    __worker_result_queue.put((disk_image_path, result))
+
+
+def __process_single_disk_image_in_worker(each_disk_image: dict[str, str], debug_mode=False, plugin_threads=1,
+                                          completed_results=None, rebuild_index=False):
+    """runs in a worker process: builds its own TargetDiskImage and only returns plain MDPResult data
+    (each plugin's result is also sent to the main process as soon as the plugin completes)"""
+    plugin_result_callback = __send_plugin_result_from_worker if __worker_result_queue is not None else None
+    return process_single_disk_image(each_disk_image, __worker_plugin_classes, debug_mode, plugin_threads,
+                                     completed_results, plugin_result_callback, rebuild_index)
+
+
+def __record_plugin_results(result_queue, plugin_result_callback):
+    """runs in a thread of the main process: passes plugin results sent by the workers to plugin_result_callback
+    until None is received"""
+    for each_disk_image_path, each_result in iter(result_queue.get, None):
+        try:
+            plugin_result_callback(each_disk_image_path, each_result)
+        except Exception as e:
+            logging.error(f'Recording result of {each_result.plugin_name} for {each_disk_image_path} failed: {e}')
+
+
+def __process_disk_images_in_parallel(disk_images, jobs, log_filename, get_completed_results, debug_mode=False,
+                                      plugin_threads=1, rebuild_index=False, plugin_result_callback=None):
+    """processes whole disk images in a process pool, yields (disk image, results, errors) as images complete
+
+    plugin_result_callback: called in the main process with (disk image path, MDPResult) for each plugin as soon as
+                            it completes in a worker, i.e. results survive workers dying later on the same image"""
+    executor_options = {}
+    if max_disk_images_per_worker and sys.version_info >= (3, 11):
+        # replace workers regularly, so that memory leaked while processing disk images doesn't build up
+        executor_options['max_tasks_per_child'] = max_disk_images_per_worker
+    # the pool starts its workers with spawn if they are replaced, the result queue has to use the same context
+    context = multiprocessing.get_context('spawn' if 'max_tasks_per_child' in executor_options else None)
+    result_queue = None
+    result_thread = None
+    if plugin_result_callback:
+        result_queue = context.Queue()
+        result_thread = threading.Thread(target=__record_plugin_results, args=(result_queue, plugin_result_callback),
+                                         name='plugin_results', daemon=True)
+        result_thread.start()
+    try:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=__initialize_worker,
+                                 initargs=(enabled_plugins, log_filename, result_queue), mp_context=context,
+                                 **executor_options) as executor:
+            futures = {executor.submit(__process_single_disk_image_in_worker, each_disk_image, debug_mode,
+                                       plugin_threads, get_completed_results(each_disk_image),
+                                       rebuild_index): each_disk_image
+                       for each_disk_image in disk_images}
+            for future in as_completed(futures):
+                each_disk_image = futures[future]
+                try:
+                    each_disk_image_results, errors = future.result()
+                except Exception as e:
+                    # e.g. worker process died or results could not be transferred back to the main process
+                    each_disk_image_results, errors = None, [(each_disk_image['path'], 'Worker Process', e)]
+                yield each_disk_image, each_disk_image_results, errors
+    finally:
+        if result_queue is not None:
+            result_queue.put(None)
+            result_thread.join()
+            result_queue.close()
+
+
+def invalidate_result_cache(plugin_names):
+    result_cache = ResultCache(result_cache_path, result_cache_max_size_mb * 1024 * 1024)
+    no_removed_results = result_cache.invalidate(plugin_names)
+    result_cache.close()
+    if plugin_names:
+        print(f'Removed {no_removed_results} cached results of plugins {plugin_names} from {result_cache_path}.')
+    else:
+        print(f'Removed all {no_removed_results} cached results from {result_cache_path}.')
+
+
+def build_nsrl_hash_index():
+    if not path_to_nsrl or not os.path.exists(path_to_nsrl):
+        print('NSRL database not found (set path_to_nsrl in config.py).')
+        sys.exit(1)
+    # the digests the non-NSRL file count looks up (see NumberOfFiles.lookup_files_in_nsrl())
+    conn = sqlite3.connect(f'file:{path_to_nsrl}?mode=ro', uri=True)
+    try:
+        hash_algorithm = get_lookup_hash_algorithm(get_nsrl_hash_algorithms(conn), hash_algorithms)
+    finally:
+        conn.close()
+    if hash_algorithm is None:
+        print(f'The NSRL database has none of the digests of hash_algorithms {hash_algorithms} (see config.py).')
+        sys.exit(1)
+    build_start = time.time()
+    no_digests = build_nsrl_index(path_to_nsrl, path_to_nsrl_index, hash_algorithm)
+    print(f'Exported {no_digests} {hash_algorithm} digests from {path_to_nsrl} to {path_to_nsrl_index} '
+          f'in {time.time() - build_start:.1f} seconds.')
 
 
 def main():
@@ -113,40 +341,141 @@ def main():
 
     # Command line parameter handling
     args = parse_args()
+    if args.invalidate_cache is not None:
+        invalidate_result_cache(args.invalidate_cache)
+        return
+    if args.build_nsrl_index:
+        build_nsrl_hash_index()
+        return
     path_to_disk_images = args.basepath
     debug_mode = args.debug
 
     # loading user-specified enabled plugin classes
     plugin_classes = load_enabled_plugins(enabled_plugins)
-
-    # generate file names that include timestamps to avoid overwriting
-    json_filename, tsv_filename, log_filename = generate_result_file_names()
+    plugins_by_name = {each_plugin.name: each_plugin for each_plugin in plugin_classes}
+
+    # generate file names that include timestamps (run id) to avoid overwriting, or reuse those of a resumed run
+    run_id = args.resume if args.resume else generate_run_id()
+    json_filename, tsv_filename, log_filename = generate_result_file_names(run_id)
+    manifest_filename = generate_manifest_file_name(run_id)
+    if args.resume and not os.path.exists(manifest_filename):
+        print(f"No run manifest found for run {run_id} ({manifest_filename}), cannot resume.")
+        sys.exit(1)
 
     setup_logging(log_filename)
     current_error_summary = []
 
-    disk_images = __get_disk_images_from_path(path_to_disk_images)
+    manifest = RunManifest(manifest_filename)
+
+    result_cache = None
+    if use_result_cache:
+        result_cache = ResultCache(result_cache_path, result_cache_max_size_mb * 1024 * 1024)
+    disk_image_fingerprints = {}
+    disk_image_estimates = {}
+    completed_results_of_disk_images = {}
+    plugin_timings = PluginTimings(plugin_timings_path)
+
+    def get_completed_results(each_disk_image):
+        """results already available for a disk image (from the run manifest of a resumed run or the result cache)"""
+        each_disk_image_path = each_disk_image['path']
+        completed_results = manifest.get_plugin_results(each_disk_image_path)
+        completed_results_of_disk_images[each_disk_image_path] = completed_results
+        if result_cache:
+            try:
+                fingerprint = get_image_fingerprint(each_disk_image_path, each_disk_image['segments'])
+            except OSError as e:
+                logging.error(f'Fingerprinting {each_disk_image_path} failed, not using result cache: {e}')
+                return completed_results
+            disk_image_fingerprints[each_disk_image_path] = fingerprint
+            no_cached_results = 0
+            for each_plugin in plugin_classes:
+                if each_plugin.name not in completed_results:
+                    cached_result = result_cache.get(fingerprint, each_plugin, each_disk_image_path)
+                    if cached_result:
+                        completed_results[each_plugin.name] = cached_result
+                        no_cached_results += 1
+            print(f'Result cache: {no_cached_results} of {len(plugin_classes)} plugin results found for '
+                  f'{each_disk_image_path}')
+        return completed_results
+
+    image_discovery = ImageDiscovery(image_discovery_cache_path)
+    disk_images = image_discovery.get_disk_images_from_path(path_to_disk_images)
+    image_discovery.save()
+
+    for each_disk_image in disk_images:
+        if each_disk_image['image_type'] == 'split_raw':
+            current_error_summary.append((each_disk_image['path'], 'Disk Image Discovery',
+                                          ValueError('Split raw disk images are not supported')))
+    disk_images = [each_disk_image for each_disk_image in disk_images if each_disk_image['image_type'] != 'split_raw']
+
+    if args.resume:
+        no_all_disk_images = len(disk_images)
+        disk_images = [each_disk_image for each_disk_image in disk_images
+                       if not manifest.is_disk_image_written(each_disk_image['path'])]
+        print(f"Resuming run {run_id}: skipping {no_all_disk_images - len(disk_images)} already completed disk images.")
+
+    if args.plan:
+        __plan_run(disk_images, plugin_classes, plugin_timings, get_completed_results, args.jobs,
+                   generate_plan_file_name(run_id))
+        if result_cache:
+            result_cache.close()
+        return
 
     print(
         f"Collecting metrics from {len(plugin_classes)} plugins for disk images in folder: {path_to_disk_images}.")
 
+    if args.jobs > 1:
+        # largest disk images first, so that no single large image is processed last while other workers are idle
+        plugin_names = [each_plugin.name for each_plugin in plugin_classes]
+        for each_disk_image in disk_images:
+            try:
+                disk_image_estimates[each_disk_image['path']] = estimate_disk_image_cost(
+                    each_disk_image['path'], plugin_names, plugin_timings, each_disk_image['segments'])
+            except OSError as e:
+                logging.error(f'Cost estimation failed for {each_disk_image["path"]}: {e}')
+        disk_images = order_longest_first(disk_images, disk_image_estimates)
+        estimated_seconds = [each['estimated_seconds'] for each in disk_image_estimates.values()]
+        print(f"Estimated processing time: {estimate_makespan(estimated_seconds, args.jobs) / 60:.1f} minutes "
+              f"({sum(estimated_seconds) / 60:.1f} minutes sequentially).")
+        print(f"Processing disk images in {args.jobs} parallel worker processes.")
+        processed_disk_images = __process_disk_images_in_parallel(disk_images, args.jobs, log_filename,
+                                                                  get_completed_results, debug_mode,
+                                                                  args.plugin_threads, args.rebuild_index,
+                                                                  manifest.add_plugin_result)
+    else:
+        processed_disk_images = ((each_disk_image,) + process_single_disk_image(
+                                    each_disk_image, plugin_classes, debug_mode, args.plugin_threads,
+                                    get_completed_results(each_disk_image), manifest.add_plugin_result,
+                                    args.rebuild_index)
+                                 for each_disk_image in disk_images)
+
     # iterate through disk images in target folder and run plugins
+    # (json and tsv outputs and the run manifest are only written here, i.e. by the main process)
     no_disk_images = 0
-    for each_disk_image in disk_images:
-        each_disk_image_results = []
-        each_disk_image_object = initialize_disk_image(each_disk_image, current_error_summary, debug_mode)
-        if each_disk_image_object:
+    for each_disk_image, each_disk_image_results, errors in processed_disk_images:
+        current_error_summary.extend(errors)
+        if each_disk_image_results is not None:
             no_disk_images += 1
-            for each_plugin in plugin_classes:
-                res = process_disk_image(each_disk_image_object, each_plugin)
-                if issubclass(type(res), Exception):
-                    current_error_summary.append((each_disk_image['path'], each_plugin.name, res))
-                else:
-                    each_disk_image_results.append(res)
+            fingerprint = disk_image_fingerprints.get(each_disk_image['path'])
+            for each_result in each_disk_image_results:
+                manifest.add_plugin_result(each_disk_image['path'], each_result)
+                if result_cache and fingerprint:
+                    result_cache.put(fingerprint, plugins_by_name[each_result.plugin_name], each_result)
+            __add_plugin_timings(plugin_timings, each_disk_image, each_disk_image_results,
+                                 completed_results_of_disk_images.pop(each_disk_image['path'], {}),
+                                 disk_image_estimates)
             result_dict = generate_summary_table_dict(each_disk_image_results)
             # write results to json and tsv after each disk image is processed
-            write_single_evidence_results_to_json(result_dict, json_filename)
-            write_single_evidence_results_to_tsv(result_dict, tsv_filename)
+            # (the start of the write is recorded first: if an interrupted run already wrote the disk image's row,
+            # it is replaced instead of written twice)
+            replace_existing_rows = manifest.is_disk_image_writing(each_disk_image['path'])
+            manifest.add_writing_disk_image(each_disk_image['path'])
+            write_single_evidence_results_to_json(result_dict, json_filename, replace_existing_rows)
+            write_single_evidence_results_to_tsv(result_dict, tsv_filename, replace_existing_rows)
+            manifest.add_written_disk_image(each_disk_image['path'])
+
+    if result_cache:
+        result_cache.close()
 
     print('\nFailures ({})'.format(len(current_error_summary)))
     print('================')
@@ -158,16 +487,108 @@ def main():
 
     print('=' * 20)
     print(f'Processing completed in {(total_time / 60)} minutes for {no_disk_images} disk images.')
+    print(f'Run id: {run_id} (to resume this run, add: --resume {run_id})')
     print('=' * 20)
 
 
-def process_disk_image(disk_image_obj, plugin):
-    """runs a single plugin on a single disk image"""
+def __plan_run(disk_images, plugin_classes, plugin_timings: PluginTimings, get_completed_results, jobs, plan_filename):
+    """estimates the processing time of each disk image and plugin without processing the disk images,
+    prints a summary and writes the plan to plan_filename"""
+    plugin_names = [each_plugin.name for each_plugin in plugin_classes]
+    plan_disk_images = []
+    for each_disk_image in disk_images:
+        each_disk_image_path = each_disk_image['path']
+        # plugins with results from a resumed run or the result cache are not run again
+        completed_results = get_completed_results(each_disk_image)
+        try:
+            estimate = estimate_disk_image_cost(each_disk_image_path,
+                                                [each_name for each_name in plugin_names
+                                                 if each_name not in completed_results],
+                                                plugin_timings, each_disk_image['segments'])
+        except OSError as e:
+            print(f'Cost estimation failed for {each_disk_image_path}: {e}')
+            plan_disk_images.append({'path': each_disk_image_path, 'error': str(e)})
+            continue
+        estimate['partitions'] = probe_partitions(each_disk_image_path)
+        estimate['completed_plugins'] = sorted(completed_results)
+        plan_disk_images.append(estimate)
+
+    estimates = [each for each in plan_disk_images if 'error' not in each]
+    estimated_seconds = [each['estimated_seconds'] for each in estimates]
+    plan = {
+        'jobs': jobs,
+        'estimated_total_seconds': sum(estimated_seconds),
+        'estimated_makespan_seconds': estimate_makespan(estimated_seconds, jobs) if estimated_seconds else 0,
+        'plugins': {each_name: {'has_timings': plugin_timings.has_timings(each_name),
+                                'estimated_seconds': sum(each['plugin_estimated_seconds'].get(each_name, 0)
+                                                         for each in estimates)}
+                    for each_name in plugin_names},
+        'disk_images': plan_disk_images
+    }
+
+    print(f"{'disk image':<60} {'format':<6} {'segments':>8} {'size (GB)':>10} {'partitions':>10} {'est. (min)':>10}")
+    for each in plan_disk_images:
+        if 'error' in each:
+            print(f"{each['path']:<60} estimation failed: {each['error']}")
+            continue
+        partitions = len(each['partitions']) if each['partitions'] is not None else '-'
+        print(f"{each['path']:<60} {each['image_format']:<6} {each['segments']:>8} {each['media_size'] / 1e9:>10.1f} "
+              f"{partitions:>10} {each['estimated_seconds'] / 60:>10.1f}")
+    print()
+    print(f"{'plugin':<40} {'est. (min)':>10}")
+    for each_name, each_plugin_plan in plan['plugins'].items():
+        no_timings_note = '' if each_plugin_plan['has_timings'] else '  (no timings of previous runs, default assumed)'
+        print(f"{each_name:<40} {each_plugin_plan['estimated_seconds'] / 60:>10.1f}{no_timings_note}")
+    print()
+    print(f"Estimated processing time for {len(estimates)} disk images: "
+          f"{plan['estimated_makespan_seconds'] / 60:.1f} minutes with {jobs} jobs "
+          f"({plan['estimated_total_seconds'] / 60:.1f} minutes sequentially).")
+
+    with open(plan_filename, 'w') as f:
+        json.dump(plan, f, indent=2)
+    print(f'Plan written to {plan_filename}')
+
+
+def __add_plugin_timings(plugin_timings: PluginTimings, each_disk_image, each_disk_image_results, completed_results,
+                         disk_image_estimates):
+    """records processing times of the plugins newly run on a disk image"""
+    new_results = [each_result for each_result in each_disk_image_results
+                   if each_result.plugin_name not in completed_results and each_result.processing_time is not None]
+    if not new_results:
+        return
+    estimate = disk_image_estimates.get(each_disk_image['path'])
+    try:
+        if estimate is None:
+            estimate = estimate_disk_image_cost(each_disk_image['path'], [], plugin_timings,
+                                                each_disk_image['segments'])
+    except OSError as e:
+        logging.error(f'Recording plugin timings failed for {each_disk_image["path"]}: {e}')
+        return
+    for each_result in new_results:
+        plugin_timings.add(each_result.plugin_name, estimate['image_format'], each_result.processing_time,
+                           estimate['media_size'])
+    plugin_timings.save()
+
+
+def process_disk_image(disk_image_obj, plugin, visited_result=None):
+    """runs a single plugin on a single disk image
+    (visited_result: result of a plugin already run via the file visitor API, only finished here)"""
     try:
         print('- running {} ({})'.format(plugin.name, plugin.description))
-        res = plugin.process_disk(disk_image_obj)
+        if visited_result is None and plugin.name in isolated_plugins:
+            res = run_plugin_isolated(disk_image_obj, plugin, plugin_timeout_seconds,
+                                      plugin_memory_limit_mb * 1024 * 1024)
+        elif visited_result is None:
+            plugin_start_time = time.time()
+            res = plugin.process_disk(disk_image_obj)
+            res.processing_time = time.time() - plugin_start_time
+        elif issubclass(type(visited_result), Exception):
+            raise visited_result
+        else:
+            res = visited_result
     except Exception as e:
         print("FAILED TO PROCESS {} ({})".format(disk_image_obj.image_path, e))
+        logging.error(f'{plugin.name} failed for {disk_image_obj.image_path}: {e}')
         return e
 
     if plugin.include_in_data_table:
@@ -189,41 +610,5 @@ def __run_plugins(plugin_folder, target_disk_image):
     pass
 
 
-def __get_disk_images_from_path(target_base_path):
-    """returns a list of Disk Image dicts (containing path and target folder)"""
-    if not os.path.exists(target_base_path):
-        raise FileNotFoundError('Basepath not found')
-
-    all_disk_images = []
-    for each_folder in os.listdir(target_base_path):
-        try:
-            if each_folder != ".DS_Store":  # fix for macos
-                disk_images = __get_disk_images_from_sub_folder(os.path.join(target_base_path, each_folder))
-                all_disk_images.extend(disk_images)
-        except FileNotFoundError as e:
-            logging.error(e)
-    return all_disk_images
-
-
-def __get_disk_images_from_sub_folder(target_folder):
-    """return dict of disk image and target folder paths, for a folder of structure:
-        case1
-            data
-        case2
-            data
-
-            etc.
-    """
-    data_path = os.path.join(target_folder, 'data')
-    if not os.path.exists(data_path):
-        raise FileNotFoundError('No data folder in case path ({})'.format(target_folder))
-
-    disk_images = []
-    for each_disk_image_file in os.listdir(data_path):
-        disk_images.append({'path': os.path.join(data_path, each_disk_image_file), 'target_folder': target_folder})
-
-    return disk_images
-
-
 if __name__ == '__main__':
     main()
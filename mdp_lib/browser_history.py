@@ -5,7 +5,7 @@ from abc import abstractmethod
 from typing import List, Dict
 
 from mdp_lib.disk_image_info import TargetDiskImage
-from mdp_lib.mdp_plugin import MDPPlugin
+from mdp_lib.mdp_plugin import MDPPlugin, get_temp_file_name
 
 
 class SearchEngine(object):
@@ -57,7 +57,7 @@ class BrowserHistory(MDPPlugin):
         disk_image = target_disk_image.accessor
         files = disk_image.files
 
-        temp_filename = 'export.bin'
+        temp_filename = get_temp_file_name()
 
         history_count_max = None
         history_count_total = None
@@ -1,33 +1,55 @@
+import hashlib
 import os
 import time
-import sqlite3
 import shutil
 
-from typing import List
+from types import MappingProxyType
+from typing import Sequence
 
 import marple.disk_access
 from marple.file_object import FileItem
-from config.config import use_db_for_file_lists, max_file_size_for_sha1_calculation
+from marple.file_table import FileTable, FileTableView
+from mdp_lib.file_list_db import FileListDatabase
+from mdp_lib.file_hashing import populate_hashes_and_signatures, populate_signatures_in_physical_order
+from mdp_lib.image_fingerprint import get_image_fingerprint
+from config.config import use_db_for_file_lists, max_file_size_for_sha1_calculation, ewf_read_cache_size_mb, \
+    raw_read_cache_size_mb, ewf_read_ahead_threads, file_enumeration_processes, use_file_list_snapshots, \
+    file_list_snapshot_folder, hashing_threads, hashing_buffer_size_kb, hash_algorithms, populate_file_signatures, \
+    populate_file_hashes_and_signatures
 
 
 class TargetDiskImage(object):
 
-    def __init__(self, path_to_disk_image):
-        # Class definition as provided earlier
+    def __init__(self, path_to_disk_image, files: Sequence[FileItem] | None = None, rebuild_file_list=False):
+        # files: file list of the disk image if already known (e.g. in a child process running an isolated plugin)
+        # rebuild_file_list: walk the file systems even if a file list snapshot of a previous run exists
         if not os.path.exists(path_to_disk_image):
             raise FileNotFoundError
 
         self._disk_image_path = path_to_disk_image
 
         try:
-            self._disk_accessor = marple.disk_access.get_disk_accessor(self._disk_image_path)
+            self._disk_accessor = marple.disk_access.get_disk_accessor(self._disk_image_path,
+                                                                       ewf_read_cache_size_mb * 1024 * 1024,
+                                                                       raw_read_cache_size_mb * 1024 * 1024,
+                                                                       ewf_read_ahead_threads,
+                                                                       file_enumeration_processes)
         except Exception as e:
             raise RuntimeError(f"Disk access failed: {e}")
-
-        try:
-            self._files: List[FileItem]| None = self._disk_accessor.get_list_of_files([])
-        except Exception as e:
-            raise RuntimeError(f"Population of file list failed for {path_to_disk_image}: {e}")
+        # signatures only -> record where each file's data starts, so that signatures can be read in physical order
+        # (hashing reads whole files anyway)
+        self._disk_accessor.collect_data_locations = populate_file_signatures and \
+            not populate_file_hashes_and_signatures
+
+        if files is not None:
+            self._files: FileTable | None = FileTable.from_files(files)
+            self._disk_accessor.list_of_files = self._files
+            self._files.accessor = self._disk_accessor
+        else:
+            try:
+                self._files: FileTable | None = self._get_file_list(rebuild_file_list)
+            except Exception as e:
+                raise RuntimeError(f"Population of file list failed for {path_to_disk_image}: {e}")
 
         self.base_path = ''
 
@@ -39,6 +61,16 @@ class TargetDiskImage(object):
         self.results = {}
 
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """releases the disk accessor's image and file system handles"""
+        self._disk_accessor.close()
+
     @property
     def image_path(self):
         return self._disk_image_path
@@ -48,12 +80,14 @@ class TargetDiskImage(object):
         return self._disk_accessor
 
     @property
-    def files(self):
-        return self._files.copy()
+    def files(self) -> Sequence[FileItem]:
+        """read-only view of the file list (nothing is copied)"""
+        return FileTableView(self._files)
 
     @property
     def attributes(self):
-        return self._attributes.copy()
+        """read-only view of the attributes (see add_attributes())"""
+        return MappingProxyType(self._attributes)
 
     @property
     def results_path(self):
@@ -62,14 +96,70 @@ class TargetDiskImage(object):
     def add_attributes(self, key, value):
         self._attributes[key] = value
 
-    def populate_file_signatures(self):
-        disk_accessor = self._disk_accessor
-        fs_handles = disk_accessor.get_file_system_handles()
+    def _get_file_list_snapshot_path(self, fingerprint):
+        if file_list_snapshot_folder:
+            # shared by all cases: named by fingerprint and image path, so that images with the same fingerprint don't
+            # replace each other's snapshots
+            path_digest = hashlib.sha1(os.path.abspath(self.image_path).encode('utf-8')).hexdigest()[:16]
+            return os.path.join(file_list_snapshot_folder, f"{fingerprint}_{path_digest}.files")
+        # next to the data folder, like the file list database
+        snapshot_name = f"{os.path.splitext(os.path.basename(self.image_path))[0]}.files"
+        return os.path.join(os.path.dirname(os.path.dirname(self.image_path)), snapshot_name)
+
+    def _get_file_list(self, rebuild_file_list=False) -> FileTable:
+        """walks the file systems of the disk image, or loads the file list snapshot of a previous run (if enabled)"""
+        if not use_file_list_snapshots:
+            return self._disk_accessor.get_list_of_files(FileTable())
+
+        try:
+            fingerprint = get_image_fingerprint(self.image_path)
+        except OSError as e:
+            print(f'Fingerprinting {self.image_path} failed, not using a file list snapshot: {e}')
+            return self._disk_accessor.get_list_of_files(FileTable())
+
+        snapshot_path = self._get_file_list_snapshot_path(fingerprint)
+        # the fingerprint only samples the image: the snapshot is also keyed by the image path and checked against the
+        # image's media size and partition table
+        snapshot_key = f'{fingerprint} {os.path.abspath(self.image_path)}'
+        layout = self._disk_accessor.get_disk_layout()
+        if not rebuild_file_list and os.path.exists(snapshot_path):
+            try:
+                files = FileTable.load_snapshot(snapshot_path, snapshot_key, self.image_path, self._disk_accessor,
+                                                data_locations=self._disk_accessor.collect_data_locations,
+                                                layout=layout)
+                self._disk_accessor.list_of_files = files
+                print(f'File list loaded from snapshot {snapshot_path}.')
+                return files
+            except (OSError, ValueError) as e:
+                print(f'File list snapshot not used, walking the file systems again: {e}')
+
+        files = self._disk_accessor.get_list_of_files(FileTable())
+        try:
+            snapshot_folder = os.path.dirname(snapshot_path)
+            if snapshot_folder:
+                os.makedirs(snapshot_folder, exist_ok=True)
+            files.save_snapshot(snapshot_path, snapshot_key,
+                                data_locations=self._disk_accessor.collect_data_locations, layout=layout)
+            print(f'File list snapshot saved to {snapshot_path}.')
+        except OSError as e:
+            print(f'Saving file list snapshot to {snapshot_path} failed: {e}')
+        return files
+
+    def _populate_hashes_and_signatures(self, files, hash_size_limit):
+        """reads signatures and (for files up to hash_size_limit bytes, None: no hashes) hashes with reader threads"""
+        failures = populate_hashes_and_signatures(files, self._disk_accessor, hash_size_limit,
+                                                  workers=hashing_threads,
+                                                  buffer_size=hashing_buffer_size_kb * 1024,
+                                                  hash_algorithms=hash_algorithms)
+        for each_file, e in failures:
+            print(f"Hashing failed for: {each_file.full_path} with Exception {e}")
 
+    def populate_file_signatures(self):
         if self._files and not self._attributes['signatures_populated']:
-            for each_file in self._files:
-                fs_handle = fs_handles[each_file.partition_sector]
-                each_file.populate_signature_field(fs_handle=fs_handle)
+            files = FileTableView(self._files)
+            remaining_positions = populate_signatures_in_physical_order(files, self._disk_accessor)
+            if remaining_positions:
+                self._populate_hashes_and_signatures(FileTableView(self._files, remaining_positions), None)
             self.add_attributes('signatures_populated', True)
 
     def populate_file_hashes_and_signatures(self):
@@ -91,9 +181,6 @@ class TargetDiskImage(object):
 
         # we should use file db
 
-        disk_accessor = self._disk_accessor
-        fs_handles = disk_accessor.get_file_system_handles()
-
         # 1. Does a db file exist?
 
         # db does not exist yet
@@ -112,8 +199,11 @@ class TargetDiskImage(object):
             self._create_and_update_db_file(db_path)
             return
 
-        # expected table layout
+        # expected table layout (hash columns added in later versions are added to existing databases)
+        with FileListDatabase(db_path) as file_list_db:
+            self._update_db_file(file_list_db)
 
+    def _update_db_file(self, file_list_db: FileListDatabase):
         # 3. check if entry for each file in disk images file list
 
         # not every file in file list has an entry (yet) -> add missing entries
@@ -121,19 +211,15 @@ class TargetDiskImage(object):
 
         print(f'{len(self._files)} files expected in file list database.')
 
-        missing_files = self._files_not_in_db_file_list(db_path)
+        missing_files = file_list_db.files_not_in_db(self._files)
         print(f'{len(missing_files)} files missing in existing file list database.')
         if len(missing_files) > 0:
             print(f'Populating file signatures and hashes for missing files.')
             # first, populate sha1 and signature fields of files in disk image object's file list for files that already exist in db
-            self._update_file_list_sha1_and_signature_from_db(db_path)
+            self._update_file_list_sha1_and_signature_from_db(file_list_db)
             # second, populate sha1 and signature fields for missing files and add to db
-            for each_file in missing_files:
-                fs_handle = fs_handles[each_file.partition_sector]
-                each_file.populate_hash_and_signature_field(hash_size_limit=max_file_size_for_sha1_calculation,
-                                                            fs_handle=fs_handle)
-                file_db_entry = each_file.to_dict()
-                self._add_entry_to_db(db_path, file_db_entry)
+            self._populate_hashes_and_signatures(missing_files, max_file_size_for_sha1_calculation)
+            file_list_db.add_files(missing_files)
             self.add_attributes('hashes_populated', True)
             self.add_attributes('signatures_populated', True)
             # return -> files might be missing AND existing not populated correctly
@@ -144,133 +230,41 @@ class TargetDiskImage(object):
 
         # sha1 and signature fields not populated as expected
         # TODO Currently not checking if larger files than expected have sha1 value
-        unpopulated_files = self._files_sha1_and_signature_not_populated_as_expected(db_path)
+        unpopulated_files = file_list_db.files_not_populated_as_expected(self._files, hash_algorithms,
+                                                                         max_file_size_for_sha1_calculation)
         print(f'{len(unpopulated_files)} files in existing file list database with unpopulated file signature and/or hash where hash was expected.')
 
         if len(unpopulated_files) > 0:
             print(f'Populating file signatures and hashes for unpopulated files.')
             # first, populate sha1 and signature fields of files in disk image object's file list for files that already exist in db
-            self._update_file_list_sha1_and_signature_from_db(db_path)
+            self._update_file_list_sha1_and_signature_from_db(file_list_db)
             # second, populate sha1 and signature fields for missing files and add to db
-            for each_file in unpopulated_files:
-                fs_handle = fs_handles[each_file.partition_sector]
-                each_file.populate_hash_and_signature_field(hash_size_limit=max_file_size_for_sha1_calculation,fs_handle=fs_handle)
-                file_db_entry = each_file.to_dict()
-                self._update_values_of_entry_in_db(db_path, file_db_entry)
+            self._populate_hashes_and_signatures(unpopulated_files, max_file_size_for_sha1_calculation)
+            file_list_db.update_files(unpopulated_files)
             self.add_attributes('hashes_populated', True)
             self.add_attributes('signatures_populated', True)
             return
 
         if len(missing_files) == 0:
         # sha1 and signature fields populated as expected
-            self._update_file_list_sha1_and_signature_from_db(db_path)
+            self._update_file_list_sha1_and_signature_from_db(file_list_db)
 
 
     def _populate_file_hash_and_signature_fields_without_db(self):
-        disk_accessor = self._disk_accessor
-        fs_handles = disk_accessor.get_file_system_handles()
         if self._files and not self._attributes['hashes_populated']:
             print('Populating file signatures and hashes without file database.')
-            before_hash = time.time()
-            for each_file in self._files:
-                try:
-                    fs_handle = fs_handles[each_file.partition_sector]
-                    each_file.populate_hash_and_signature_field(hash_size_limit=max_file_size_for_sha1_calculation, fs_handle=fs_handle)
-                except Exception as e:
-                    print(f"Hashing failed for: {each_file.full_path} with Exception {e}")
-                    continue
-            after_hash = time.time()
-            print(print('Hashing took {} seconds'.format(after_hash - before_hash)))
+            self._populate_hashes_and_signatures(self._files, max_file_size_for_sha1_calculation)
             self.add_attributes('hashes_populated', True)
             self.add_attributes('signatures_populated', True)
 
 
-    def _populate_file_hash_and_signature_fields_with_db(self, db_path):
-        disk_accessor = self._disk_accessor
-        fs_handles = disk_accessor.get_file_system_handles()
+    def _populate_file_hash_and_signature_fields_with_db(self, file_list_db: FileListDatabase):
         if self._files and not self._attributes['hashes_populated']:
-            for each_file in self._files:
-                fs_handle = fs_handles[each_file.partition_sector]
-                each_file.populate_hash_and_signature_field(hash_size_limit=max_file_size_for_sha1_calculation,
-                                                            fs_handle=fs_handle)
-                file_db_entry = each_file.to_dict()
-                self._add_entry_to_db(db_path, file_db_entry)
+            self._populate_hashes_and_signatures(self._files, max_file_size_for_sha1_calculation)
+            file_list_db.add_files(self._files)
             self.add_attributes('hashes_populated', True)
             self.add_attributes('signatures_populated', True)
 
-
-    @staticmethod
-    def _add_entry_to_db(db_path, file_db_entry):
-        # need to flatten timestamps
-        file_db_entry['a_time'] = file_db_entry['timestamps']['a_time']
-        file_db_entry['cr_time'] = file_db_entry['timestamps']['cr_time']
-        file_db_entry['m_time'] = file_db_entry['timestamps']['m_time']
-        del file_db_entry['timestamps']
-
-        # noinspection SqlResolve, SqlNoDataSourceInspection
-        query = '''
-            INSERT INTO files (evidence_name, file_size, full_path, inode, meta_path, partition_sector, sha1, signature, a_time, cr_time, m_time)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        '''
-
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-
-        cursor.execute(query, (
-            file_db_entry['evidence_name'],
-            file_db_entry['file_size'],
-            file_db_entry['full_path'],
-            file_db_entry['inode'],
-            file_db_entry['meta_path'],
-            file_db_entry['partition_sector'],
-            file_db_entry['sha1'],
-            file_db_entry['signature'],
-            file_db_entry['a_time'],
-            file_db_entry['cr_time'],
-            file_db_entry['m_time']
-        ))
-
-        conn.commit()
-
-        conn.close()
-
-    @staticmethod
-    def _update_values_of_entry_in_db(db_path, file_db_entry):
-        # need to flatten timestamps
-        file_db_entry['a_time'] = file_db_entry['timestamps']['a_time']
-        file_db_entry['cr_time'] = file_db_entry['timestamps']['cr_time']
-        file_db_entry['m_time'] = file_db_entry['timestamps']['m_time']
-        del file_db_entry['timestamps']
-
-        # noinspection SqlResolve, SqlNoDataSourceInspection
-        query = '''
-                UPDATE files
-                SET evidence_name = ?, file_size = ?, meta_path = ?, partition_sector = ?, sha1 = ?, signature = ?, 
-                    a_time = ?, cr_time = ?, m_time = ?
-                WHERE inode = ? OR full_path = ?
-            '''
-
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-
-        cursor.execute(query, (
-            file_db_entry['evidence_name'],
-            file_db_entry['file_size'],
-            file_db_entry['meta_path'],
-            file_db_entry['partition_sector'],
-            file_db_entry['sha1'],
-            file_db_entry['signature'],
-            file_db_entry['a_time'],
-            file_db_entry['cr_time'],
-            file_db_entry['m_time'],
-            file_db_entry['inode'],     # identifier
-            file_db_entry['full_path']  # identifier
-        ))
-
-        conn.commit()
-
-        conn.close()
-
     def _remove_and_save_existing_db_file(self, db_path):
         new_db_path = f"{db_path}{int(time.time())}.save"
         shutil.move(db_path, new_db_path)  # Renames the existing file
@@ -278,122 +272,16 @@ class TargetDiskImage(object):
 
     def _create_and_update_db_file(self, db_path):
         print(f"Creating and populating new file list database with file signatures and hashes at {db_path}.")
-        self._create_new_db_file(db_path)
-        self._populate_file_hash_and_signature_fields_with_db(db_path)
+        with FileListDatabase(db_path) as file_list_db:
+            self._populate_file_hash_and_signature_fields_with_db(file_list_db)
 
     @staticmethod
     def _is_file_table_layout_as_expected(db_path) -> bool:
         # TODO: check existence of files table, check if columns are as expected
         return True
 
-    def _files_not_in_db_file_list(self, db_path):
-        # compare file list with db
-        file_list = self._files
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-
-        # files that are not yet in the database
-        missing_files = []
-
-        for each_file in file_list:
-            # check if file exists
-            # noinspection SqlResolve, SqlNoDataSourceInspection
-            query = """
-                            SELECT EXISTS(SELECT 1 FROM files WHERE inode = ? AND full_path = ?)
-                        """
-            cursor.execute(query, (each_file.inode, each_file.full_path))
-            result = cursor.fetchone()[0]
-
-            # If file not found in db -> missing
-            if not result:
-                missing_files.append(each_file)
-
-        # Close the connection
-        conn.close()
-
-        # Return the list of missing files
-        return missing_files
-
-
-    def _files_sha1_and_signature_not_populated_as_expected(self, db_path):
-        # compare file list of disk image obj. with db
-        # check if file signature is not None and sha1 ist not none for files <= max_file_size_for_sha1_calculation
-        file_list = self._files
-        hash_size_limit = max_file_size_for_sha1_calculation
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-
-        # files that are yet in the database but either signature is not populate or sha1 is not populated despite the file size being below limit
-        unpopulated_files = []
-
-        for each_file in file_list:
-            # noinspection SqlResolve, SqlNoDataSourceInspection
-            query = """
-                                    SELECT sha1, signature FROM files WHERE inode = ? AND full_path = ?
-                                """
-            cursor.execute(query, (each_file.inode, each_file.full_path))
-            result = cursor.fetchone()
-            if result:
-                sha1, signature = result
-                if ((sha1 is None or sha1 == '') and each_file.file_size <= hash_size_limit) or signature is None:
-                    unpopulated_files.append(each_file)
-
-        conn.close()
-
-        # Return the list of files where either sha1 or signature is not populated as expected
-        return unpopulated_files
-
-
-    @staticmethod
-    def _create_new_db_file(db_path):
-
-        open(db_path, 'wb')
-
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-
-        # noinspection SqlResolve, SqlNoDataSourceInspection
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS files (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                evidence_name TEXT,
-                file_size INTEGER,
-                full_path TEXT,
-                inode INTEGER,
-                meta_path TEXT,
-                partition_sector INTEGER,
-                sha1 TEXT,
-                signature TEXT,
-                a_time INTEGER,
-                cr_time INTEGER,
-                m_time INTEGER
-            )
-        ''')
-
-        conn.commit()
-        conn.close()
-
-    def _update_file_list_sha1_and_signature_from_db(self, db_path):
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-
+    def _update_file_list_sha1_and_signature_from_db(self, file_list_db: FileListDatabase):
         print(f'Loading file signatures and hashes from existing file list database.')
-
-        for each_file in self._files:
-
-            # noinspection SqlResolve, SqlNoDataSourceInspection
-            cursor.execute("""
-                    SELECT sha1, signature FROM files WHERE inode = ? AND full_path = ?
-                """, (each_file.inode,each_file.full_path))
-
-            result = cursor.fetchone()
-
-            if result:
-                sha1, signature = result
-                each_file.sha1 = sha1
-                each_file.signature = bytes.fromhex(signature)
-
-        # Close the database connection
-        conn.close()
+        file_list_db.load_hashes_and_signatures(self._files)
         self.add_attributes('hashes_populated', True)
         self.add_attributes('signatures_populated', True)
\ No newline at end of file
@@ -0,0 +1,221 @@
+import copy
+import hashlib
+import itertools
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Iterable, List, Sequence, Tuple
+
+from marple.disk_access_generic import GenericDiskAccessor
+from marple.file_object import FileItem, SUPPORTED_HASH_ALGORITHMS
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+# files per task of a reader thread, at most BATCHES_PER_THREAD tasks per thread are queued at a time
+# (i.e. the file list of disk images with millions of files is not copied)
+FILES_PER_BATCH = 64
+BATCHES_PER_THREAD = 4
+
+# signature reads (in physical order) are combined into one read if the gap between them is at most MAX_READ_GAP bytes
+MAX_READ_GAP = 64 * 1024
+MAX_COMBINED_READ_SIZE = 4 * 1024 * 1024
+
+
+class _ReaderThreads(object):
+    """Per-thread copies of a disk accessor, i.e. each reader thread uses its own image and file system handles"""
+
+    def __init__(self, disk_accessor: GenericDiskAccessor):
+        self._disk_accessor = disk_accessor
+        self._local = threading.local()
+        self._accessors = []
+        self._lock = threading.Lock()
+
+    def get_file_system_handle(self, partition_sector):
+        accessor = getattr(self._local, 'accessor', None)
+        if accessor is None:
+            accessor = copy.copy(self._disk_accessor)  # without handles (see GenericDiskAccessor.__getstate__)
+            self._local.accessor = accessor
+            with self._lock:
+                self._accessors.append(accessor)
+        return accessor.get_file_system_handle(partition_sector)
+
+    def close(self):
+        with self._lock:
+            for each_accessor in self._accessors:
+                each_accessor.close()
+            self._accessors = []
+
+
+def _read_file(file_system_handle, file_item: FileItem, signature_size, hash_size_limit, buffer_size,
+               hash_algorithms):
+    """returns (signature, {algorithm: hex digest} or None) of a file, reading it once for all digests"""
+    if hash_size_limit is None or file_item.file_size > hash_size_limit:
+        if file_item.file_size == 0:
+            return b'', None
+        file_obj = file_system_handle.open_meta(file_item.inode)
+        return file_obj.read_random(0, min(signature_size, file_item.file_size)), None
+
+    hashes = [hashlib.new(each_algorithm) for each_algorithm in hash_algorithms]
+    signature = b''
+    offset = 0
+    if file_item.file_size > 0:
+        file_obj = file_system_handle.open_meta(file_item.inode)
+        while offset < file_item.file_size:
+            data = file_obj.read_random(offset, min(buffer_size, file_item.file_size - offset))
+            if not data:
+                break
+            if offset == 0:
+                signature = data[:signature_size]
+            for each_hash in hashes:
+                each_hash.update(data)  # releases the GIL for large buffers
+            offset += len(data)
+    return signature, {each_algorithm: each_hash.hexdigest()
+                       for each_algorithm, each_hash in zip(hash_algorithms, hashes)}
+
+
+def validate_hash_algorithms(hash_algorithms: Iterable[str]):
+    """raises ValueError if any of hash_algorithms is not in SUPPORTED_HASH_ALGORITHMS (e.g. a typo in config.py)"""
+    unsupported_algorithms = set(hash_algorithms) - set(SUPPORTED_HASH_ALGORITHMS)
+    if unsupported_algorithms:
+        raise ValueError(f'Unsupported hash algorithms: {sorted(unsupported_algorithms)} '
+                         f'(supported: {SUPPORTED_HASH_ALGORITHMS})')
+
+
+def populate_hashes_and_signatures(files: Iterable[FileItem], disk_accessor: GenericDiskAccessor,
+                                   hash_size_limit: int | None, signature_size=8, workers=4,
+                                   buffer_size=DEFAULT_BUFFER_SIZE, hash_algorithms=('sha1',),
+                                   progress_interval=10.0) -> List[Tuple[FileItem, Exception]]:
+    """
+    Reads the signature (first signature_size bytes) and, for files up to hash_size_limit bytes, the digests of
+    hash_algorithms (see SUPPORTED_HASH_ALGORITHMS) of the given files in one pass per file and sets their signature
+    and digest fields (e.g. md5, sha1). hash_size_limit None: signatures only.
+
+    Files are read by a pool of worker threads, each with its own handles on the disk image (a copy of disk_accessor),
+    in reads of buffer_size bytes. Progress is printed at most every progress_interval seconds.
+    Returns (file, exception) of the files that could not be read.
+    """
+    validate_hash_algorithms(hash_algorithms)
+    hash_algorithms = tuple(hash_algorithms)
+
+    no_files = len(files) if hasattr(files, '__len__') else None
+    workers = max(1, workers)
+    reader_threads = _ReaderThreads(disk_accessor)
+    failures = []
+
+    def process_batch(batch):
+        batch_results = []
+        for each_file in batch:
+            try:
+                file_system_handle = reader_threads.get_file_system_handle(each_file.partition_sector)
+                batch_results.append((each_file, _read_file(file_system_handle, each_file, signature_size,
+                                                            hash_size_limit, buffer_size, hash_algorithms), None))
+            except Exception as e:
+                batch_results.append((each_file, None, e))
+        return batch_results
+
+    no_files_done = 0
+    no_bytes_done = 0
+    start_time = last_progress_time = time.time()
+    file_iterator = iter(files)
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='file_hashing') as executor:
+            running = set()
+            while True:
+                while len(running) < workers * BATCHES_PER_THREAD:
+                    batch = list(itertools.islice(file_iterator, FILES_PER_BATCH))
+                    if not batch:
+                        break
+                    running.add(executor.submit(process_batch, batch))
+                if not running:
+                    break
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for each_file, result, exception in itertools.chain.from_iterable(each.result() for each in done):
+                    no_files_done += 1
+                    if exception is not None:
+                        failures.append((each_file, exception))
+                        continue
+                    each_file.signature, digests = result
+                    if digests is not None:
+                        for each_algorithm, each_digest in digests.items():
+                            setattr(each_file, each_algorithm, each_digest)
+                        no_bytes_done += each_file.file_size
+
+                if time.time() - last_progress_time >= progress_interval:
+                    last_progress_time = time.time()
+                    print(f'Read {no_files_done} of {no_files} files ({no_bytes_done / (1024 * 1024):.1f} MB hashed, '
+                          f'{last_progress_time - start_time:.0f} seconds)')
+    finally:
+        reader_threads.close()
+
+    print(f'Read {no_files_done} files ({no_bytes_done / (1024 * 1024):.1f} MB hashed) '
+          f'in {time.time() - start_time:.1f} seconds using {workers} threads')
+    return failures
+
+
+def populate_signatures_in_physical_order(files: Sequence[FileItem], disk_accessor: GenericDiskAccessor,
+                                          signature_size=8, max_gap=MAX_READ_GAP,
+                                          max_read_size=MAX_COMBINED_READ_SIZE) -> array:
+    """
+    Sets the signature (first signature_size bytes) of the given files using the data locations recorded while listing
+    the files (see GenericDiskAccessor.collect_data_locations), without opening the files via their file system:
+    signatures of resident files are taken from their resident data, the others are read directly from the disk image
+    sorted by image offset, with neighbouring reads (at most max_gap bytes apart) combined into one read.
+    I.e. a mostly sequential sweep over the image instead of one random read per file.
+
+    Returns the positions (in files) of the files without a recorded data location (e.g. compressed files), their
+    signatures have to be read via the file system (see populate_hashes_and_signatures()).
+    """
+    positions = array('q')  # files read from the image: position in files, image offset, length
+    offsets = array('q')
+    lengths = array('q')
+    remaining_positions = array('q')
+    no_resident = 0
+    for position, each_file in enumerate(files):
+        length = min(signature_size, each_file.file_size)
+        resident_data = each_file.resident_data
+        if length == 0:
+            each_file.signature = b''
+        elif resident_data is not None and len(resident_data) >= length:
+            each_file.signature = resident_data[:length]
+            no_resident += 1
+        elif each_file.data_offset is not None:
+            positions.append(position)
+            offsets.append(each_file.data_offset)
+            lengths.append(length)
+        else:
+            remaining_positions.append(position)
+
+    start_time = time.time()
+    order = sorted(range(len(offsets)), key=offsets.__getitem__)
+    image_handle = disk_accessor.image_handle
+    no_reads = 0
+    i = 0
+    while i < len(order):
+        read_start = offsets[order[i]]
+        read_end = read_start + lengths[order[i]]
+        j = i + 1
+        while j < len(order):
+            next_start = offsets[order[j]]
+            next_end = max(read_end, next_start + lengths[order[j]])
+            if next_start - read_end > max_gap or next_end - read_start > max_read_size:
+                break
+            read_end = next_end
+            j += 1
+
+        try:
+            data = image_handle.read(read_start, read_end - read_start)
+            no_reads += 1
+        except OSError:
+            data = None
+        for each in order[i:j]:
+            if data is None:
+                remaining_positions.append(positions[each])
+                continue
+            offset_in_read = offsets[each] - read_start
+            files[positions[each]].signature = data[offset_in_read:offset_in_read + lengths[each]]
+        i = j
+
+    print(f'Read {len(order)} file signatures in physical order with {no_reads} reads '
+          f'in {time.time() - start_time:.1f} seconds ({no_resident} from resident data, '
+          f'{len(remaining_positions)} left to read via the file system)')
+    return remaining_positions
@@ -0,0 +1,179 @@
+import itertools
+import sqlite3
+from typing import Iterable, List, Sequence
+
+from marple.file_object import FileItem, SUPPORTED_HASH_ALGORITHMS
+
+# rows per executemany() call, i.e. rows are written in batches without building one list of all rows
+ROWS_PER_BATCH = 10000
+
+_FILE_COLUMNS = ('evidence_name', 'file_size', 'full_path', 'inode', 'meta_path', 'partition_sector',
+                 *SUPPORTED_HASH_ALGORITHMS, 'signature', 'a_time', 'cr_time', 'm_time')
+
+
+def _file_to_row(file_item: FileItem):
+    timestamps = file_item.timestamps
+    signature = file_item.signature.hex() if file_item.signature is not None else None
+    return (file_item.evidence_name, file_item.file_size, file_item.full_path, file_item.inode, file_item.meta_path,
+            file_item.partition_sector, *(getattr(file_item, each) for each in SUPPORTED_HASH_ALGORITHMS),
+            signature, timestamps['a_time'], timestamps['cr_time'], timestamps['m_time'])
+
+
+class FileListDatabase(object):
+    """
+    File list database of a disk image (SQLite): signatures and digests of the disk image's files, so that later runs
+    don't have to read the files again.
+
+    All operations use one connection (WAL journal). Rows are written with executemany() in batches inside one
+    transaction, and the file list of the disk image is compared with the database by joining a temporary table of the
+    file list with the files table (indexed on inode and full path), instead of one query per file.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._file_list = None  # file list currently in the temporary file_list table
+
+        with self._conn:
+            # noinspection SqlResolve, SqlNoDataSourceInspection
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS files (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    evidence_name TEXT,
+                    file_size INTEGER,
+                    full_path TEXT,
+                    inode INTEGER,
+                    meta_path TEXT,
+                    partition_sector INTEGER,
+                    md5 TEXT,
+                    sha1 TEXT,
+                    sha256 TEXT,
+                    signature TEXT,
+                    a_time INTEGER,
+                    cr_time INTEGER,
+                    m_time INTEGER
+                )
+            ''')
+            self._add_missing_hash_columns()
+            # noinspection SqlResolve, SqlNoDataSourceInspection
+            self._conn.execute('CREATE INDEX IF NOT EXISTS files_inode_full_path ON files (inode, full_path)')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._conn.close()
+
+    def _add_missing_hash_columns(self):
+        """hash columns added in later versions are added to existing databases"""
+        # noinspection SqlResolve, SqlNoDataSourceInspection
+        columns = [row[1] for row in self._conn.execute('PRAGMA table_info(files)')]
+        for each_algorithm in SUPPORTED_HASH_ALGORITHMS:
+            if each_algorithm not in columns:
+                # noinspection SqlResolve, SqlNoDataSourceInspection
+                self._conn.execute(f'ALTER TABLE files ADD COLUMN {each_algorithm} TEXT')
+
+    def _load_file_list(self, files: Sequence[FileItem]):
+        """(re)fills the temporary file_list table with position, inode, full path and size of the given files"""
+        if self._file_list is files:
+            return
+        with self._conn:
+            # noinspection SqlResolve, SqlNoDataSourceInspection
+            self._conn.execute('DROP TABLE IF EXISTS temp.file_list')
+            # noinspection SqlResolve, SqlNoDataSourceInspection
+            self._conn.execute('''
+                CREATE TEMP TABLE file_list (
+                    position INTEGER PRIMARY KEY,
+                    inode INTEGER,
+                    full_path TEXT,
+                    file_size INTEGER
+                )
+            ''')
+            rows = ((position, each_file.inode, each_file.full_path, each_file.file_size)
+                    for position, each_file in enumerate(files))
+            self._executemany_in_batches('INSERT INTO temp.file_list VALUES (?, ?, ?, ?)', rows)
+        self._file_list = files
+
+    def _executemany_in_batches(self, query, rows: Iterable[tuple]):
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, ROWS_PER_BATCH))
+            if not batch:
+                break
+            self._conn.executemany(query, batch)
+
+    def files_not_in_db(self, files: Sequence[FileItem]) -> List[FileItem]:
+        """files (by inode and full path) without an entry in the database"""
+        self._load_file_list(files)
+        # noinspection SqlResolve, SqlNoDataSourceInspection
+        cursor = self._conn.execute('''
+            SELECT l.position FROM temp.file_list l
+            WHERE NOT EXISTS (SELECT 1 FROM files f WHERE f.inode = l.inode AND f.full_path = l.full_path)
+            ORDER BY l.position
+        ''')
+        return [files[position] for position, in cursor]
+
+    def files_not_populated_as_expected(self, files: Sequence[FileItem], hash_algorithms: Sequence[str],
+                                        hash_size_limit: int) -> List[FileItem]:
+        """files with an entry in the database but without signature or, if at most hash_size_limit bytes, without
+        one of the digests of hash_algorithms"""
+        self._load_file_list(files)
+        missing_digest = ' OR '.join(f"COALESCE(f.{each_algorithm}, '') = ''" for each_algorithm in hash_algorithms)
+        # noinspection SqlResolve, SqlNoDataSourceInspection
+        cursor = self._conn.execute(f'''
+            SELECT DISTINCT l.position FROM temp.file_list l
+            JOIN files f ON f.inode = l.inode AND f.full_path = l.full_path
+            WHERE f.signature IS NULL OR (l.file_size <= ? AND ({missing_digest or '0'}))
+            ORDER BY l.position
+        ''', (hash_size_limit,))
+        return [files[position] for position, in cursor]
+
+    def load_hashes_and_signatures(self, files: Sequence[FileItem]):
+        """sets the digests and signatures of the given files from their entries in the database"""
+        self._load_file_list(files)
+        # noinspection SqlResolve, SqlNoDataSourceInspection
+        cursor = self._conn.execute(f'''
+            SELECT l.position, {', '.join('f.' + each for each in SUPPORTED_HASH_ALGORITHMS)}, f.signature
+            FROM temp.file_list l
+            JOIN files f ON f.inode = l.inode AND f.full_path = l.full_path
+            ORDER BY l.position, f.id
+        ''')
+        previous_position = None
+        for position, *digests, signature in cursor:
+            if position == previous_position:  # duplicate entries: the first one is used
+                continue
+            previous_position = position
+            each_file = files[position]
+            for each_algorithm, each_digest in zip(SUPPORTED_HASH_ALGORITHMS, digests):
+                setattr(each_file, each_algorithm, each_digest)
+            if signature is not None:
+                each_file.signature = bytes.fromhex(signature)
+
+    def add_files(self, files: Iterable[FileItem]):
+        with self._conn:
+            # noinspection SqlResolve, SqlNoDataSourceInspection
+            self._executemany_in_batches(f'''
+                INSERT INTO files ({', '.join(_FILE_COLUMNS)}) VALUES ({', '.join('?' for _ in _FILE_COLUMNS)})
+            ''', (_file_to_row(each_file) for each_file in files))
+
+    def update_files(self, files: Iterable[FileItem]):
+        """updates the entries (by inode and full path) of the given files"""
+        updated_columns = [each for each in _FILE_COLUMNS if each not in ('full_path', 'inode')]
+        row_indexes = [_FILE_COLUMNS.index(each) for each in (*updated_columns, 'inode', 'full_path')]
+
+        def rows():
+            for each_file in files:
+                row = _file_to_row(each_file)
+                yield tuple(row[each] for each in row_indexes)
+
+        with self._conn:
+            # noinspection SqlResolve, SqlNoDataSourceInspection
+            self._executemany_in_batches(f'''
+                UPDATE files SET {', '.join(each + ' = ?' for each in updated_columns)}
+                WHERE inode = ? AND full_path = ?
+            ''', rows())
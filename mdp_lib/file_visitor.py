@@ -0,0 +1,73 @@
+import logging
+import re
+from typing import List
+
+from mdp_lib.disk_image_info import TargetDiskImage
+from mdp_lib.mdp_plugin import MDPPlugin, MDPResult
+
+# regex flags that can be applied to a single selector within the combined pattern (as scoped inline flags)
+_INLINE_FLAGS = {re.IGNORECASE: 'i', re.MULTILINE: 'm', re.DOTALL: 's'}
+
+
+def _build_combined_pattern(selectors: List[tuple[str, int]]) -> re.Pattern | None:
+    """Combines all selectors into one pattern, matching a path if any selector matches it (None if not possible)"""
+    alternatives = []
+    for pattern, flags in selectors:
+        inline_flags = ''.join(letter for flag, letter in _INLINE_FLAGS.items() if flags & flag)
+        if flags & ~sum(_INLINE_FLAGS):
+            return None
+        alternatives.append(f'(?{inline_flags}:{pattern})' if inline_flags else f'(?:{pattern})')
+    try:
+        return re.compile('|'.join(alternatives))
+    except re.error:
+        # e.g. selectors using the same group name or numbered backreferences
+        return None
+
+
+def run_file_visitors(target_disk_image: TargetDiskImage, plugins: List[MDPPlugin]) -> List[MDPResult | Exception]:
+    """
+    Runs plugins implementing the file visitor API (see MDPPlugin.file_selectors) with a single pass over the
+    disk image's file list.
+
+    Each file is first checked against one combined pattern of all selectors, only files matching it are checked
+    against the single selectors and passed to plugin.visit_file() for every matching selector (in selector order).
+
+    Returns the result of each plugin's finalize_visit() in the order of the given plugins (or the exception raised
+    by the plugin).
+    """
+    results: List[MDPResult | Exception | None] = [None] * len(plugins)
+    states = {}
+    selectors = []  # (plugin index, selector index, compiled pattern)
+
+    for plugin_index, plugin in enumerate(plugins):
+        try:
+            states[plugin_index] = plugin.start_visit(target_disk_image)
+            for selector_index, (pattern, flags) in enumerate(plugin.file_selectors):
+                selectors.append((plugin_index, selector_index, re.compile(pattern, flags)))
+        except Exception as e:
+            results[plugin_index] = e
+
+    selectors = [each for each in selectors if results[each[0]] is None]
+    combined_pattern = _build_combined_pattern([(each[2].pattern, each[2].flags & ~re.UNICODE) for each in selectors])
+    if combined_pattern is None:
+        logging.warning('File selectors could not be combined, checking each selector separately.')
+
+    for each_file in target_disk_image.accessor.files:
+        full_path = each_file.full_path
+        if combined_pattern is not None and not combined_pattern.search(full_path):
+            continue
+        for plugin_index, selector_index, pattern in selectors:
+            if results[plugin_index] is None and pattern.search(full_path):
+                try:
+                    plugins[plugin_index].visit_file(states[plugin_index], each_file, selector_index)
+                except Exception as e:
+                    results[plugin_index] = e
+
+    for plugin_index, plugin in enumerate(plugins):
+        if results[plugin_index] is None:
+            try:
+                results[plugin_index] = plugin.finalize_visit(target_disk_image, states[plugin_index])
+            except Exception as e:
+                results[plugin_index] = e
+
+    return results
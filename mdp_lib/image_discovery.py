@@ -0,0 +1,170 @@
+import json
+import logging
+import os
+import re
+from typing import List
+
+# segment file extensions of EWF disk images: .E01 ... .E99, .EAA ... .EZZ, .FAA ... .ZZZ and .Ex01 ... (EWF2)
+_EWF_SEGMENT_PATTERN = re.compile(r'^(?P<stem>.+)\.(?P<extension>[e-z][0-9a-z]{2}|ex[0-9a-z]{2})$', re.IGNORECASE)
+_EWF_FIRST_SEGMENT_EXTENSIONS = ('e01', 'ex01')
+# segment file extensions of split raw disk images: .001, .002, ...
+_SPLIT_RAW_SEGMENT_PATTERN = re.compile(r'^(?P<stem>.+)\.(?P<extension>\d{3})$')
+
+# bump if the structure of the cached work items changes
+_DISCOVERY_CACHE_VERSION = 2
+
+# files in data folders that are never disk images
+_IGNORED_FILE_NAMES = ('.DS_Store',)  # mac os necessity
+
+
+def _get_ewf_segment_number(extension: str) -> int:
+    """position of an EWF segment in its segment set (E01 -> 1, E99 -> 99, EAA -> 100, ..., Ex01 -> 1)"""
+    extension = extension.lower()
+    if len(extension) == 4:
+        # EWF2: Ex01 ... Ex99, ExAA ...
+        sequence = extension[2:]
+        if sequence.isdigit():
+            return int(sequence)
+        return 100 + (ord(sequence[0]) - ord('a')) * 26 + ord(sequence[1]) - ord('a')
+    if extension[1:].isdigit():
+        return int(extension[1:]) if extension[0] == 'e' else -1
+    if not extension[1:].isalpha():
+        return -1
+    return (100 + (ord(extension[0]) - ord('e')) * 26 * 26
+            + (ord(extension[1]) - ord('a')) * 26 + ord(extension[2]) - ord('a'))
+
+
+def _group_segments(file_sizes: dict[str, int]) -> List[dict]:
+    """groups the files of a data folder (name -> size) into logical disk images"""
+    ewf_segments = {}        # (stem, EWF2) -> [(segment number, name)]
+    split_raw_segments = {}  # stem -> [name]
+    for each_name in file_sizes:
+        ewf_match = _EWF_SEGMENT_PATTERN.match(each_name)
+        if ewf_match:
+            extension = ewf_match.group('extension')
+            segment_number = _get_ewf_segment_number(extension)
+            if segment_number > 0:
+                ewf_set = (ewf_match.group('stem'), len(extension) == 4)
+                ewf_segments.setdefault(ewf_set, []).append((segment_number, each_name))
+        split_raw_match = _SPLIT_RAW_SEGMENT_PATTERN.match(each_name)
+        if split_raw_match:
+            split_raw_segments.setdefault(split_raw_match.group('stem'), []).append(each_name)
+
+    grouped_names = set()
+    disk_images = []
+
+    for each_segments in ewf_segments.values():
+        each_segments.sort()
+        first_segment_name = each_segments[0][1]
+        # only a set with a first segment is an EWF image (e.g. a single file.exe is not)
+        if first_segment_name.lower().rsplit('.', 1)[1] not in _EWF_FIRST_SEGMENT_EXTENSIONS:
+            continue
+        # segments are numbered without gaps (e.g. file.exe next to file.E01 is not a segment)
+        segment_names = []
+        for expected_segment_number, (segment_number, each_name) in enumerate(each_segments, 1):
+            if segment_number != expected_segment_number:
+                break
+            segment_names.append(each_name)
+        grouped_names.update(segment_names)
+        disk_images.append({'image_type': 'ewf', 'segments': segment_names})
+
+    for each_stem, each_segment_names in split_raw_segments.items():
+        each_segment_names.sort()
+        if not each_segment_names[0].endswith('.001') or grouped_names.intersection(each_segment_names):
+            continue
+        grouped_names.update(each_segment_names)
+        disk_images.append({'image_type': 'split_raw', 'segments': each_segment_names})
+
+    for each_name in file_sizes:
+        if each_name not in grouped_names:
+            disk_images.append({'image_type': 'raw', 'segments': [each_name]})
+
+    for each_disk_image in disk_images:
+        each_disk_image['total_bytes'] = sum(file_sizes[each_name] for each_name in each_disk_image['segments'])
+    return sorted(disk_images, key=lambda each: each['segments'][0])
+
+
+class ImageDiscovery(object):
+    """
+    Finds the disk images of a dataset (see README for the folder structure), i.e. one work item per logical disk
+    image with all its segment files:
+        {'path': first segment, 'target_folder': case folder, 'image_type': 'ewf' | 'split_raw' | 'raw',
+         'segments': [segment paths], 'total_bytes': size of all segments}
+
+    Each data folder is listed once (os.scandir) and segments are grouped by file name, no disk image is opened.
+    Results are cached per data folder (JSON at cache_path) and reused while the folder's files are unchanged, i.e. no
+    files were added, removed or renamed and every file has the same size and modification time (e.g. a segment that
+    grew in place or was replaced under the same name is grouped again).
+    """
+
+    def __init__(self, cache_path: str | None = None):
+        self.cache_path = cache_path
+        self._cache = {}
+        self._cache_changed = False
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r') as f:
+                    cache = json.load(f)
+                if cache.get('version') == _DISCOVERY_CACHE_VERSION:
+                    self._cache = cache['data_folders']
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning(f'Ignoring unreadable image discovery cache {cache_path}: {e}')
+
+    def save(self):
+        if not self.cache_path or not self._cache_changed:
+            return
+        cache_folder = os.path.dirname(self.cache_path)
+        if cache_folder:
+            os.makedirs(cache_folder, exist_ok=True)
+        with open(self.cache_path, 'w') as f:
+            json.dump({'version': _DISCOVERY_CACHE_VERSION, 'data_folders': self._cache}, f)
+        self._cache_changed = False
+
+    def get_disk_images_from_path(self, target_base_path) -> List[dict]:
+        """returns the disk image work items of all case folders in target_base_path"""
+        if not os.path.exists(target_base_path):
+            raise FileNotFoundError('Basepath not found')
+
+        all_disk_images = []
+        with os.scandir(target_base_path) as entries:
+            case_folders = sorted(each_entry.path for each_entry in entries
+                                  if each_entry.name not in _IGNORED_FILE_NAMES)
+        for each_case_folder in case_folders:
+            try:
+                all_disk_images.extend(self.get_disk_images_from_case_folder(each_case_folder))
+            except FileNotFoundError as e:
+                logging.error(e)
+        return all_disk_images
+
+    def get_disk_images_from_case_folder(self, target_folder) -> List[dict]:
+        """returns the disk image work items of a case folder of structure:
+            case1
+                data
+        """
+        data_path = os.path.join(target_folder, 'data')
+        if not os.path.isdir(data_path):
+            raise FileNotFoundError('No data folder in case path ({})'.format(target_folder))
+
+        with os.scandir(data_path) as entries:
+            # name -> [size, modification time]
+            file_stats = {each_entry.name: [each_entry.stat().st_size, each_entry.stat().st_mtime_ns]
+                          for each_entry in entries
+                          if each_entry.is_file() and each_entry.name not in _IGNORED_FILE_NAMES}
+        cache_key = os.path.abspath(data_path)
+        cached = self._cache.get(cache_key)
+        if cached and cached['files'] == file_stats:
+            grouped_images = cached['disk_images']
+        else:
+            grouped_images = _group_segments({each_name: size for each_name, (size, _) in file_stats.items()})
+            self._cache[cache_key] = {'files': file_stats, 'disk_images': grouped_images}
+            self._cache_changed = True
+
+        disk_images = []
+        for each_grouped_image in grouped_images:
+            segment_paths = [os.path.join(data_path, each_name) for each_name in each_grouped_image['segments']]
+            disk_images.append({'path': segment_paths[0],
+                                'target_folder': target_folder,
+                                'image_type': each_grouped_image['image_type'],
+                                'segments': segment_paths,
+                                'total_bytes': each_grouped_image['total_bytes']})
+        return disk_images
@@ -0,0 +1,58 @@
+import hashlib
+import os
+from typing import List
+
+import pyewf
+
+# number of bytes read from the start and the end of each disk image (segment) file
+FINGERPRINT_SAMPLE_SIZE = 64 * 1024
+# raw images are additionally sampled at this many offsets spread across the image (EWF segments contain the set
+# identifier and the media hashes instead)
+RAW_FINGERPRINT_SAMPLES = 256
+RAW_FINGERPRINT_SAMPLE_SIZE = 4096
+# leading bytes of EWF (E01, Ex01) and logical evidence (L01, Lx01) segment files
+_EWF_SIGNATURES = (b'EVF', b'LVF')
+
+
+def get_disk_image_segments(image_path: str) -> List[str]:
+    """Returns all segment files of a (potentially split) EWF disk image, or just the image path for other images"""
+    try:
+        ewf_segments = pyewf.glob(image_path)
+    except Exception:
+        ewf_segments = None
+    return list(ewf_segments) if ewf_segments else [image_path]
+
+
+def get_image_fingerprint(image_path: str, segment_paths: List[str] | None = None) -> str:
+    """
+    Returns a cheap, content-based fingerprint of a disk image (hex SHA-1).
+
+    The full image is not read: the fingerprint covers the size and the first and last FINGERPRINT_SAMPLE_SIZE bytes
+    of every segment file (EWF headers contain the set identifier, the last segment contains the media hashes).
+    Raw images carry no such identifiers, e.g. images of the same size share boot code and zero-filled tails: their
+    fingerprint also covers RAW_FINGERPRINT_SAMPLES samples spread across the image and the modification time, so that
+    an image changed in place gets a new fingerprint.
+    Independent of the image's location, i.e. moving or renaming a case folder keeps the fingerprint.
+    """
+    if segment_paths is None:
+        segment_paths = get_disk_image_segments(image_path)
+
+    fingerprint = hashlib.sha1()
+    for each_segment in segment_paths:
+        segment_stat = os.stat(each_segment)
+        segment_size = segment_stat.st_size
+        fingerprint.update(segment_size.to_bytes(8, 'little'))
+        with open(each_segment, 'rb') as f:
+            head = f.read(FINGERPRINT_SAMPLE_SIZE)
+            fingerprint.update(head)
+            if not head.startswith(_EWF_SIGNATURES):
+                fingerprint.update(segment_stat.st_mtime_ns.to_bytes(8, 'little', signed=True))
+                sample_distance = segment_size // (RAW_FINGERPRINT_SAMPLES + 1)
+                if sample_distance >= RAW_FINGERPRINT_SAMPLE_SIZE:
+                    for i in range(1, RAW_FINGERPRINT_SAMPLES + 1):
+                        f.seek(i * sample_distance)
+                        fingerprint.update(f.read(RAW_FINGERPRINT_SAMPLE_SIZE))
+            if segment_size > FINGERPRINT_SAMPLE_SIZE:
+                f.seek(max(FINGERPRINT_SAMPLE_SIZE, segment_size - FINGERPRINT_SAMPLE_SIZE))
+                fingerprint.update(f.read(FINGERPRINT_SAMPLE_SIZE))
+    return fingerprint.hexdigest()
@@ -0,0 +1,72 @@
+import heapq
+import os
+from typing import List
+
+import pytsk3
+
+import marple.disk_access
+from mdp_lib.image_fingerprint import get_disk_image_segments
+from mdp_lib.plugin_timings import PluginTimings
+
+
+def get_image_format(image_path: str) -> str:
+    """'ewf' or 'raw' (same check as marple.disk_access.get_disk_accessor)"""
+    with open(image_path, 'rb') as f:
+        return 'ewf' if f.read(3) == b'EVF' else 'raw'
+
+
+def get_media_size(image_path: str, segment_paths: List[str]) -> int:
+    """Media size of a disk image, falls back to the size of its segment files if the image can't be opened"""
+    try:
+        with marple.disk_access.get_disk_accessor(image_path) as disk_accessor:
+            return disk_accessor.get_media_size()
+    except Exception:
+        return sum(os.path.getsize(each_segment) for each_segment in segment_paths)
+
+
+def probe_partitions(image_path: str) -> List[dict] | None:
+    """Allocated partitions of a disk image, read from the partition table only (no file system is opened),
+    None if the disk image has no partition table (e.g. a single volume)"""
+    try:
+        with marple.disk_access.get_disk_accessor(image_path) as disk_accessor:
+            return [{'start_sector': each_partition.start,
+                     'sectors': each_partition.len,
+                     'description': each_partition.desc.decode(errors='replace')}
+                    for each_partition in disk_accessor._get_partitions()
+                    if each_partition.flags == pytsk3.TSK_VS_PART_FLAG_ALLOC]
+    except Exception:
+        return None
+
+
+def estimate_disk_image_cost(image_path: str, plugin_names: List[str], plugin_timings: PluginTimings,
+                             segment_paths: List[str] | None = None) -> dict:
+    """Estimates the processing time of a disk image from its media size and the plugins' historical timings"""
+    if segment_paths is None:
+        segment_paths = get_disk_image_segments(image_path)
+    image_format = get_image_format(image_path)
+    media_size = get_media_size(image_path, segment_paths)
+
+    plugin_estimated_seconds = {each_name: plugin_timings.seconds_per_gb(each_name, image_format) * media_size / 1e9
+                                for each_name in plugin_names}
+
+    return {'path': image_path,
+            'image_format': image_format,
+            'segments': len(segment_paths),
+            'image_bytes': sum(os.path.getsize(each_segment) for each_segment in segment_paths),
+            'media_size': media_size,
+            'plugin_estimated_seconds': plugin_estimated_seconds,
+            'estimated_seconds': sum(plugin_estimated_seconds.values())}
+
+
+def order_longest_first(disk_images: List[dict], estimates: dict[str, dict]) -> List[dict]:
+    """Orders disk images by estimated processing time (largest first, images without estimate last)"""
+    return sorted(disk_images, key=lambda each: estimates.get(each['path'], {}).get('estimated_seconds', 0),
+                  reverse=True)
+
+
+def estimate_makespan(estimated_seconds: List[float], workers: int) -> float:
+    """Estimated total processing time when the jobs are handed out longest first to the next free worker"""
+    worker_loads = [0.0] * max(1, min(workers, len(estimated_seconds)))
+    for each_job in sorted(estimated_seconds, reverse=True):
+        heapq.heappush(worker_loads, heapq.heappop(worker_loads) + each_job)
+    return max(worker_loads)
@@ -1,11 +1,19 @@
 import datetime
+import os
 import pprint
+import threading
 from abc import ABC, abstractmethod
 from typing import Any
 
 from mdp_lib.disk_image_info import TargetDiskImage
 
 
+def get_temp_file_name(prefix: str = 'export') -> str:
+    """Returns a temp file name that is unique to the current process and thread (disk images can be processed
+    concurrently, so plugins must not share a fixed temp file name like 'export.bin')"""
+    return f'{prefix}_{os.getpid()}_{threading.get_ident()}.bin'
+
+
 class MDPResult(object):
 
     def __init__(self, source_file: str, plugin_name: str, description: str):
@@ -15,6 +23,7 @@ class MDPResult(object):
         self.results = {}
         self.include_in_data_table = True
         self.time_created = str(datetime.datetime.now())
+        self.processing_time = None  # seconds, set when run by mdp.py
 
     def __str__(self):
         output = {'results': self.results,
@@ -25,17 +34,55 @@ class MDPResult(object):
 
         return "{}".format(pprint.pformat(output))
 
+    def to_dict(self):
+        return {'source_file': self.source_file,
+                'plugin_name': self.plugin_name,
+                'description': self.desc,
+                'results': self.results,
+                'include_in_data_table': self.include_in_data_table,
+                'time_created': self.time_created,
+                'processing_time': self.processing_time}
+
+    @classmethod
+    def from_dict(cls, result_dict: dict):
+        res = cls(source_file=result_dict['source_file'],
+                  plugin_name=result_dict['plugin_name'],
+                  description=result_dict['description'])
+        res.results = result_dict['results']
+        res.include_in_data_table = result_dict['include_in_data_table']
+        res.time_created = result_dict['time_created']
+        res.processing_time = result_dict.get('processing_time')
+        return res
+
 
 class MDPPlugin(ABC):
     name: str
     description: str
     expected_results: list[str]
     include_in_data_table: bool = True
+    # results cached across runs are keyed by plugin version -> increase when a plugin's results change
+    version: str = '1'
+
+    # Constraints for running plugins of one disk image concurrently (see mdp_lib/plugin_scheduler.py):
+    # - run_after: names of plugins that have to be finished before this plugin is started
+    # - exclusive_resources: plugins sharing a resource name are never run at the same time
+    run_after: list[str] = []
+    exclusive_resources: list[str] = []
+
+    # Optional file visitor API (see mdp_lib/file_visitor.py): plugins that only look at files with certain paths
+    # list (regex, re flags) selectors here and implement start_visit(), visit_file() and finalize_visit().
+    # The file list of a disk image is then walked once for all of these plugins instead of once per plugin.
+    file_selectors: list[tuple[str, int]] = []
 
     def __init__(self):
         if not hasattr(self, 'name') or not hasattr(self, 'description') or not hasattr(self, 'expected_results'):
             raise NotImplementedError("Plugin must define 'name', 'description', and 'expected_results'.")
 
+    def cache_key_config(self) -> dict[str, Any]:
+        """Configuration options (name: value) that change this plugin's results, e.g. whether file hashes are
+        computed. Results cached across runs are only reused while these are unchanged (see mdp_lib/result_cache.py)."""
+        return {}
+
     def create_result(self, target_disk_image: TargetDiskImage) -> MDPResult:
         """Initialize MDPResult"""
 
@@ -62,6 +109,26 @@ class MDPPlugin(ABC):
             raise ValueError(f"Unexpected result key '{key}' in plugin '{self.name}'")
         result_obj.results[key] = value
 
+    def start_visit(self, target_disk_image: TargetDiskImage) -> Any:
+        """File visitor API: returns the state for visiting one disk image (passed to visit_file/finalize_visit)"""
+        return None
+
+    def visit_file(self, state: Any, file_item, selector_index: int):
+        """File visitor API: called for each file matching the selector file_selectors[selector_index]"""
+        pass
+
+    def finalize_visit(self, target_disk_image: TargetDiskImage, state: Any) -> MDPResult:
+        """File visitor API: called after all files were visited, returns the plugin's MDPResult"""
+        raise NotImplementedError(f"Plugin '{self.name}' defines file_selectors but does not implement finalize_visit")
+
+    def visit_files(self, target_disk_image: TargetDiskImage) -> MDPResult:
+        """File visitor API: runs only this plugin's visitor on a disk image (e.g. for use in process_disk)"""
+        from mdp_lib.file_visitor import run_file_visitors
+        res = run_file_visitors(target_disk_image, [self])[0]
+        if isinstance(res, Exception):
+            raise res
+        return res
+
     @abstractmethod
     def process_disk(self, target_disk_image: TargetDiskImage) -> MDPResult | None:
         """
@@ -82,5 +149,6 @@ class MDPPlugin(ABC):
                 - You should always use self.create_result(...) to initialize the MDP result object.
                 - For most plugins you should use self.set_results(...) or self.set_result(...) to populate the fields defined in the plugin's expected_results.
                     -> Exception being dynamic plugins (e.g., plaso plugin) that create their result list dynamically
+                - Plugins using the file visitor API (file_selectors) should simply return self.visit_files(target_disk_image).
             """
         pass
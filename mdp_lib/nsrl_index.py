@@ -0,0 +1,181 @@
+import mmap
+import os
+import sqlite3
+import struct
+from bisect import bisect_right
+from typing import Iterable, List
+
+INDEX_FORMAT_VERSION = 2
+INDEX_MAGIC = b'MDPNSRL\0'
+_INDEX_HEADER = struct.Struct('<8sI8sQ')  # magic, format version, hash algorithm, number of digests
+DIGEST_SIZES = {'md5': 16, 'sha1': 20, 'sha256': 32}
+# digest columns of the NSRL FILE table (RDSv3 has sha256, sha1 and md5), strongest first
+NSRL_HASH_ALGORITHMS = ('sha256', 'sha1', 'md5')
+# digests written per write() while building an index
+DIGESTS_PER_WRITE = 100000
+# digests per block of the index, the first digest of each block is stored in the block table after the digests
+DIGESTS_PER_BLOCK = 256
+
+
+class NSRLIndexError(ValueError):
+    """NSRL hash index file is invalid (wrong format, version or truncated)"""
+
+
+def get_nsrl_hash_algorithms(conn) -> List[str]:
+    """digest columns of the FILE table of an NSRL RDS database connection, strongest first"""
+    # noinspection SqlResolve, SqlNoDataSourceInspection
+    columns = {row[1].lower() for row in conn.execute('PRAGMA table_info(FILE)')}
+    return [each for each in NSRL_HASH_ALGORITHMS if each in columns]
+
+
+def get_lookup_hash_algorithm(nsrl_hash_algorithms: Iterable[str], hash_algorithms: Iterable[str]) -> str | None:
+    """digest files are looked up by in the NSRL: the strongest of hash_algorithms (computed for the files) that the
+    NSRL has (nsrl_hash_algorithms, strongest first), the NSRL hash index should be built for it"""
+    hash_algorithms = set(hash_algorithms)
+    return next((each for each in nsrl_hash_algorithms if each in hash_algorithms), None)
+
+
+def build_nsrl_index(path_to_nsrl, index_path, hash_algorithm='sha1') -> int:
+    """
+    Exports the hash_algorithm column of the NSRL RDS database (table FILE) to index_path: the distinct digests as
+    sorted, fixed width binary records after a small header, followed by the block table (the first digest of each
+    block of DIGESTS_PER_BLOCK digests), i.e. the index can be memory mapped and searched without SQLite (see
+    NSRLHashIndex). Sorting is done by SQLite (in temporary files for large RDS).
+    The file is written under a temporary name and then renamed. Returns the number of digests.
+    """
+    digest_size = DIGEST_SIZES[hash_algorithm]
+    index_folder = os.path.dirname(index_path)
+    if index_folder:
+        os.makedirs(index_folder, exist_ok=True)
+
+    conn = sqlite3.connect(f'file:{path_to_nsrl}?mode=ro', uri=True)
+    # noinspection SqlResolve, SqlNoDataSourceInspection
+    cursor = conn.execute(f'''
+        SELECT DISTINCT UPPER({hash_algorithm}) FROM FILE WHERE LENGTH({hash_algorithm}) = ? ORDER BY 1
+    ''', (digest_size * 2,))
+
+    no_digests = 0
+    temporary_path = '{}.{}.tmp'.format(index_path, os.getpid())
+    try:
+        with open(temporary_path, 'wb') as f:
+            f.write(_INDEX_HEADER.pack(INDEX_MAGIC, INDEX_FORMAT_VERSION, hash_algorithm.encode('ascii'), 0))
+            block_starts = []
+            while True:
+                rows = cursor.fetchmany(DIGESTS_PER_WRITE)
+                if not rows:
+                    break
+                digests = [bytes.fromhex(each_digest) for each_digest, in rows]
+                block_starts.extend(digests[-no_digests % DIGESTS_PER_BLOCK::DIGESTS_PER_BLOCK])
+                f.write(b''.join(digests))
+                no_digests += len(rows)
+            f.write(b''.join(block_starts))
+            f.seek(0)
+            f.write(_INDEX_HEADER.pack(INDEX_MAGIC, INDEX_FORMAT_VERSION, hash_algorithm.encode('ascii'), no_digests))
+        os.replace(temporary_path, index_path)
+    finally:
+        conn.close()
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+    return no_digests
+
+
+class _MappedDigests(object):
+    """sorted fixed width digests in a memory mapped file, a sequence of bytes that bisect can search in place"""
+
+    def __init__(self, data, start, no_digests, digest_size):
+        self._data = data
+        self._start = start
+        self._no_digests = no_digests
+        self._digest_size = digest_size
+
+    def __len__(self):
+        return self._no_digests
+
+    def __getitem__(self, index) -> bytes:
+        if not 0 <= index < self._no_digests:
+            raise IndexError(index)
+        start = self._start + index * self._digest_size
+        return self._data[start:start + self._digest_size]
+
+
+class NSRLHashIndex(object):
+    """
+    Memory mapped NSRL hash index built by build_nsrl_index(). The pages are shared by all processes mapping the index
+    (e.g. the worker processes of --jobs).
+    Behaves like a sorted sequence of raw digests (bytes). Lookups search the block table (the first digest of each
+    block of DIGESTS_PER_BLOCK digests) with binary search and then the block itself, i.e. only the pages visited by
+    the searches are read.
+    """
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        with open(index_path, 'rb') as f:
+            self._index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if len(self._index) < _INDEX_HEADER.size:
+                raise NSRLIndexError(f'{index_path} is not an NSRL hash index (file too small)')
+            magic, format_version, hash_algorithm, no_digests = _INDEX_HEADER.unpack_from(self._index)
+            if magic != INDEX_MAGIC:
+                raise NSRLIndexError(f'{index_path} is not an NSRL hash index')
+            if format_version != INDEX_FORMAT_VERSION:
+                raise NSRLIndexError(f'{index_path} has format version {format_version}, '
+                                     f'expected {INDEX_FORMAT_VERSION} (rebuild with --build-nsrl-index)')
+            self.hash_algorithm = hash_algorithm.rstrip(b'\0').decode('ascii')
+            self.digest_size = DIGEST_SIZES.get(self.hash_algorithm)
+            if self.digest_size is None:
+                raise NSRLIndexError(f'{index_path} has unsupported hash algorithm {self.hash_algorithm}')
+            no_blocks = -(-no_digests // DIGESTS_PER_BLOCK)
+            if len(self._index) != _INDEX_HEADER.size + (no_digests + no_blocks) * self.digest_size:
+                raise NSRLIndexError(f'{index_path} is truncated')
+        except NSRLIndexError:
+            self._index.close()
+            raise
+        self._no_digests = no_digests
+        self._digests = _MappedDigests(self._index, _INDEX_HEADER.size, no_digests, self.digest_size)
+        self._block_starts = _MappedDigests(self._index, _INDEX_HEADER.size + no_digests * self.digest_size, no_blocks,
+                                            self.digest_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._index.close()
+
+    def __len__(self):
+        return self._no_digests
+
+    def __getitem__(self, index) -> bytes:
+        return self._digests[index]
+
+    def contains(self, hex_digests: Iterable[str]) -> List[bool]:
+        """
+        For each of the given hex digests (None: not hashed), whether it is in the index.
+        The digests are searched in sorted order, i.e. the index is read front to back.
+        """
+        digests = []
+        for each_digest in hex_digests:
+            try:
+                digest = bytes.fromhex(each_digest) if each_digest else None
+            except ValueError:
+                digest = None
+            digests.append(digest if digest is not None and len(digest) == self.digest_size else None)
+
+        block_size = DIGESTS_PER_BLOCK * self.digest_size
+        digests_end = _INDEX_HEADER.size + self._no_digests * self.digest_size
+
+        result = [False] * len(digests)
+        for position in sorted((i for i, each in enumerate(digests) if each is not None), key=digests.__getitem__):
+            digest = digests[position]
+            block = bisect_right(self._block_starts, digest) - 1
+            if block < 0:
+                continue
+            start = _INDEX_HEADER.size + block * block_size
+            block_data = self._index[start:min(start + block_size, digests_end)]
+            offset = block_data.find(digest)
+            while offset != -1 and offset % self.digest_size:  # match across two digests
+                offset = block_data.find(digest, offset + 1)
+            result[position] = offset != -1
+        return result
@@ -0,0 +1,111 @@
+import logging
+import multiprocessing
+import os
+import time
+
+from mdp_lib.disk_image_info import TargetDiskImage
+from mdp_lib.mdp_plugin import MDPPlugin, MDPResult
+
+# interval for checking an isolated plugin's child process (result, timeout, memory usage)
+_POLL_INTERVAL = 0.5
+
+
+class PluginTimeoutError(Exception):
+    pass
+
+
+class PluginMemoryLimitError(Exception):
+    pass
+
+
+class IsolatedPluginError(Exception):
+    pass
+
+
+def _get_rss_bytes(pid: int) -> int | None:
+    """Resident memory of a process (Linux only, None if not available)"""
+    try:
+        with open(f'/proc/{pid}/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _run_plugin_in_child(connection, plugin: MDPPlugin, disk_image_path, base_path, files, attributes):
+    """runs in the child process: reopens the disk image (reusing the parent's file list) and runs the plugin"""
+    try:
+        target_disk_image = TargetDiskImage(disk_image_path, files=files)
+        target_disk_image.base_path = base_path
+        for key, value in attributes.items():
+            target_disk_image.add_attributes(key, value)
+
+        plugin_start_time = time.time()
+        res = plugin.process_disk(target_disk_image)
+        res.processing_time = time.time() - plugin_start_time
+        connection.send(('result', res.to_dict()))
+    except Exception as e:
+        try:
+            connection.send(('error', e))
+        except Exception:
+            # exception can't be pickled
+            connection.send(('error', IsolatedPluginError(f'{type(e).__name__}: {e}')))
+    finally:
+        connection.close()
+
+
+def run_plugin_isolated(target_disk_image: TargetDiskImage, plugin: MDPPlugin, timeout_seconds: float,
+                        memory_limit_bytes: int) -> MDPResult:
+    """
+    Runs a plugin on a disk image in a separate child process (fresh interpreter, i.e. memory leaks of the plugin
+    or of pytsk3/pyewf don't build up in the calling process).
+
+    The child process is killed if it runs longer than timeout_seconds or its resident memory exceeds
+    memory_limit_bytes (Linux only), which raises PluginTimeoutError or PluginMemoryLimitError respectively.
+    A value of 0 disables the limit.
+    Exceptions raised by the plugin are re-raised (or wrapped in IsolatedPluginError if they can't be transferred).
+    """
+    context = multiprocessing.get_context('spawn')
+    parent_connection, child_connection = context.Pipe(duplex=False)
+    process = context.Process(target=_run_plugin_in_child,
+                              args=(child_connection, plugin, target_disk_image.image_path,
+                                    target_disk_image.base_path, target_disk_image.files,
+                                    dict(target_disk_image.attributes)),
+                              daemon=True)
+    process.start()
+    child_connection.close()
+
+    if memory_limit_bytes and _get_rss_bytes(process.pid) is None:
+        logging.warning(f'Memory usage of isolated plugin {plugin.name} can not be monitored on this platform.')
+        memory_limit_bytes = 0
+
+    start_time = time.monotonic()
+    try:
+        while True:
+            if parent_connection.poll(_POLL_INTERVAL):
+                try:
+                    status, payload = parent_connection.recv()
+                except EOFError:
+                    process.join()
+                    raise IsolatedPluginError(f'Child process of plugin {plugin.name} exited without result '
+                                              f'(exit code {process.exitcode})')
+                break
+            if not process.is_alive() and not parent_connection.poll():
+                raise IsolatedPluginError(f'Child process of plugin {plugin.name} exited without result '
+                                          f'(exit code {process.exitcode})')
+            if timeout_seconds and time.monotonic() - start_time > timeout_seconds:
+                raise PluginTimeoutError(f'Plugin {plugin.name} exceeded timeout of {timeout_seconds} seconds')
+            if memory_limit_bytes:
+                rss_bytes = _get_rss_bytes(process.pid)
+                if rss_bytes is not None and rss_bytes > memory_limit_bytes:
+                    raise PluginMemoryLimitError(f'Plugin {plugin.name} exceeded memory limit of '
+                                                 f'{memory_limit_bytes // (1024 * 1024)} MB '
+                                                 f'({rss_bytes // (1024 * 1024)} MB used)')
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        parent_connection.close()
+
+    if status == 'error':
+        raise payload
+    return MDPResult.from_dict(payload)
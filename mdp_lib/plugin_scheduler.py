@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, List
+
+from mdp_lib.mdp_plugin import MDPPlugin
+
+
+class PluginSchedulingError(RuntimeError):
+    pass
+
+
+def run_plugins_concurrently(plugins: List[MDPPlugin], run_plugin: Callable[[MDPPlugin], Any],
+                             max_workers: int) -> List[Any]:
+    """
+    Runs run_plugin(plugin) for all given plugins (of one disk image) on a thread pool.
+
+    A plugin is only started once
+        - all plugins named in its run_after list (that are part of this run) have finished and
+        - no running plugin shares one of its exclusive_resources.
+    Among the plugins that are ready, the order of the given plugin list is kept.
+
+    Returns the return values of run_plugin in the order of the given plugin list. Plugins that can never be started
+    (e.g. due to cyclic run_after constraints) get a PluginSchedulingError as their return value.
+    """
+    plugin_names = {each_plugin.name for each_plugin in plugins}
+
+    pending = list(range(len(plugins)))
+    results: List[Any] = [None] * len(plugins)
+    finished_names = set()
+    locked_resources = set()
+    running = {}  # future -> plugin index
+
+    def is_ready(plugin: MDPPlugin) -> bool:
+        for each_name in plugin.run_after:
+            if each_name in plugin_names and each_name not in finished_names:
+                return False
+        return not locked_resources.intersection(plugin.exclusive_resources)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            for index in list(pending):
+                if len(running) >= max_workers:
+                    break
+                plugin = plugins[index]
+                if is_ready(plugin):
+                    pending.remove(index)
+                    locked_resources.update(plugin.exclusive_resources)
+                    running[executor.submit(run_plugin, plugin)] = index
+
+            if not running:
+                # nothing can be started anymore -> constraints can't be satisfied for the remaining plugins
+                for index in pending:
+                    results[index] = PluginSchedulingError(
+                        f"Plugin '{plugins[index].name}' could not be scheduled (run_after: {plugins[index].run_after})")
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                plugin = plugins[index]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    results[index] = e
+                finished_names.add(plugin.name)
+                locked_resources.difference_update(plugin.exclusive_resources)
+
+    return results
@@ -0,0 +1,53 @@
+import json
+import os
+
+# assumed processing time for plugins without any recorded timings
+DEFAULT_SECONDS_PER_GB = 30.0
+
+
+class PluginTimings(object):
+    """
+    Historical processing times of plugins, stored as JSON and used to estimate the cost of processing disk images.
+
+    Timings are accumulated per plugin and disk image format ('ewf' or 'raw', EWF needs decompression) and expressed
+    as seconds per GB of media size.
+    """
+
+    def __init__(self, timings_path: str):
+        self.timings_path = timings_path
+        self._timings = {}  # plugin name -> image format -> {'seconds': ..., 'bytes': ..., 'runs': ...}
+        if os.path.exists(timings_path):
+            with open(timings_path, 'r') as f:
+                self._timings = json.load(f)
+
+    def save(self):
+        timings_folder = os.path.dirname(self.timings_path)
+        if timings_folder:
+            os.makedirs(timings_folder, exist_ok=True)
+        with open(self.timings_path, 'w') as f:
+            json.dump(self._timings, f, indent=2)
+
+    def add(self, plugin_name: str, image_format: str, seconds: float, media_size: int):
+        if not media_size:
+            return
+        timing = self._timings.setdefault(plugin_name, {}).setdefault(image_format,
+                                                                      {'seconds': 0.0, 'bytes': 0, 'runs': 0})
+        timing['seconds'] += seconds
+        timing['bytes'] += media_size
+        timing['runs'] += 1
+
+    def has_timings(self, plugin_name: str) -> bool:
+        return plugin_name in self._timings
+
+    def seconds_per_gb(self, plugin_name: str, image_format: str) -> float:
+        """Average processing time of a plugin (for the image format if known, otherwise for all formats)"""
+        plugin_timings = self._timings.get(plugin_name, {})
+        if image_format in plugin_timings:
+            timings = [plugin_timings[image_format]]
+        else:
+            timings = list(plugin_timings.values())
+
+        total_bytes = sum(each['bytes'] for each in timings)
+        if not total_bytes:
+            return DEFAULT_SECONDS_PER_GB
+        return sum(each['seconds'] for each in timings) / (total_bytes / 1e9)
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import List
+
+from mdp_lib.mdp_plugin import MDPPlugin, MDPResult
+
+
+class ResultCache(object):
+    """
+    Cache of plugin results across MDP runs (SQLite database).
+
+    Results are keyed by image fingerprint (see mdp_lib/image_fingerprint.py), plugin name and plugin version, i.e.
+    changing a plugin's version attribute invalidates its cached results. A digest of the configuration the plugin
+    depends on (MDPPlugin.cache_key_config()) is stored with each result, results cached with another configuration
+    are invalidated when looked up.
+    The cache is bounded in size: least recently used results are evicted once max_size_bytes is exceeded.
+    """
+
+    def __init__(self, cache_path: str, max_size_bytes: int):
+        self.cache_path = cache_path
+        self.max_size_bytes = max_size_bytes
+
+        cache_folder = os.path.dirname(cache_path)
+        if cache_folder:
+            os.makedirs(cache_folder, exist_ok=True)
+
+        self._conn = sqlite3.connect(cache_path)
+        # noinspection SqlResolve, SqlNoDataSourceInspection
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS results (
+                fingerprint TEXT,
+                plugin_name TEXT,
+                plugin_version TEXT,
+                result TEXT,
+                size INTEGER,
+                last_access REAL,
+                config_digest TEXT,
+                PRIMARY KEY (fingerprint, plugin_name, plugin_version)
+            )
+        ''')
+        # caches created by earlier versions don't have config digests (their results are invalidated on lookup)
+        # noinspection SqlResolve, SqlNoDataSourceInspection
+        if 'config_digest' not in [row[1] for row in self._conn.execute('PRAGMA table_info(results)')]:
+            # noinspection SqlResolve, SqlNoDataSourceInspection
+            self._conn.execute('ALTER TABLE results ADD COLUMN config_digest TEXT')
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    @staticmethod
+    def get_config_digest(plugin: MDPPlugin) -> str:
+        serialized_config = json.dumps(plugin.cache_key_config(), sort_keys=True, default=str)
+        return hashlib.sha256(serialized_config.encode('utf-8')).hexdigest()
+
+    def get(self, fingerprint: str, plugin: MDPPlugin, source_file: str) -> MDPResult | None:
+        """Returns the cached result of a plugin for the image with the given fingerprint (None if not cached or
+        cached with another plugin configuration)"""
+        # noinspection SqlResolve, SqlNoDataSourceInspection
+        row = self._conn.execute('''
+            SELECT result, config_digest FROM results WHERE fingerprint = ? AND plugin_name = ? AND plugin_version = ?
+        ''', (fingerprint, plugin.name, str(plugin.version))).fetchone()
+        if row is None:
+            return None
+        if row[1] != self.get_config_digest(plugin):
+            # noinspection SqlResolve, SqlNoDataSourceInspection
+            self._conn.execute('''
+                DELETE FROM results WHERE fingerprint = ? AND plugin_name = ? AND plugin_version = ?
+            ''', (fingerprint, plugin.name, str(plugin.version)))
+            self._conn.commit()
+            return None
+
+        # noinspection SqlResolve, SqlNoDataSourceInspection
+        self._conn.execute('''
+            UPDATE results SET last_access = ? WHERE fingerprint = ? AND plugin_name = ? AND plugin_version = ?
+        ''', (time.time(), fingerprint, plugin.name, str(plugin.version)))
+        self._conn.commit()
+
+        result = MDPResult.from_dict(json.loads(row[0]))
+        # the same image might have been cached at another location
+        result.source_file = source_file
+        return result
+
+    def put(self, fingerprint: str, plugin: MDPPlugin, result: MDPResult):
+        serialized_result = json.dumps(result.to_dict())
+        # noinspection SqlResolve, SqlNoDataSourceInspection
+        self._conn.execute('''
+            INSERT OR REPLACE INTO results (fingerprint, plugin_name, plugin_version, result, size, last_access,
+                                            config_digest)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (fingerprint, plugin.name, str(plugin.version), serialized_result, len(serialized_result), time.time(),
+              self.get_config_digest(plugin)))
+        self._conn.commit()
+        self._evict()
+
+    def _evict(self):
+        """Removes least recently used results until the cache is within its size limit"""
+        # noinspection SqlResolve, SqlNoDataSourceInspection
+        total_size = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total_size <= self.max_size_bytes:
+            return
+
+        # noinspection SqlResolve, SqlNoDataSourceInspection
+        rows = self._conn.execute('''
+            SELECT rowid, size FROM results ORDER BY last_access ASC
+        ''').fetchall()
+        rowids_to_delete = []
+        for rowid, size in rows:
+            if total_size <= self.max_size_bytes:
+                break
+            rowids_to_delete.append((rowid,))
+            total_size -= size
+
+        # noinspection SqlResolve, SqlNoDataSourceInspection
+        self._conn.executemany('DELETE FROM results WHERE rowid = ?', rowids_to_delete)
+        self._conn.commit()
+
+    def invalidate(self, plugin_names: List[str] | None = None) -> int:
+        """Removes cached results of the given plugins (all cached results if no plugin names are given),
+        returns the number of removed results"""
+        if plugin_names:
+            placeholders = ', '.join('?' for _ in plugin_names)
+            # noinspection SqlResolve, SqlNoDataSourceInspection
+            cursor = self._conn.execute(f'DELETE FROM results WHERE plugin_name IN ({placeholders})', plugin_names)
+        else:
+            # noinspection SqlResolve, SqlNoDataSourceInspection
+            cursor = self._conn.execute('DELETE FROM results')
+        self._conn.commit()
+        # noinspection SqlResolve, SqlNoDataSourceInspection
+        self._conn.execute('VACUUM')
+        return cursor.rowcount
@@ -4,6 +4,7 @@ from typing import List
 
 from marple.file_object import FileItem
 
+from config.config import populate_file_signatures, populate_file_hashes_and_signatures
 from mdp_lib.disk_image_info import TargetDiskImage
 from mdp_lib.mdp_plugin import MDPPlugin
 
@@ -129,51 +130,65 @@ class FileTypes(MDPPlugin):
         # uncertainty -> not a certain mismatch
         return False
 
-    def process_disk(self, target_disk_image: TargetDiskImage):
-        disk_image = target_disk_image.accessor
-        files: List[FileItem] = disk_image.files
-
-        no_signature_mismatches = None
+    # one selector matching all file extensions of all categories (category is determined per visited file)
+    file_selectors = [
+        (r'(' + '|'.join(re.escape(ext) for extensions in file_categories.values() for ext in extensions) + r')$',
+         re.IGNORECASE)
+    ]
 
-        file_category_count = {category: 0 for category in self.file_categories}
+    def cache_key_config(self):
+        # signature mismatches are only counted if file signatures are populated
+        return {'populate_file_signatures': populate_file_signatures,
+                'populate_file_hashes_and_signatures': populate_file_hashes_and_signatures}
 
+    def start_visit(self, target_disk_image: TargetDiskImage):
         category_patterns = {}
 
         for category, extensions in self.file_categories.items():
             pattern = r'.*(' + '|'.join([re.escape(ext) for ext in extensions]) + r')$'
-            category_patterns[category] = pattern
+            category_patterns[category] = re.compile(pattern, re.IGNORECASE)
 
         signatures_populated = target_disk_image.attributes['signatures_populated']
 
-        if signatures_populated:
-            no_signature_mismatches = 0
-        else:
+        if not signatures_populated:
             print('File signature fields not populated. Skipping signature check.')
 
-        for each in files:
-            for category, pattern in category_patterns.items():
-                _, file_ext = os.path.splitext(each.full_path)
-                if re.match(pattern, each.full_path, re.IGNORECASE):
-                    file_category_count[category] += 1
-                    if signatures_populated and each.signature:
-                        encountered_signature = ''
-                        try:
-                            encountered_signature = each.signature.hex()
-                        except Exception as e:
-                            print(e)
-                            continue
-
-                        if self.is_mismatch_file_signature_and_extension(encountered_signature,file_ext):
-                            no_signature_mismatches += 1
-                            # print('File: ', each.full_path, '\nSignature: ', each.signature, '; File Ext: ', file_ext)
-                    break
-
+        return {'category_patterns': category_patterns,
+                'signatures_populated': signatures_populated,
+                'file_category_count': {category: 0 for category in self.file_categories},
+                'no_signature_mismatches': 0 if signatures_populated else None}
+
+    def visit_file(self, state, file_item, selector_index):
+        each = file_item
+        signatures_populated = state['signatures_populated']
+
+        for category, pattern in state['category_patterns'].items():
+            _, file_ext = os.path.splitext(each.full_path)
+            if pattern.match(each.full_path):
+                state['file_category_count'][category] += 1
+                if signatures_populated and each.signature:
+                    encountered_signature = ''
+                    try:
+                        encountered_signature = each.signature.hex()
+                    except Exception as e:
+                        print(e)
+                        continue
+
+                    if self.is_mismatch_file_signature_and_extension(encountered_signature,file_ext):
+                        state['no_signature_mismatches'] += 1
+                        # print('File: ', each.full_path, '\nSignature: ', each.signature, '; File Ext: ', file_ext)
+                break
+
+    def finalize_visit(self, target_disk_image: TargetDiskImage, state):
         result = self.create_result(target_disk_image)
 
-        for category, count in file_category_count.items():
+        for category, count in state['file_category_count'].items():
             self.set_result(result, category, count)
             # print(f"{category}: {count}")
 
-        self.set_result(result, 'no_signature_mismatches', no_signature_mismatches)
+        self.set_result(result, 'no_signature_mismatches', state['no_signature_mismatches'])
 
         return result
+
+    def process_disk(self, target_disk_image: TargetDiskImage):
+        return self.visit_files(target_disk_image)
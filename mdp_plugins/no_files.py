@@ -5,9 +5,11 @@ from typing import List
 
 from marple.file_object import FileItem
 
-from config.config import path_to_nsrl
+from config.config import path_to_nsrl, path_to_nsrl_index, populate_file_hashes_and_signatures, hash_algorithms, \
+    max_file_size_for_sha1_calculation
 from mdp_lib.disk_image_info import TargetDiskImage
 from mdp_lib.mdp_plugin import MDPPlugin
+from mdp_lib.nsrl_index import NSRLHashIndex, get_nsrl_hash_algorithms, get_lookup_hash_algorithm
 
 
 class NumberOfFiles(MDPPlugin):
@@ -15,33 +17,108 @@ class NumberOfFiles(MDPPlugin):
     description = 'Number of files'
     expected_results = ['no_files', 'no_non_nsrl_files', 'no_non_nsrl_files_incl_zero']
 
+    def cache_key_config(self):
+        return {'populate_file_hashes_and_signatures': populate_file_hashes_and_signatures,
+                'hash_algorithms': sorted(hash_algorithms),
+                'max_file_size_for_sha1_calculation': max_file_size_for_sha1_calculation,
+                'path_to_nsrl': path_to_nsrl,
+                'path_to_nsrl_index': path_to_nsrl_index,
+                # an updated NSRL database or (re)built hash index may change the results
+                'nsrl_mtime': self.get_mtime(path_to_nsrl),
+                'nsrl_index_mtime': self.get_mtime(path_to_nsrl_index)}
+
     @staticmethod
-    def is_sha1_in_nsrl(sha1, conn) -> bool:
-        # print(sha1.upper())
+    def get_mtime(path) -> float | None:
+        """modification time of path (None if not set or missing)"""
+        if not path or not os.path.exists(path):
+            return None
+        return os.path.getmtime(path)
+
+    @staticmethod
+    def get_nsrl_hash_algorithms(conn) -> List[str]:
+        """digest columns of the NSRL FILE table (RDSv3 has sha256, sha1 and md5), strongest first"""
+        return get_nsrl_hash_algorithms(conn)
+
+    @staticmethod
+    def is_hash_in_nsrl(hash_algorithm, file_hash, conn) -> bool:
         cursor = conn.cursor()
 
         # noinspection SqlResolve, SqlNoDataSourceInspection
         # Debugging: check id index is used
-        # query_plan = """EXPLAIN QUERY PLAN SELECT sha1 FROM FILE WHERE sha1 = ?"""
-        # cursor.execute(query_plan, (sha1.upper(),))
+        # query_plan = f"""EXPLAIN QUERY PLAN SELECT {hash_algorithm} FROM FILE WHERE {hash_algorithm} = ?"""
+        # cursor.execute(query_plan, (file_hash.upper(),))
         # plan = cursor.fetchall()
         # print("Query Plan:", plan)
 
-        query = """SELECT EXISTS(SELECT 1 FROM FILE WHERE sha1 = ?)"""
-
-        # print('running nsrl query...', end=' ')
-        # nsrl_start = time.time()
-
-        cursor.execute(query, (sha1.upper(),))
+        cursor.execute(f"""SELECT EXISTS(SELECT 1 FROM FILE WHERE {hash_algorithm} = ?)""", (file_hash.upper(),))
         result = cursor.fetchone()[0]
-
-        # nsrl_end = time.time()
-        # print('query complete in {} seconds'.format(nsrl_end-nsrl_start))
-
         cursor.close()
-
         return bool(result)
 
+    @staticmethod
+    def is_sha1_in_nsrl(sha1, conn) -> bool:
+        return NumberOfFiles.is_hash_in_nsrl('sha1', sha1, conn)
+
+    @staticmethod
+    def open_nsrl_index() -> NSRLHashIndex | None:
+        """NSRL hash index built with mdp.py --build-nsrl-index (None if not built or older than the NSRL database)"""
+        if not path_to_nsrl_index or not os.path.exists(path_to_nsrl_index):
+            return None
+        if os.path.exists(path_to_nsrl) and os.path.getmtime(path_to_nsrl) > os.path.getmtime(path_to_nsrl_index):
+            print('NSRL hash index is older than the NSRL database, not used (rebuild with --build-nsrl-index)')
+            return None
+        try:
+            return NSRLHashIndex(path_to_nsrl_index)
+        except (OSError, ValueError) as e:
+            print(f'NSRL hash index not used: {e}')
+            return None
+
+    def lookup_files_in_nsrl(self, files: List[FileItem], nsrl_index: NSRLHashIndex | None) -> List[bool | None]:
+        """
+        For each file whether its digest is in the NSRL (None: no digest to look up).
+        Each file is looked up by the strongest digest computed for it that the NSRL has, whether or not a hash index
+        exists: digests of the NSRL hash index's algorithm are looked up all at once in the index, the other files one
+        by one in the NSRL database.
+        """
+        conn = None
+        if os.path.exists(path_to_nsrl):
+            # open database here once
+            open_db_start = time.time()
+            conn = sqlite3.connect(path_to_nsrl)
+            open_db_end = time.time()
+            print('NSRL database opened in {} seconds'.format(open_db_end-open_db_start))
+            nsrl_hash_algorithms = self.get_nsrl_hash_algorithms(conn)
+        else:
+            nsrl_hash_algorithms = [nsrl_index.hash_algorithm] if nsrl_index is not None else []
+        if nsrl_index is not None and \
+                nsrl_index.hash_algorithm != get_lookup_hash_algorithm(nsrl_hash_algorithms, hash_algorithms):
+            print(f'NSRL hash index has {nsrl_index.hash_algorithm} digests, files are looked up in the NSRL database '
+                  f'(rebuild the index with --build-nsrl-index)')
+
+        # strongest digest computed for each file that the NSRL has
+        # (field might not populated for larger files (above defined max for hashing))
+        lookups = [next(((each, getattr(each_file, each)) for each in nsrl_hash_algorithms if getattr(each_file, each)),
+                        (None, None)) for each_file in files]
+
+        in_nsrl: List[bool | None] = [None] * len(files)
+        if nsrl_index is not None:
+            index_start = time.time()
+            index_positions = [position for position, (hash_algorithm, _) in enumerate(lookups)
+                               if hash_algorithm == nsrl_index.hash_algorithm]
+            found = nsrl_index.contains(lookups[position][1] for position in index_positions)
+            for position, each_found in zip(index_positions, found):
+                in_nsrl[position] = each_found
+            print('NSRL hash index lookups took {} seconds'.format(time.time() - index_start))
+
+        if conn is not None:
+            for position, (hash_algorithm, file_hash) in enumerate(lookups):
+                if in_nsrl[position] is None and file_hash:
+                    in_nsrl[position] = self.is_hash_in_nsrl(hash_algorithm, file_hash, conn)
+
+            # close database here
+            conn.close()
+        return in_nsrl
+
     def process_disk(self, target_disk_image: TargetDiskImage):
         disk_image = target_disk_image.accessor
         files = disk_image.files
@@ -58,27 +135,25 @@ class NumberOfFiles(MDPPlugin):
             # TODO exception handling for incorrect path_to_nsrl or unexpected nsrl db
             # need sth like check whether nsrl db is valid, only go here if nsrl check method if valid
 
-            if not os.path.exists(path_to_nsrl):
+            nsrl_index = self.open_nsrl_index()
+            if nsrl_index is None and not os.path.exists(path_to_nsrl):
                 print('Provided NSRL database does not exist, skipping NSRL lookups')
             else:
-                print('NSRL database found...')
-
-                # open database here once
-                open_db_start = time.time()
-                conn = sqlite3.connect(path_to_nsrl)
-                open_db_end = time.time()
-                print('NSRL database opened in {} seconds'.format(open_db_end-open_db_start))
+                print('NSRL database found...' if nsrl_index is None else 'NSRL hash index found...')
 
                 no_non_nsrl_files = 0
                 no_non_nsrl_files_incl_zero = 0
                 no_nsrl = 0
                 no_nsrl_non_zero = 0
                 files: List[FileItem] = disk_image.files
-                for each_file in files:
-                    sha1_file_hash = each_file.sha1
-                    if sha1_file_hash:  # field might not populated for larger files (above defined max for hashing)
-                        sha1_in_nsrl = self.is_sha1_in_nsrl(sha1_file_hash, conn)
-                        if sha1_in_nsrl:
+                try:
+                    in_nsrl = self.lookup_files_in_nsrl(files, nsrl_index)
+                finally:
+                    if nsrl_index is not None:
+                        nsrl_index.close()
+                for each_file, hash_in_nsrl in zip(files, in_nsrl):
+                    if hash_in_nsrl is not None:
+                        if hash_in_nsrl:
                             no_nsrl += 1
                             if each_file.file_size > 0:
                                 no_nsrl_non_zero += 1
@@ -92,8 +167,6 @@ class NumberOfFiles(MDPPlugin):
                         no_non_nsrl_files += 1
                         no_non_nsrl_files_incl_zero += 1
 
-                # close database here
-                conn.close()
                 # print('NSRL database check took {} seconds'.format(time.time()-open_db_start))
 
                 # print("NSRL: ", no_nsrl)
@@ -10,30 +10,33 @@ class NumberOfUserFiles(MDPPlugin):
     description = 'Number of files within the user folder (all users)'
     expected_results = ['no_files_in_users_folder']
 
-    def process_disk(self, target_disk_image: TargetDiskImage):
-        disk_image = target_disk_image.accessor
-        files = disk_image.files
-
-        count = None
-        user_path_exists = False
-
-        for each in files:
-            if (re.match(r'P_[0-9]+/Users/', each.full_path, re.IGNORECASE)
-                    or re.match('P_[0-9]+/Documents and Settings/', each.full_path, re.IGNORECASE)
-                    or re.match('P_[0-9]+/Dokumente und Einstellungen/', each.full_path, re.IGNORECASE)
-                    or re.match('P_[0-9]+/home/', each.full_path)):
-                user_path_exists = True
-                break
-
-        if user_path_exists:
-            count = 0
-            for each in files:
-                if (re.match('P_[0-9]+/Users/.*', each.full_path)
-                        or re.match('P_[0-9]+/Documents and Settings/.*', each.full_path)
-                        or re.match('P_[0-9]+/Dokumente und Einstellungen/.*', each.full_path) # Is there a more elegant way to do this?
-                        or re.match('P_[0-9]+/home/.*', each.full_path)):
-                    count += 1
+    file_selectors = [
+        # 0-3: user folder exists
+        (r'^P_[0-9]+/Users/', re.IGNORECASE),
+        ('^P_[0-9]+/Documents and Settings/', re.IGNORECASE),
+        ('^P_[0-9]+/Dokumente und Einstellungen/', re.IGNORECASE),
+        ('^P_[0-9]+/home/', 0),
+        # 3-6: files counted (home/ selector is used for both)
+        ('^P_[0-9]+/Users/.*', 0),
+        ('^P_[0-9]+/Documents and Settings/.*', 0),
+        ('^P_[0-9]+/Dokumente und Einstellungen/.*', 0),  # Is there a more elegant way to do this?
+    ]
+
+    def start_visit(self, target_disk_image: TargetDiskImage):
+        return {'user_path_exists': False, 'count': 0}
+
+    def visit_file(self, state, file_item, selector_index):
+        if selector_index <= 3:
+            state['user_path_exists'] = True
+        if selector_index >= 3:
+            state['count'] += 1
+
+    def finalize_visit(self, target_disk_image: TargetDiskImage, state):
+        count = state['count'] if state['user_path_exists'] else None
 
         result = self.create_result(target_disk_image)
         self.set_result(result, 'no_files_in_users_folder', count)
         return result
+
+    def process_disk(self, target_disk_image: TargetDiskImage):
+        return self.visit_files(target_disk_image)
@@ -9,33 +9,30 @@ class EstimateOS(MDPPlugin):
     description = 'Check for OS present'
     expected_results = ['windows_found', 'linux_found', 'mac_found']
 
-    def process_disk(self, target_disk_image: TargetDiskImage):
-        disk_image = target_disk_image.accessor
-        files = disk_image.files
-        
-        win_found = False
-        lin_found = False
-        mac_found = False
-
-        # This is a very basic approach and a more advanced version of this could be written
-        for each_file in files:
-            if re.search('Windows/System32/config/software$', each_file.full_path, re.IGNORECASE) is not None:
-                win_found = True
-                # print('Windows found')
-
-            if re.search('System/Library/CoreServices/SystemVersion.plist', each_file.full_path, re.IGNORECASE) is not None:
-                mac_found = True
-                # print('macOS found')
-
-            if re.search('var/log/syslog', each_file.full_path, re.IGNORECASE) is not None:
-                lin_found = True
-                # print('Linux found')
-
+    # This is a very basic approach and a more advanced version of this could be written
+    # (result key set to True if any file matches the respective selector)
+    file_selectors = [
+        ('Windows/System32/config/software$', re.IGNORECASE),
+        ('System/Library/CoreServices/SystemVersion.plist', re.IGNORECASE),
+        ('var/log/syslog', re.IGNORECASE)
+    ]
+    selector_result_keys = ['windows_found', 'mac_found', 'linux_found']
+
+    def start_visit(self, target_disk_image: TargetDiskImage):
+        return {'windows_found': False, 'linux_found': False, 'mac_found': False}
+
+    def visit_file(self, state, file_item, selector_index):
+        state[self.selector_result_keys[selector_index]] = True
+
+    def finalize_visit(self, target_disk_image: TargetDiskImage, state):
         result = self.create_result(target_disk_image)
         self.set_results(result, {
-            'windows_found': str(win_found),  # multiple os can be reported if they are present
-            'linux_found': str(lin_found),
-            'mac_found': str(mac_found)
+            'windows_found': str(state['windows_found']),  # multiple os can be reported if they are present
+            'linux_found': str(state['linux_found']),
+            'mac_found': str(state['mac_found'])
         })
 
         return result
+
+    def process_disk(self, target_disk_image: TargetDiskImage):
+        return self.visit_files(target_disk_image)
@@ -3,7 +3,7 @@ import re
 
 from Registry import Registry
 
-from mdp_lib.mdp_plugin import MDPPlugin
+from mdp_lib.mdp_plugin import MDPPlugin, get_temp_file_name
 from mdp_lib.disk_image_info import TargetDiskImage
 
 
@@ -12,12 +12,18 @@ class WinApps(MDPPlugin):
     description = 'Gets information about the installed apps.'
     expected_results = ['win_app_count_app_path_registry', 'win_app_count_uninstall_registry']
 
-    def process_disk(self, target_disk_image: TargetDiskImage):
+    file_selectors = [('Windows/System32/config/SOFTWARE$', re.IGNORECASE)]
+
+    def start_visit(self, target_disk_image: TargetDiskImage):
+        return []  # SOFTWARE hives, processed in finalize_visit
+
+    def visit_file(self, state, file_item, selector_index):
+        state.append(file_item)
 
-        disk_image = target_disk_image.accessor
-        files = disk_image.files
+    def finalize_visit(self, target_disk_image: TargetDiskImage, state):
+        files = state
 
-        temp_filename = 'export.bin'
+        temp_filename = get_temp_file_name()
 
         uninstall_registry = None
         app_path_registry = None
@@ -62,4 +68,7 @@ class WinApps(MDPPlugin):
         self.set_results(result, {'win_app_count_uninstall_registry': uninstall_registry,
                        'win_app_count_app_path_registry': app_path_registry,
                        })
-        return result
\ No newline at end of file
+        return result
+
+    def process_disk(self, target_disk_image: TargetDiskImage):
+        return self.visit_files(target_disk_image)
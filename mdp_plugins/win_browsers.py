@@ -4,7 +4,7 @@ import re
 from Registry import Registry
 
 from mdp_lib.disk_image_info import TargetDiskImage
-from mdp_lib.mdp_plugin import MDPPlugin
+from mdp_lib.mdp_plugin import MDPPlugin, get_temp_file_name
 
 
 class WinBrowsers(MDPPlugin):
@@ -13,12 +13,19 @@ class WinBrowsers(MDPPlugin):
     expected_results = ['chrome_default', 'chrome_present', 'edge_default', 'edge_present', 'firefox_default',
                         'firefox_present']
 
-    def process_disk(self, target_disk_image: TargetDiskImage):
+    file_selectors = [('Windows/System32/config/SOFTWARE$', re.IGNORECASE),
+                      ('NTUSER.DAT$', re.IGNORECASE)]
+
+    def start_visit(self, target_disk_image: TargetDiskImage):
+        return []  # SOFTWARE and NTUSER.DAT hives (in file list order), processed in finalize_visit
+
+    def visit_file(self, state, file_item, selector_index):
+        state.append(file_item)
 
-        disk_image = target_disk_image.accessor
-        files = disk_image.files
+    def finalize_visit(self, target_disk_image: TargetDiskImage, state):
+        files = state
 
-        temp_filename = 'export.bin'
+        temp_filename = get_temp_file_name()
         edge_present = False
         edge_default = False
         chrome_present = False
@@ -143,3 +150,6 @@ class WinBrowsers(MDPPlugin):
                                   'firefox_default': firefox_default
                                   })
         return result
+
+    def process_disk(self, target_disk_image: TargetDiskImage):
+        return self.visit_files(target_disk_image)
@@ -4,7 +4,7 @@ import re
 import Evtx.Evtx as evtx
 import xmltodict
 
-from mdp_lib.mdp_plugin import MDPPlugin
+from mdp_lib.mdp_plugin import MDPPlugin, get_temp_file_name
 from mdp_lib.disk_image_info import TargetDiskImage
 
 
@@ -19,7 +19,7 @@ class EVTXLoginsDetail(MDPPlugin):
         disk_image = target_disk_image.accessor
         files = disk_image.files
 
-        temp_filename = 'export.bin'
+        temp_filename = get_temp_file_name()
 
         # succ_login = 0
         login_list = []
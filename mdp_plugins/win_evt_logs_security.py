@@ -5,7 +5,7 @@ import Evtx.Evtx as evtx
 import xmltodict
 
 from mdp_lib.disk_image_info import TargetDiskImage
-from mdp_lib.mdp_plugin import MDPPlugin
+from mdp_lib.mdp_plugin import MDPPlugin, get_temp_file_name
 
 
 class SecurityEVTXLogs(MDPPlugin):
@@ -24,7 +24,7 @@ class SecurityEVTXLogs(MDPPlugin):
         disk_image = target_disk_image.accessor
         files = disk_image.files
 
-        temp_filename = 'export.bin'
+        temp_filename = get_temp_file_name()
 
         start_ups = None
         succ_login = None
@@ -6,7 +6,7 @@ import struct
 from Registry import Registry
 
 from mdp_lib.disk_image_info import TargetDiskImage
-from mdp_lib.mdp_plugin import MDPPlugin
+from mdp_lib.mdp_plugin import MDPPlugin, get_temp_file_name
 from utils.windows_registry_utils import get_registry_value
 
 
@@ -66,7 +66,7 @@ class WinOSLifespan(MDPPlugin):
 
     # partition aware shutdown for "most recent" selection
     def get_win_last_shutdown_for_partition(self, files, partition_prefix):
-        temp_filename = 'export.bin'
+        temp_filename = get_temp_file_name()
         last_shutdown = None
 
         for each_file in files:
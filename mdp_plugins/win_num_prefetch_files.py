@@ -9,24 +9,26 @@ class WinNumberOfPrefetchFiles(MDPPlugin):
     description = 'Number of prefetch files within the folder Windows/Prefetch'
     expected_results = ['no_prefetch_files']
 
-    def process_disk(self, target_disk_image: TargetDiskImage):
-        disk_image = target_disk_image.accessor
-        files = disk_image.files
+    file_selectors = [
+        (r'^P_[0-9]+/Windows/Prefetch/', re.IGNORECASE),   # prefetch path exists
+        ('^P_[0-9]+/Windows/Prefetch/.*\\.pf$', re.IGNORECASE)  # prefetch file
+    ]
 
-        count = None
-        prefetch_path_exists = False
+    def start_visit(self, target_disk_image: TargetDiskImage):
+        return {'prefetch_path_exists': False, 'count': 0}
 
-        for each in files:
-            if re.match(r'P_[0-9]+/Windows/Prefetch/', each.full_path, re.IGNORECASE):
-                prefetch_path_exists = True
-                break
+    def visit_file(self, state, file_item, selector_index):
+        if selector_index == 0:
+            state['prefetch_path_exists'] = True
+        else:
+            state['count'] += 1
 
-        if prefetch_path_exists:
-            count = 0
-            for each in files:
-                if re.match('P_[0-9]+/Windows/Prefetch/.*\\.pf$', each.full_path, re.IGNORECASE):
-                    count += 1
+    def finalize_visit(self, target_disk_image: TargetDiskImage, state):
+        count = state['count'] if state['prefetch_path_exists'] else None
 
         result = self.create_result(target_disk_image)
         self.set_results(result, {'no_prefetch_files': count})
-        return result
\ No newline at end of file
+        return result
+
+    def process_disk(self, target_disk_image: TargetDiskImage):
+        return self.visit_files(target_disk_image)
@@ -5,7 +5,7 @@ import re
 from Registry import Registry
 
 from mdp_lib.disk_image_info import TargetDiskImage
-from mdp_lib.mdp_plugin import MDPPlugin
+from mdp_lib.mdp_plugin import MDPPlugin, get_temp_file_name
 
 
 class WinUSBCount(MDPPlugin):
@@ -18,7 +18,7 @@ class WinUSBCount(MDPPlugin):
 
     @staticmethod
     def get_setup_api_usb(files):
-        temp_filename = 'export.bin'
+        temp_filename = get_temp_file_name()
         usb_count = None
         for each_file in files:
             if re.search(r'setupapi(\.dev)?\.log$', each_file.full_path, re.IGNORECASE) is not None:
@@ -70,7 +70,7 @@ class WinUSBCount(MDPPlugin):
         reg_usb_count = reg_usbstor_count = reg_portable_dev = reg_dev_classes = reg_usbccgp = reg_usbhub = reg_mounted_dev = None
         reg_user_assist_counts = []
 
-        temp_filename = 'export.bin'
+        temp_filename = get_temp_file_name()
 
         for each_file in files:
             # Check for usb-related registry keys in software hive
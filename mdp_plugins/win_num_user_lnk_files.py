@@ -10,47 +10,61 @@ class WinNumberOfUserLNKFiles(MDPPlugin):
     expected_results = ['no_lnk_files_in_user_folders', 'no_recent_lnk_max', 'no_recent_lnk_total',
                         'no_start_menu_lnk_max', 'no_start_menu_lnk_total']
 
-    def process_disk(self, target_disk_image: TargetDiskImage):
-        disk_image = target_disk_image.accessor
-        files = disk_image.files
+    home_folder_locations = ['Users', 'Documents and Settings', 'Dokumente und Einstellungen']
+
+    # 0: Windows folder, 1-3: home folder locations, 4: LNK files (all counted LNK files match this selector)
+    file_selectors = ([(r'^P_[0-9]+/Windows/', re.IGNORECASE)]
+                      + [(r'^P_[0-9]+/{}/'.format(each_home_loc), re.IGNORECASE) for each_home_loc in home_folder_locations]
+                      + [(r'\.lnk$', re.IGNORECASE)])
+
+    def start_visit(self, target_disk_image: TargetDiskImage):
+        return {'windows_path_exists': False,
+                'home_folders_found': [False] * len(self.home_folder_locations),
+                'user_folders': [[] for _ in self.home_folder_locations],
+                'lnk_file_paths': []}
+
+    def visit_file(self, state, file_item, selector_index):
+        if selector_index == 0:
+            state['windows_path_exists'] = True
+        elif selector_index <= len(self.home_folder_locations):
+            home_loc_index = selector_index - 1
+            state['home_folders_found'][home_loc_index] = True
+            # collect user folders for each home location (list of the location finally used is needed)
+            res = re.match('P_[0-9]+/{}/([^/]*?)/'.format(self.home_folder_locations[home_loc_index]),
+                           file_item.full_path, re.IGNORECASE)
+            if res is not None:
+                if res.group(1) not in state['user_folders'][home_loc_index]:
+                    state['user_folders'][home_loc_index].append(res.group(1))
+        else:
+            state['lnk_file_paths'].append(file_item.full_path)
+
+    def finalize_visit(self, target_disk_image: TargetDiskImage, state):
+        lnk_file_paths = state['lnk_file_paths']
 
         count = None
         total_recents = None
         max_recents = None
         total_starts = None
         max_starts = None
-        windows_path_exists = False
-
-        for each in files:
-            if re.match(r'P_[0-9]+/Windows/', each.full_path, re.IGNORECASE):
-                windows_path_exists = True
-                break
+        windows_path_exists = state['windows_path_exists']
 
         # Finds path for user folders or none if not present
         home_folder_base_path = None
-        poss = ['Users', 'Documents and Settings', 'Dokumente und Einstellungen']
-        for each_home_loc in poss:
-            for each_file in files:
-                if re.match(r'P_[0-9]+/{}/'.format(each_home_loc), each_file.full_path, re.IGNORECASE):
-                    home_folder_base_path = each_home_loc
+        user_folders = []
+        for home_loc_index, each_home_loc in enumerate(self.home_folder_locations):
+            if state['home_folders_found'][home_loc_index]:
+                home_folder_base_path = each_home_loc
+                user_folders = state['user_folders'][home_loc_index]
 
         # print('home loc = {}'.format(home_folder_base_path))
 
         if home_folder_base_path and windows_path_exists:
             count = 0
 
-            for each in files:
-                if re.match('P_[0-9]+/{}/.*\\.lnk$'.format(home_folder_base_path), each.full_path, re.IGNORECASE):
+            for each_path in lnk_file_paths:
+                if re.match('P_[0-9]+/{}/.*\\.lnk$'.format(home_folder_base_path), each_path, re.IGNORECASE):
                     count += 1
 
-            # Get list of user folders
-            user_folders = []
-            for each in files:
-                res = re.match('P_[0-9]+/{}/([^/]*?)/'.format(home_folder_base_path), each.full_path, re.IGNORECASE)
-                if res is not None:
-                    if res.group(1) not in user_folders:
-                        user_folders.append(res.group(1))
-
             # count link files per user
             recent_counts = {}
             for each_user in user_folders:
@@ -59,8 +73,8 @@ class WinNumberOfUserLNKFiles(MDPPlugin):
                 else:
                     recent_reg_ex = 'P_[0-9]+/.*{}/Recent/.*\\.lnk$'.format(each_user)
                 recent_counts[each_user] = 0
-                for each_file in files:
-                    if re.match(recent_reg_ex, each_file.full_path, re.IGNORECASE):
+                for each_path in lnk_file_paths:
+                    if re.match(recent_reg_ex, each_path, re.IGNORECASE):
                         recent_counts[each_user] += 1
 
             # count start menu link files per user
@@ -72,8 +86,8 @@ class WinNumberOfUserLNKFiles(MDPPlugin):
                 else:
                     recent_reg_ex = 'P_[0-9]+/.*{}/Start Menu/.*\\.lnk$'.format(each_user)
                 start_menu_counts[each_user] = 0
-                for each_file in files:
-                    if re.match(recent_reg_ex, each_file.full_path, re.IGNORECASE):
+                for each_path in lnk_file_paths:
+                    if re.match(recent_reg_ex, each_path, re.IGNORECASE):
                         start_menu_counts[each_user] += 1
 
             # work out max and totals for each...
@@ -105,3 +119,6 @@ class WinNumberOfUserLNKFiles(MDPPlugin):
 
                                   })
         return result
+
+    def process_disk(self, target_disk_image: TargetDiskImage):
+        return self.visit_files(target_disk_image)
@@ -4,7 +4,7 @@ import re
 from Registry import Registry
 
 from mdp_lib.disk_image_info import TargetDiskImage
-from mdp_lib.mdp_plugin import MDPPlugin
+from mdp_lib.mdp_plugin import MDPPlugin, get_temp_file_name
 
 
 class WinScreenResolution(MDPPlugin):
@@ -14,7 +14,7 @@ class WinScreenResolution(MDPPlugin):
 
     def get_screen_resolution_x_y(self, files):
 
-        temp_filename = 'export.bin'
+        temp_filename = get_temp_file_name()
 
         latest_change = 0
         latest_change_guid = 'unknown'
@@ -4,7 +4,7 @@ import struct
 from Registry import Registry
 
 from mdp_lib.disk_image_info import TargetDiskImage
-from mdp_lib.mdp_plugin import MDPPlugin
+from mdp_lib.mdp_plugin import MDPPlugin, get_temp_file_name
 
 
 class UserInfo(MDPPlugin):
@@ -17,7 +17,7 @@ class UserInfo(MDPPlugin):
         disk_image = target_disk_image.accessor
         files = disk_image.files
 
-        temp_filename = 'export.bin'
+        temp_filename = get_temp_file_name()
         login_count = None
         login_total = None
         no_users = None
@@ -4,7 +4,7 @@ import re
 from Registry import Registry
 
 from mdp_lib.disk_image_info import TargetDiskImage
-from mdp_lib.mdp_plugin import MDPPlugin
+from mdp_lib.mdp_plugin import MDPPlugin, get_temp_file_name
 
 
 class WinVersion(MDPPlugin):
@@ -18,7 +18,7 @@ class WinVersion(MDPPlugin):
         disk_image = target_disk_image.accessor
         files = disk_image.files
 
-        temp_filename = 'export.bin'
+        temp_filename = get_temp_file_name()
 
         win_build = None
         win_build_inferred_os = None
@@ -1,93 +1,125 @@
+import importlib
+import importlib.metadata
+import inspect
+import logging
+import os
+import sys
 from typing import List
 
-# General
-from mdp_plugins import (
-    disk_size,
-    fs_lifespan,
-    no_files,
-    no_partitions,
-    no_partition_types,
-    num_user_files,
-    operating_system_detect,
-    file_size_stats,
-    file_types
-)
-
-# Browser history
-from mdp_plugins import (
-    chrome_history,
-    edge_history,
-    firefox_history
-)
-
-# Windows-specific
-from mdp_plugins import (
-    win_apps,
-    win_browsers,
-    win_computer_and_user_names,
-
-    win_evt_logs_security,
-    win_lifespan,
-    win_num_prefetch_files,
-    win_num_usbs,
-    win_num_user_lnk_files,
-    win_num_wifi_connections,
-    win_screen_resolution,
-    win_user_info,
-    win_version
-)
-
-# External
-from mdp_plugins import (
-    external_program_demo,
-    plaso
-)
+from config.plugin_config import plugin_directories
+from mdp_lib.mdp_plugin import MDPPlugin
 
+# entry point group of plugins provided by installed packages, e.g. in a package's pyproject.toml:
+#   [project.entry-points."mdp.plugins"]
+#   my_plugin = "my_package.my_plugin:MyPlugin"
+PLUGIN_ENTRY_POINT_GROUP = 'mdp.plugins'
+
+# plugin name -> import path of the plugin class, plugin modules are only imported when the plugin is enabled
 plugin_registry = {
     # General
-    "disk_size": disk_size.DiskSize,
-    "no_partitions": no_partitions.NumberOfPartitions,
-    "no_partition_types": no_partition_types.NumberOfPartitionTypes,
-    "no_files": no_files.NumberOfFiles,
-    "num_user_files": num_user_files.NumberOfUserFiles,
-    "file_types": file_types.FileTypes,
-    "file_size_stats": file_size_stats.FileSizeStats,
-    "fs_lifespan": fs_lifespan.FSLifespan,
-    "operating_system_detect": operating_system_detect.EstimateOS,
+    "disk_size": "mdp_plugins.disk_size.DiskSize",
+    "no_partitions": "mdp_plugins.no_partitions.NumberOfPartitions",
+    "no_partition_types": "mdp_plugins.no_partition_types.NumberOfPartitionTypes",
+    "no_files": "mdp_plugins.no_files.NumberOfFiles",
+    "num_user_files": "mdp_plugins.num_user_files.NumberOfUserFiles",
+    "file_types": "mdp_plugins.file_types.FileTypes",
+    "file_size_stats": "mdp_plugins.file_size_stats.FileSizeStats",
+    "fs_lifespan": "mdp_plugins.fs_lifespan.FSLifespan",
+    "operating_system_detect": "mdp_plugins.operating_system_detect.EstimateOS",
 
     # Browser history
-    "firefox_history": firefox_history.FirefoxHistory,
-    "chrome_history": chrome_history.ChromeHistory,
-    "edge_history": edge_history.EdgeHistory,
+    "firefox_history": "mdp_plugins.firefox_history.FirefoxHistory",
+    "chrome_history": "mdp_plugins.chrome_history.ChromeHistory",
+    "edge_history": "mdp_plugins.edge_history.EdgeHistory",
 
     # Windows
-    "win_lifespan": win_lifespan.WinOSLifespan,
-    "win_version": win_version.WinVersion,
-    "win_user_info": win_user_info.UserInfo,
-    "win_computer_and_user_names": win_computer_and_user_names.WinComputerAndUserName,
-    "win_screen_resolution": win_screen_resolution.WinScreenResolution,
-
-    "win_evt_logs_security": win_evt_logs_security.SecurityEVTXLogs,
-    "win_apps": win_apps.WinApps,
-    "win_browsers": win_browsers.WinBrowsers,
-    "win_num_user_lnk_files": win_num_user_lnk_files.WinNumberOfUserLNKFiles,
-    "win_num_prefetch_files": win_num_prefetch_files.WinNumberOfPrefetchFiles,
-    "win_num_usbs": win_num_usbs.WinUSBCount,
-    "win_num_wifi_connections": win_num_wifi_connections.WinWifiCount,
+    "win_lifespan": "mdp_plugins.win_lifespan.WinOSLifespan",
+    "win_version": "mdp_plugins.win_version.WinVersion",
+    "win_user_info": "mdp_plugins.win_user_info.UserInfo",
+    "win_computer_and_user_names": "mdp_plugins.win_computer_and_user_names.WinComputerAndUserName",
+    "win_screen_resolution": "mdp_plugins.win_screen_resolution.WinScreenResolution",
+
+    "win_evt_logs_security": "mdp_plugins.win_evt_logs_security.SecurityEVTXLogs",
+    "win_apps": "mdp_plugins.win_apps.WinApps",
+    "win_browsers": "mdp_plugins.win_browsers.WinBrowsers",
+    "win_num_user_lnk_files": "mdp_plugins.win_num_user_lnk_files.WinNumberOfUserLNKFiles",
+    "win_num_prefetch_files": "mdp_plugins.win_num_prefetch_files.WinNumberOfPrefetchFiles",
+    "win_num_usbs": "mdp_plugins.win_num_usbs.WinUSBCount",
+    "win_num_wifi_connections": "mdp_plugins.win_num_wifi_connections.WinWifiCount",
 
     # External
-    "external_program_demo": external_program_demo.ExternalProgramDemo,
-    "plaso": plaso.Plaso
+    "external_program_demo": "mdp_plugins.external_program_demo.ExternalProgramDemo",
+    "plaso": "mdp_plugins.plaso.Plaso"
 }
 
+
+def _get_plugins_from_directories(directories: List[str]) -> dict[str, str]:
+    """plugin modules in the plugin directories (plugin name = module name, the plugin class is looked up on import)"""
+    plugins = {}
+    for each_directory in directories:
+        if not os.path.isdir(each_directory):
+            logging.warning(f'Plugin directory not found: {each_directory}')
+            continue
+        # also makes the plugin modules importable in spawned worker processes (they inherit sys.path)
+        if each_directory not in sys.path:
+            sys.path.append(each_directory)
+        with os.scandir(each_directory) as entries:
+            for each_entry in entries:
+                if each_entry.is_file() and each_entry.name.endswith('.py') and not each_entry.name.startswith('_'):
+                    module_name = each_entry.name[:-3]
+                    plugins[module_name] = f'{module_name}:'
+    return plugins
+
+
+def _get_plugins_from_entry_points() -> dict[str, str]:
+    """plugins registered by installed packages (entry point values are 'module:Class')"""
+    return {each_entry_point.name: each_entry_point.value
+            for each_entry_point in importlib.metadata.entry_points(group=PLUGIN_ENTRY_POINT_GROUP)}
+
+
+def get_plugin_registry() -> dict[str, str]:
+    """all available plugins: built-in plugins, plugins from plugin directories and installed plugin packages
+    (built-in names take precedence)"""
+    registry = {}
+    registry.update(_get_plugins_from_entry_points())
+    registry.update(_get_plugins_from_directories(plugin_directories))
+    registry.update(plugin_registry)
+    return registry
+
+
+def _import_plugin_class(import_path: str):
+    """imports a plugin class given as 'package.module.Class', 'package.module:Class' or 'module:'
+    (the only MDPPlugin subclass defined in the module)"""
+    if ':' in import_path:
+        module_name, class_name = import_path.split(':', 1)
+    else:
+        module_name, class_name = import_path.rsplit('.', 1)
+    module = importlib.import_module(module_name)
+    if class_name:
+        return getattr(module, class_name)
+
+    plugin_classes = [each_class for _, each_class in inspect.getmembers(module, inspect.isclass)
+                      if issubclass(each_class, MDPPlugin) and each_class.__module__ == module.__name__]
+    if len(plugin_classes) != 1:
+        raise ImportError(f'Expected one plugin class in module {module_name}, found {len(plugin_classes)}')
+    return plugin_classes[0]
+
+
 def load_enabled_plugins(enabled_plugins: List[str]):
     plugins = []
+    registry = get_plugin_registry()
 
     for name in enabled_plugins:
-        plugin_class = plugin_registry.get(name)
-        if plugin_class:
-            plugins.append(plugin_class())
-        else:
+        import_path = registry.get(name)
+        if not import_path:
             print(f"Plugin not found in registry: {name} \nSkipping...")
+            continue
+        try:
+            plugin_class = _import_plugin_class(import_path)
+        except Exception as e:
+            logging.error(f'Plugin {name} could not be loaded from {import_path}: {e}')
+            print(f"Plugin could not be loaded: {name} ({e}) \nSkipping...")
+            continue
+        plugins.append(plugin_class())
 
-    return plugins
\ No newline at end of file
+    return plugins
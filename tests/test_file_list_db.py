@@ -0,0 +1,71 @@
+import pytest
+
+from marple.file_object import FileItem
+from mdp_lib.file_list_db import FileListDatabase
+
+
+def _file(full_path, inode, file_size):
+    file_item = FileItem(full_path, inode, file_size, 2048)
+    file_item.timestamps = {'cr_time': None, 'm_time': None, 'a_time': None}
+    return file_item
+
+
+@pytest.fixture
+def files():
+    return [_file('P_2048/a.txt', 10, 100), _file('P_2048/b.txt', 11, 100), _file('P_2048/c.bin', 12, 10 ** 9)]
+
+
+@pytest.fixture
+def file_list_db(tmp_path):
+    with FileListDatabase(str(tmp_path / 'image.db')) as file_list_db:
+        yield file_list_db
+
+
+def test_files_not_in_db(file_list_db, files):
+    assert file_list_db.files_not_in_db(files) == files
+
+    # a.txt twice
+    file_list_db.add_files([files[0], files[0], files[2]])
+
+    assert file_list_db.files_not_in_db(files) == [files[1]]
+
+
+def test_files_not_in_db_by_inode_and_path(file_list_db, files):
+    file_list_db.add_files(files)
+    other_files = [_file('P_2048/a.txt', 99, 100), _file('P_2048/other.txt', 11, 100)]
+
+    assert file_list_db.files_not_in_db(other_files) == other_files
+
+
+def test_files_not_populated_as_expected(file_list_db, files):
+    file_list_db.add_files(files)
+    # duplicate entries of a.txt, a file is listed once
+    file_list_db.add_files([files[0]])
+    assert file_list_db.files_not_populated_as_expected(files, ['sha1'], 1000) == files
+
+    for each_file in files:
+        each_file.signature = b'\x00\x01'
+    files[0].sha1 = 'a' * 40
+    files[0].md5 = 'b' * 32
+    file_list_db.update_files(files)
+
+    # c.bin is larger than the hash size limit
+    assert file_list_db.files_not_populated_as_expected(files, ['sha1'], 1000) == [files[1]]
+    assert file_list_db.files_not_populated_as_expected(files, ['sha1', 'sha256'], 1000) == files[:2]
+    assert file_list_db.files_not_populated_as_expected(files, [], 1000) == []
+
+
+def test_load_hashes_and_signatures(file_list_db, files):
+    files[0].signature = b'MZ'
+    files[0].sha1 = 'a' * 40
+    file_list_db.add_files(files)
+    # duplicate entry of a.txt: the first one is used
+    duplicate = _file('P_2048/a.txt', 10, 100)
+    duplicate.sha1 = 'c' * 40
+    file_list_db.add_files([duplicate])
+
+    loaded = [_file(each.full_path, each.inode, each.file_size) for each in files]
+    file_list_db.load_hashes_and_signatures(loaded)
+
+    assert (loaded[0].signature, loaded[0].sha1) == (b'MZ', 'a' * 40)
+    assert (loaded[1].signature, loaded[1].sha1) == (None, None)
@@ -0,0 +1,112 @@
+import pickle
+
+import pytest
+
+from marple.file_object import FileItem
+from marple.file_table import FileTable, FileTableSnapshotError
+
+
+def _file(full_path, inode, file_size, partition_sector=2048):
+    file_item = FileItem(full_path, inode, file_size, partition_sector)
+    file_item.timestamps = {'cr_time': 1, 'm_time': 2, 'a_time': 3}
+    return file_item
+
+
+@pytest.fixture
+def table():
+    return FileTable.from_files([_file('P_2048/Windows/notepad.exe', 100, 193536),
+                                 _file('P_2048/Windows/regedit.exe', 101, 0),
+                                 _file('P_4096/Users/a.txt', 5, 12, partition_sector=4096)])
+
+
+def test_snapshot_round_trip(table, tmp_path):
+    snapshot_path = tmp_path / 'image.files'
+    table.save_snapshot(snapshot_path, 'fingerprint')
+
+    loaded = FileTable.load_snapshot(snapshot_path, 'fingerprint')
+
+    assert len(loaded) == len(table) == 3
+    for original, each_file in zip(table, loaded):
+        assert (each_file.full_path, each_file.inode, each_file.file_size, each_file.partition_sector) == \
+            (original.full_path, original.inode, original.file_size, original.partition_sector)
+        assert each_file.timestamps == original.timestamps
+    assert [each.full_path for each in loaded.files_of_partition(4096)] == ['P_4096/Users/a.txt']
+
+
+def test_pickle_loaded_snapshot(table, tmp_path):
+    snapshot_path = tmp_path / 'image.files'
+    table.save_snapshot(snapshot_path, 'fingerprint')
+    loaded = FileTable.load_snapshot(snapshot_path, 'fingerprint')
+    loaded[0].sha1 = 'a' * 40
+
+    unpickled = pickle.loads(pickle.dumps(loaded))
+
+    assert [each.full_path for each in unpickled] == [each.full_path for each in table]
+    assert unpickled[0].sha1 == 'a' * 40
+    # the columns of the loaded table are still read from the snapshot, not copied
+    assert isinstance(loaded._inode, memoryview)
+    unpickled.append(_file('P_4096/Users/b.txt', 6, 1, partition_sector=4096))
+    assert len(unpickled) == 4
+
+
+def test_snapshot_with_wrong_key(table, tmp_path):
+    snapshot_path = tmp_path / 'image.files'
+    table.save_snapshot(snapshot_path, 'fingerprint')
+
+    with pytest.raises(FileTableSnapshotError):
+        FileTable.load_snapshot(snapshot_path, 'fingerprint of another disk image')
+
+
+@pytest.mark.parametrize('size', [4, 64, -8])
+def test_truncated_snapshot(table, tmp_path, size):
+    snapshot_path = tmp_path / 'image.files'
+    table.save_snapshot(snapshot_path, 'fingerprint')
+    data = snapshot_path.read_bytes()
+    snapshot_path.write_bytes(data[:size])
+
+    with pytest.raises(FileTableSnapshotError):
+        FileTable.load_snapshot(snapshot_path, 'fingerprint')
+
+
+def test_snapshot_of_another_layout(table, tmp_path):
+    snapshot_path = tmp_path / 'image.files'
+    layout = {'media_size': 1 << 30, 'partitions': [[2048, 4096, 1], [6144, 8192, 1]]}
+    table.save_snapshot(snapshot_path, 'fingerprint', layout=layout)
+
+    assert len(FileTable.load_snapshot(snapshot_path, 'fingerprint', layout=layout)) == 3
+    with pytest.raises(FileTableSnapshotError):
+        FileTable.load_snapshot(snapshot_path, 'fingerprint', layout={**layout, 'media_size': 2 << 30})
+    with pytest.raises(FileTableSnapshotError):
+        FileTable.load_snapshot(snapshot_path, 'fingerprint', layout={**layout, 'partitions': [[2048, 12288, 1]]})
+
+
+def test_snapshot_without_data_locations(table, tmp_path):
+    snapshot_path = tmp_path / 'image.files'
+    table.save_snapshot(snapshot_path, 'fingerprint')
+
+    with pytest.raises(FileTableSnapshotError):
+        FileTable.load_snapshot(snapshot_path, 'fingerprint', data_locations=True)
+
+
+def test_missing_timestamps(table, tmp_path):
+    file_item = _file('P_2048/Windows/write.exe', 102, 10)
+    file_item.timestamps = {'cr_time': None, 'm_time': 0, 'a_time': 5}
+    table.append(file_item)
+    table.save_snapshot(tmp_path / 'image.files', 'fingerprint')
+
+    for each_table in (table, FileTable.load_snapshot(tmp_path / 'image.files', 'fingerprint')):
+        assert each_table[-1].timestamps == {'cr_time': None, 'm_time': 0, 'a_time': 5}
+
+
+def test_status_and_flags(table):
+    pytsk3 = pytest.importorskip('pytsk3')
+    file_item = _file('P_2048/Windows/write.exe', 102, 10)
+    file_item.status = pytsk3.TSK_FS_META_TYPE_REG
+    file_item.flags = pytsk3.TSK_FS_META_FLAG_ALLOC
+    table.append(file_item)
+
+    each_file = table[-1]
+    assert each_file.status == pytsk3.TSK_FS_META_TYPE_REG
+    assert each_file.flags & pytsk3.TSK_FS_META_FLAG_ALLOC
+    # not recorded
+    assert (table[0].status, table[0].flags) == (None, None)
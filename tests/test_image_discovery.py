@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+from mdp_lib.image_discovery import ImageDiscovery, _get_ewf_segment_number, _group_segments
+
+
+@pytest.mark.parametrize('extension, segment_number', [('E01', 1), ('e99', 99), ('EAA', 100), ('EAZ', 125),
+                                                       ('EBA', 126), ('FAA', 100 + 26 * 26), ('Ex01', 1),
+                                                       ('ExAA', 100), ('exe', 702), ('E0A', -1)])
+def test_ewf_segment_numbers(extension, segment_number):
+    assert _get_ewf_segment_number(extension) == segment_number
+
+
+def test_ewf_segments():
+    file_sizes = {f'disk.E{i:02d}': 10 for i in range(1, 100)}
+    file_sizes.update({'disk.EAA': 10, 'disk.EAB': 5})
+
+    assert _group_segments(file_sizes) == [{'image_type': 'ewf',
+                                            'segments': [f'disk.E{i:02d}' for i in range(1, 100)] + ['disk.EAA',
+                                                                                                     'disk.EAB'],
+                                            'total_bytes': 99 * 10 + 15}]
+
+
+def test_ewf_segments_with_gap():
+    # disk.E03 is missing: disk.E04 is not a segment of the set but a disk image of its own
+    disk_images = _group_segments({'disk.E01': 10, 'disk.E02': 10, 'disk.E04': 7})
+
+    assert disk_images == [{'image_type': 'ewf', 'segments': ['disk.E01', 'disk.E02'], 'total_bytes': 20},
+                           {'image_type': 'raw', 'segments': ['disk.E04'], 'total_bytes': 7}]
+
+
+def test_ewf_set_without_first_segment():
+    assert _group_segments({'setup.exe': 3, 'disk.E02': 10}) == [
+        {'image_type': 'raw', 'segments': ['disk.E02'], 'total_bytes': 10},
+        {'image_type': 'raw', 'segments': ['setup.exe'], 'total_bytes': 3}]
+
+
+def test_ewf2_and_ewf_sets_of_the_same_name():
+    disk_images = _group_segments({'disk.Ex01': 1, 'disk.Ex02': 2, 'disk.E01': 4})
+
+    assert disk_images == [{'image_type': 'ewf', 'segments': ['disk.E01'], 'total_bytes': 4},
+                           {'image_type': 'ewf', 'segments': ['disk.Ex01', 'disk.Ex02'], 'total_bytes': 3}]
+
+
+def test_split_raw_segments():
+    disk_images = _group_segments({'disk.001': 100, 'disk.002': 100, 'disk.003': 1, 'other.002': 5, 'usb.dd': 8})
+
+    assert disk_images == [{'image_type': 'split_raw', 'segments': ['disk.001', 'disk.002', 'disk.003'],
+                            'total_bytes': 201},
+                           {'image_type': 'raw', 'segments': ['other.002'], 'total_bytes': 5},
+                           {'image_type': 'raw', 'segments': ['usb.dd'], 'total_bytes': 8}]
+
+
+def test_discovery_cache(tmp_path):
+    data_path = tmp_path / 'case1' / 'data'
+    data_path.mkdir(parents=True)
+    (data_path / 'disk.E01').write_bytes(b'\0' * 10)
+    (data_path / '.DS_Store').write_bytes(b'\0')
+    cache_path = str(tmp_path / 'cache' / 'image_discovery.json')
+
+    image_discovery = ImageDiscovery(cache_path)
+    [disk_image] = image_discovery.get_disk_images_from_path(tmp_path)
+    image_discovery.save()
+    assert disk_image == {'path': os.path.join(data_path, 'disk.E01'), 'target_folder': str(tmp_path / 'case1'),
+                          'image_type': 'ewf', 'segments': [os.path.join(data_path, 'disk.E01')], 'total_bytes': 10}
+
+    # a segment grown in place (the data folder itself is unchanged)
+    data_folder_mtime = os.stat(data_path).st_mtime_ns
+    with open(data_path / 'disk.E01', 'ab') as f:
+        f.write(b'\0' * 5)
+    os.utime(data_path, ns=(data_folder_mtime, data_folder_mtime))
+
+    [disk_image] = ImageDiscovery(cache_path).get_disk_images_from_case_folder(str(tmp_path / 'case1'))
+    assert disk_image['total_bytes'] == 15
@@ -0,0 +1,46 @@
+import os
+import shutil
+
+import pytest
+
+pytest.importorskip('pyewf')
+
+from mdp_lib.image_fingerprint import get_image_fingerprint
+
+IMAGE_SIZE = 4 * 1024 * 1024
+
+
+def _write_raw_image(path, middle=b''):
+    data = bytearray(IMAGE_SIZE)
+    data[:512] = b'\xeb\x52\x90NTFS    ' + bytes(501)
+    data[IMAGE_SIZE // 2:IMAGE_SIZE // 2 + len(middle)] = middle
+    path.write_bytes(data)
+    os.utime(path, ns=(1_700_000_000_000_000_000, 1_700_000_000_000_000_000))
+    return str(path)
+
+
+def test_raw_images_with_same_head_and_tail(tmp_path):
+    # e.g. different file system contents between the same boot code and zero-filled tail
+    assert get_image_fingerprint(_write_raw_image(tmp_path / 'a.dd', b'first image' * 6000)) != \
+        get_image_fingerprint(_write_raw_image(tmp_path / 'b.dd', b'other image' * 6000))
+
+
+def test_raw_image_changed_in_place(tmp_path):
+    image_path = _write_raw_image(tmp_path / 'a.dd')
+    fingerprint = get_image_fingerprint(image_path)
+
+    with open(image_path, 'r+b') as f:
+        f.seek(IMAGE_SIZE // 3 + 1)
+        f.write(b'\x01')
+
+    assert get_image_fingerprint(image_path) != fingerprint
+
+
+def test_moved_raw_image(tmp_path):
+    image_path = _write_raw_image(tmp_path / 'a.dd', b'image')
+    fingerprint = get_image_fingerprint(image_path)
+
+    os.mkdir(tmp_path / 'other_case')
+    moved_path = shutil.move(image_path, tmp_path / 'other_case' / 'image.dd')
+
+    assert get_image_fingerprint(str(moved_path)) == fingerprint
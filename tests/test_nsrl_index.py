@@ -0,0 +1,88 @@
+import hashlib
+import sqlite3
+
+import pytest
+
+from mdp_lib.nsrl_index import DIGESTS_PER_BLOCK, NSRLHashIndex, NSRLIndexError, build_nsrl_index
+
+
+def _sha1(i):
+    return hashlib.sha1(str(i).encode()).hexdigest().upper()
+
+
+@pytest.fixture
+def nsrl_digests():
+    # more than two blocks of the index
+    return [_sha1(i) for i in range(2 * DIGESTS_PER_BLOCK + 10)]
+
+
+@pytest.fixture
+def index_path(tmp_path, nsrl_digests):
+    path_to_nsrl = tmp_path / 'RDS.db'
+    conn = sqlite3.connect(path_to_nsrl)
+    with conn:
+        conn.execute('CREATE TABLE FILE (sha1 TEXT, md5 TEXT)')
+        # duplicates, lower case and malformed digests as found in RDS
+        conn.executemany('INSERT INTO FILE VALUES (?, NULL)',
+                         [(each,) for each in nsrl_digests] + [(nsrl_digests[0],), (nsrl_digests[1].lower(),),
+                                                               ('ABC',), (None,)])
+    conn.close()
+
+    index_path = tmp_path / 'nsrl' / 'sha1.idx'
+    assert build_nsrl_index(str(path_to_nsrl), str(index_path)) == len(nsrl_digests)
+    return index_path
+
+
+def test_build_index(index_path, nsrl_digests):
+    with NSRLHashIndex(index_path) as index:
+        assert index.hash_algorithm == 'sha1'
+        assert [index[i].hex().upper() for i in range(len(index))] == sorted(nsrl_digests)
+
+
+def test_lookup(index_path, nsrl_digests):
+    sorted_digests = sorted(nsrl_digests)
+    hits = [sorted_digests[0], sorted_digests[-1], sorted_digests[DIGESTS_PER_BLOCK],
+            sorted_digests[DIGESTS_PER_BLOCK - 1], nsrl_digests[5].lower()]
+    misses = ['0' * 40, 'F' * 40, _sha1('not in NSRL'),
+              sorted_digests[0][20:] + sorted_digests[1][:20]]  # spans two records of the index
+
+    with NSRLHashIndex(index_path) as index:
+        assert index.contains(hits + misses) == [True] * len(hits) + [False] * len(misses)
+
+
+def test_lookup_of_malformed_digests(index_path, nsrl_digests):
+    with NSRLHashIndex(index_path) as index:
+        assert index.contains([None, '', 'not hex', nsrl_digests[0][:-2], nsrl_digests[0] + '00',
+                               nsrl_digests[0]]) == [False] * 5 + [True]
+
+
+def test_truncated_index(index_path):
+    data = index_path.read_bytes()
+    index_path.write_bytes(data[:-1])
+    with pytest.raises(NSRLIndexError):
+        NSRLHashIndex(index_path)
+
+    index_path.write_bytes(data[:10])
+    with pytest.raises(NSRLIndexError):
+        NSRLHashIndex(index_path)
+
+
+def test_not_an_index(tmp_path):
+    index_path = tmp_path / 'sha1.idx'
+    index_path.write_bytes(b'\0' * 64)
+    with pytest.raises(NSRLIndexError):
+        NSRLHashIndex(index_path)
+
+
+def test_empty_index(tmp_path):
+    path_to_nsrl = tmp_path / 'RDS.db'
+    conn = sqlite3.connect(path_to_nsrl)
+    with conn:
+        conn.execute('CREATE TABLE FILE (sha1 TEXT)')
+    conn.close()
+    index_path = tmp_path / 'sha1.idx'
+    assert build_nsrl_index(str(path_to_nsrl), str(index_path)) == 0
+
+    with NSRLHashIndex(index_path) as index:
+        assert len(index) == 0
+        assert index.contains([_sha1(1), None]) == [False, False]
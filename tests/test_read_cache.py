@@ -0,0 +1,105 @@
+import pytest
+
+from marple.read_ahead import ReadAhead
+from marple.read_cache import ChunkReadCache, MAX_CACHED_CHUNKS_PER_READ
+
+CHUNK_SIZE = 16
+# the last chunk is incomplete
+MEDIA = bytes(each % 251 for each in range(CHUNK_SIZE * 20 + 5))
+
+
+class RecordingReader(object):
+    """read function of MEDIA recording its reads"""
+
+    def __init__(self):
+        self.reads = []
+
+    def __call__(self, offset, size):
+        self.reads.append((offset, size))
+        assert 0 <= offset and offset + size <= len(MEDIA)
+        return MEDIA[offset:offset + size]
+
+
+@pytest.fixture
+def reader():
+    return RecordingReader()
+
+
+@pytest.fixture
+def cache(reader):
+    return ChunkReadCache(reader, len(MEDIA), chunk_size=CHUNK_SIZE, cache_size=CHUNK_SIZE * 64)
+
+
+def test_reads_within_and_across_chunks(cache):
+    for offset in range(0, len(MEDIA), 3):
+        for size in (1, CHUNK_SIZE - 1, CHUNK_SIZE, CHUNK_SIZE + 1, 3 * CHUNK_SIZE + 7):
+            assert cache.read(offset, size) == MEDIA[offset:offset + size]
+
+
+def test_chunks_are_read_once(cache, reader):
+    cache.read(5, 2 * CHUNK_SIZE)
+    cache.read(CHUNK_SIZE + 1, 4)
+
+    assert reader.reads == [(0, CHUNK_SIZE), (CHUNK_SIZE, CHUNK_SIZE), (2 * CHUNK_SIZE, CHUNK_SIZE)]
+    assert (cache.stats['misses'], cache.stats['hits']) == (3, 1)
+
+
+def test_reads_at_media_end(cache, reader):
+    last_chunk_offset = len(MEDIA) // CHUNK_SIZE * CHUNK_SIZE
+
+    assert cache.read(len(MEDIA) - 3, 100) == MEDIA[-3:]
+    assert reader.reads == [(last_chunk_offset, len(MEDIA) - last_chunk_offset)]
+    assert cache.read(len(MEDIA), 10) == b''
+    assert cache.read(len(MEDIA) + CHUNK_SIZE, 10) == b''
+    assert cache.read(0, 0) == b''
+
+
+def test_large_reads_bypass_the_cache(cache, reader):
+    size = (MAX_CACHED_CHUNKS_PER_READ + 1) * CHUNK_SIZE
+
+    assert cache.read(CHUNK_SIZE, size) == MEDIA[CHUNK_SIZE:CHUNK_SIZE + size]
+    assert reader.reads == [(CHUNK_SIZE, size)]
+    assert cache.stats['cached_chunks'] == 0
+
+    # at most MAX_CACHED_CHUNKS_PER_READ chunks are read through the cache
+    reader.reads.clear()
+    size = MAX_CACHED_CHUNKS_PER_READ * CHUNK_SIZE
+    assert cache.read(0, size) == MEDIA[:size]
+    assert len(reader.reads) == MAX_CACHED_CHUNKS_PER_READ
+
+
+def test_least_recently_used_chunks_are_evicted(reader):
+    cache = ChunkReadCache(reader, len(MEDIA), chunk_size=CHUNK_SIZE, cache_size=2 * CHUNK_SIZE)
+    cache.read(0, 1)
+    cache.read(CHUNK_SIZE, 1)
+    cache.read(0, 1)
+    cache.read(2 * CHUNK_SIZE, 1)  # evicts the second chunk
+
+    reader.reads.clear()
+    assert cache.read(0, 1) == MEDIA[:1]
+    assert cache.read(CHUNK_SIZE, 1) == MEDIA[CHUNK_SIZE:CHUNK_SIZE + 1]
+    assert reader.reads == [(CHUNK_SIZE, CHUNK_SIZE)]
+
+
+def test_read_ahead(reader):
+    read_ahead_reader = RecordingReader()
+    read_ahead = ReadAhead(lambda: (read_ahead_reader, lambda: None), workers=2, depth=4)
+    cache = ChunkReadCache(reader, len(MEDIA), chunk_size=CHUNK_SIZE, cache_size=CHUNK_SIZE * 64,
+                           read_ahead=read_ahead)
+    try:
+        data = b''.join(cache.read(offset, CHUNK_SIZE) for offset in range(0, len(MEDIA), CHUNK_SIZE))
+        assert data == MEDIA
+        # the chunks following the sequential reads were read ahead, none beyond the media end
+        assert read_ahead_reader.reads
+        assert all(offset % CHUNK_SIZE == 0 for offset, _ in read_ahead_reader.reads)
+
+        # large reads bypass read-ahead too (scheduling would fail once read-ahead is closed)
+        read_ahead.close()
+        read_ahead_reader.reads.clear()
+        cache.clear()
+        size = (MAX_CACHED_CHUNKS_PER_READ + 1) * CHUNK_SIZE
+        for offset in range(0, len(MEDIA) - size, size):
+            assert cache.read(offset, size) == MEDIA[offset:offset + size]
+        assert read_ahead_reader.reads == []
+    finally:
+        read_ahead.close()
@@ -0,0 +1,81 @@
+import json
+import logging
+import os
+import threading
+from typing import Dict
+
+from mdp_lib.mdp_plugin import MDPResult
+
+
+class RunManifest(object):
+    """
+    Persistent record of the work completed in an MDP run (used to resume interrupted runs, see --resume).
+
+    The manifest is a JSON lines file that is only appended to (by the main process):
+        - {"type": "plugin_result", "disk_image": ..., "result": {...}}  -> a plugin completed on a disk image
+        - {"type": "disk_image_writing", "disk_image": ...}              -> writing the disk image's row to the run's
+                                                                            JSON/TSV outputs started
+        - {"type": "disk_image_written", "disk_image": ...}              -> the disk image's row was written to the
+                                                                            run's JSON/TSV outputs
+    """
+
+    def __init__(self, manifest_path: str):
+        self.manifest_path = manifest_path
+        self._plugin_results: Dict[str, Dict[str, MDPResult]] = {}
+        self._written_disk_images = set()
+        self._writing_disk_images = set()
+        self._lock = threading.Lock()  # plugins of a disk image might complete in parallel threads
+
+        if os.path.exists(manifest_path):
+            self._load()
+
+    def _load(self):
+        with open(self.manifest_path, 'r') as f:
+            for line_no, line in enumerate(f, 1):
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # e.g. incomplete last line if the run was killed while writing
+                    logging.warning(f'Skipping unreadable line {line_no} in run manifest {self.manifest_path}')
+                    continue
+                if entry['type'] == 'plugin_result':
+                    result = MDPResult.from_dict(entry['result'])
+                    self._plugin_results.setdefault(entry['disk_image'], {})[result.plugin_name] = result
+                elif entry['type'] == 'disk_image_writing':
+                    self._writing_disk_images.add(entry['disk_image'])
+                elif entry['type'] == 'disk_image_written':
+                    self._written_disk_images.add(entry['disk_image'])
+
+    def _append(self, entry: dict):
+        # callers hold self._lock
+        with open(self.manifest_path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+
+    def is_disk_image_written(self, disk_image_path: str) -> bool:
+        return disk_image_path in self._written_disk_images
+
+    def get_plugin_results(self, disk_image_path: str) -> Dict[str, MDPResult]:
+        """Returns the results of plugins already completed on a disk image (by plugin name)"""
+        return dict(self._plugin_results.get(disk_image_path, {}))
+
+    def is_disk_image_writing(self, disk_image_path: str) -> bool:
+        """whether writing the disk image's row was started (e.g. by an interrupted run) but not completed,
+        i.e. the run's JSON/TSV outputs might already contain the row"""
+        return disk_image_path in self._writing_disk_images and disk_image_path not in self._written_disk_images
+
+    def add_plugin_result(self, disk_image_path: str, result: MDPResult):
+        with self._lock:
+            if result.plugin_name in self._plugin_results.get(disk_image_path, {}):
+                return
+            self._append({'type': 'plugin_result', 'disk_image': disk_image_path, 'result': result.to_dict()})
+            self._plugin_results.setdefault(disk_image_path, {})[result.plugin_name] = result
+
+    def add_writing_disk_image(self, disk_image_path: str):
+        with self._lock:
+            self._append({'type': 'disk_image_writing', 'disk_image': disk_image_path})
+            self._writing_disk_images.add(disk_image_path)
+
+    def add_written_disk_image(self, disk_image_path: str):
+        with self._lock:
+            self._append({'type': 'disk_image_written', 'disk_image': disk_image_path})
+            self._written_disk_images.add(disk_image_path)
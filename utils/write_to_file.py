@@ -7,14 +7,29 @@ from typing import List
 from mdp_lib.mdp_plugin import MDPResult
 
 
-def generate_result_file_names():
+def generate_run_id():
+    return datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+
+
+def generate_result_file_names(run_id=None):
+    # the run id (timestamp of the run's start) is part of all output file names, reusing it continues a run
     os.makedirs('output', exist_ok=True)
-    timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+    timestamp = run_id if run_id else generate_run_id()
     json_filename = f"output/{timestamp}_summary_dict.json"
     tsv_filename = f"output/{timestamp}_data_table.tsv"
     return json_filename, tsv_filename, f"output/{timestamp}.log"
 
 
+def generate_manifest_file_name(run_id):
+    os.makedirs('output', exist_ok=True)
+    return f"output/{run_id}_manifest.jsonl"
+
+
+def generate_plan_file_name(run_id):
+    os.makedirs('output', exist_ok=True)
+    return f"output/{run_id}_plan.json"
+
+
 def generate_summary_table_dict(result_list: List[MDPResult]):
     # generate summary table dictionary
 
@@ -31,15 +46,30 @@ def generate_summary_table_dict(result_list: List[MDPResult]):
     return output_dict
 
 
-def write_single_evidence_results_to_json(result_list: dict, json_file_name: str):
+def write_single_evidence_results_to_json(result_list: dict, json_file_name: str, replace_existing=False):
+    # replace_existing: remove rows of the same disk image first (e.g. written by an interrupted run)
     print(f'    Writing output to {json_file_name}')
     single_evidence_json_dump = json.dumps(result_list)
 
+    if replace_existing and os.path.exists(json_file_name):
+        with open(json_file_name, 'r') as f:
+            existing_lines = [line for line in f if not __is_json_row_of(line, result_list.keys())]
+        with open(json_file_name, 'w') as f:
+            f.writelines(existing_lines)
+
     with open(json_file_name, "a") as f:
         f.write(single_evidence_json_dump + "\n")
 
 
-def write_single_evidence_results_to_tsv(single_result_dict: dict, tsv_file_name: str):
+def __is_json_row_of(line, disk_image_paths):
+    try:
+        return any(each_path in disk_image_paths for each_path in json.loads(line))
+    except json.JSONDecodeError:
+        return False
+
+
+def write_single_evidence_results_to_tsv(single_result_dict: dict, tsv_file_name: str, replace_existing=False):
+    # replace_existing: remove rows of the same disk image first (e.g. written by an interrupted run)
     print(f'\tWriting summary data table to {tsv_file_name}.')
 
     disk_image_path, result_data = next(iter(single_result_dict.items()))
@@ -62,13 +92,16 @@ def write_single_evidence_results_to_tsv(single_result_dict: dict, tsv_file_name
         reader = csv.DictReader(f, delimiter='\t')
         existing_rows = list(reader)
         fieldnames = reader.fieldnames or []
+    no_existing_rows = len(existing_rows)
+    if replace_existing:
+        existing_rows = [row for row in existing_rows if row.get('disk_image') != disk_image_path]
 
     # check if current result list has additional plugin results compared to existing colums in tsv
     existing_headers = set(fieldnames)
     new_row_headers = set(new_row.keys())
 
-    # no new headers -> write to existing tsv
-    if new_row_headers.issubset(existing_headers):
+    # no new headers (and no rows replaced) -> write to existing tsv
+    if new_row_headers.issubset(existing_headers) and len(existing_rows) == no_existing_rows:
         with open(tsv_file_name, 'a', newline='') as f:
             writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter='\t', restval='')
             writer.writerow(new_row)